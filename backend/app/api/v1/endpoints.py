@@ -1,19 +1,70 @@
-import io
+import json
+from contextlib import AsyncExitStack
+from itertools import chain
+from typing import Annotated, Literal
 
-import numpy as np
-import soundfile as sf  # type: ignore
-from fastapi import APIRouter, Depends, File, Form, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
-from pydantic import BaseModel
-from pydub import AudioSegment  # type: ignore
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from pydantic import BaseModel, Field
 
-from app.dependencies import get_models
+from app.dependencies import get_executors, get_models, get_speech_cache
+from app.util.codec import (
+    MEDIA_TYPES,
+    AudioEncoder,
+    StreamingAudioEncoder,
+    decode_audio,
+    negotiate_format,
+)
+from app.util.executor import ExecutorOverloadedError
 from app.util.languages import Language
-from app.util.model import AudioData
+from app.util.metrics import METRICS
+from app.util.model import AudioData, KokoroModel
+from app.util.registry import ModelNotReadyError
+from app.util.speech_cache import SpeechCache
+from app.util.streaming import (
+    WHISPER_SAMPLE_RATE,
+    ChunkDecoder,
+    StreamingTranscriber,
+)
 
 router = APIRouter()
 
 
+@router.get("/healthz")
+async def healthz():
+    return JSONResponse(content={"status": "ok"})
+
+
+@router.get("/readyz")
+async def readyz(model=Depends(get_models)):
+    ready, models = model.readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": models},
+    )
+
+
+@router.get("/metrics")
+async def metrics():
+    """Request, stage, executor and batcher metrics in Prometheus text format."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
 class TextTranslate(BaseModel):
     text: str
     sourceLang: Language
@@ -21,14 +72,16 @@ class TextTranslate(BaseModel):
 
 
 @router.post("/api/v1/translate_text")
-async def translate_text(body: TextTranslate, model=Depends(get_models)):
-    return JSONResponse(
-        content={
-            "text": model["TextTranslator"].translate(
-                text=body.text, source=body.sourceLang, target=body.targetLang
-            )
-        }
+async def translate_text(
+    body: TextTranslate, model=Depends(get_models), executor=Depends(get_executors)
+):
+    text = await executor["TextTranslator"].run(
+        model["TextTranslator"].translate,
+        text=body.text,
+        source=body.sourceLang,
+        target=body.targetLang,
     )
+    return JSONResponse(content={"text": text})
 
 
 class TextComparison(BaseModel):
@@ -37,12 +90,45 @@ class TextComparison(BaseModel):
 
 
 @router.post("/api/v1/calculate_similarity")
-async def calculate_similarity(body: TextComparison, model=Depends(get_models)):
-    return JSONResponse(
-        content={
-            "score": model["SemanticMatcher"].get_similarity(body.text_1, body.text_2)
-        }
+async def calculate_similarity(
+    body: TextComparison, model=Depends(get_models), executor=Depends(get_executors)
+):
+    score = await executor["SemanticMatcher"].run(
+        model["SemanticMatcher"].get_similarity, body.text_1, body.text_2
+    )
+    return JSONResponse(content={"score": score})
+
+
+# Bounds the queries x candidates matrix one request can make SemanticMatcher
+# embed and score; MiniLM truncates inputs to 256 tokens anyway.
+ComparedText = Annotated[str, Field(max_length=512)]
+
+
+class BatchTextComparison(BaseModel):
+    queries: list[ComparedText] = Field(min_length=1, max_length=64)
+    candidates: list[ComparedText] = Field(min_length=1, max_length=256)
+    top_k: int | None = Field(default=None, ge=1)
+
+
+@router.post("/api/v1/calculate_similarity_batch")
+async def calculate_similarity_batch(
+    body: BatchTextComparison,
+    model=Depends(get_models),
+    executor=Depends(get_executors),
+):
+    result = await executor["SemanticMatcher"].run(
+        model["SemanticMatcher"].rank_candidates,
+        body.queries,
+        body.candidates,
+        top_k=body.top_k,
     )
+    return JSONResponse(content=result)
+
+
+def _decode_upload(audio_bytes: bytes) -> AudioData:
+    # Decoded straight to Whisper's input format, so the model never resamples.
+    samples = decode_audio(audio_bytes, sample_rate=WHISPER_SAMPLE_RATE)
+    return AudioData(sampling_rate=WHISPER_SAMPLE_RATE, raw=samples)
 
 
 @router.post("/api/v1/transcribe_audio")
@@ -50,51 +136,247 @@ async def transcribe_audio(
     file: UploadFile = File(...),
     language: str = Form("ENGLISH"),
     model=Depends(get_models),
+    executor=Depends(get_executors),
 ):
     audio_bytes = await file.read()
-    audio = AudioSegment.from_file(io.BytesIO(audio_bytes), format="webm")
-
-    # Normalize for whisper
-    dtype_map = {1: np.int8, 2: np.int16, 4: np.int32}
-    dtype = dtype_map.get(audio.sample_width)
-    audio = audio.set_channels(1)  # mono
-    audio = audio.set_frame_rate(16000)  # 16kHz
-    samples = np.array(audio.get_array_of_samples()).astype(np.float32)
-    samples /= np.iinfo(dtype).max  # type: ignore
-    sample_rate = audio.frame_rate
-
-    result = model["WhisperModel"].run_inference(
-        AudioData(sampling_rate=sample_rate, raw=samples), source_language=language
-    )
+    try:
+        audio_data = await executor["AudioCodec"].run(_decode_upload, audio_bytes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable audio: {e}")
+
+    # Whisper batches on its own executor; only admission is limited here.
+    async with executor["WhisperModel"].admit():
+        result = await model["WhisperModel"].transcribe(
+            audio_data, source_language=language
+        )
     return JSONResponse(content={"text": result["text"]})
 
 
+@router.websocket("/api/v1/transcribe_stream")
+async def transcribe_stream(
+    websocket: WebSocket,
+    language: str = "ENGLISH",
+    format: str = "pcm_s16le",
+    sample_rate: int = 16000,
+    model=Depends(get_models),
+    executor=Depends(get_executors),
+):
+    """Live transcription: the client sends audio chunks as binary messages and
+    the text message "end" when the learner stops; the server answers with
+    partial transcripts and then a final one."""
+    try:
+        decoder = ChunkDecoder(format, sample_rate)
+    except ValueError as e:
+        await websocket.close(code=1003, reason=str(e))
+        return
+
+    async def transcribe(audio: AudioData) -> str:
+        async with executor["WhisperModel"].admit():
+            result = await model["WhisperModel"].transcribe(
+                audio, source_language=language
+            )
+        return result["text"]
+
+    transcriber = StreamingTranscriber(transcribe)
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                try:
+                    samples = decoder.decode(message["bytes"])
+                except ValueError as e:
+                    await websocket.close(code=1007, reason=str(e))  # invalid data
+                    return
+                partial = await transcriber.push(samples)
+                if partial is not None:
+                    await websocket.send_json(partial)
+            elif message.get("text") == "end":
+                break
+
+        partial = await transcriber.push(decoder.finish())
+        if partial is not None:
+            await websocket.send_json(partial)
+        await websocket.send_json(await transcriber.finish())
+        await websocket.close()
+    except (ExecutorOverloadedError, ModelNotReadyError) as e:
+        await websocket.close(code=1013, reason=str(e))  # try again later
+    except WebSocketDisconnect:
+        pass
+
+
 class TTSRequest(BaseModel):
     text: str
-    language: str
+    language: Language
+    voice: str = "af_heart"
+    speed: float = Field(1.0, gt=0, le=4)
+
+
+# Encoders hold no per-request state, so one per process is shared by all requests.
+audio_encoder = AudioEncoder()
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
 
 
 @router.post("/api/v1/generate_audio")
-async def generate_audio(body: TTSRequest, model=Depends(get_models)):
-    audio_data = model["KokoroModel"].run_inference(body.text, body.language)
+async def generate_audio(
+    body: TTSRequest,
+    accept: str | None = Header(None),
+    if_none_match: str | None = Header(None),
+    model=Depends(get_models),
+    executor=Depends(get_executors),
+    speech_cache=Depends(get_speech_cache),
+):
+    """Synthesize speech, encoded in the format the `Accept` header asks for.
+
+    Defaults to webm/Opus; clients that can play WAV or raw little-endian PCM
+    (application/octet-stream) directly get uncompressed audio and skip the
+    encoding cost. Encoded audio is cached, and the ETag is the cache key, so
+    revalidating a clip the client already has costs neither synthesis nor a
+    cache lookup.
+    """
+    format = negotiate_format(accept)
+    if format is None:
+        supported = ", ".join(chain(*MEDIA_TYPES.values()))
+        raise HTTPException(status_code=406, detail=f"Supported types: {supported}")
+
+    key = SpeechCache.key(body.text, body.language, body.voice, body.speed, format)
+    headers = {
+        # Weak: a re-synthesized clip sounds the same but may differ byte-wise.
+        "ETag": f'W/"{key}"',
+        "Cache-Control": "no-cache",
+        "Vary": "Accept",
+        "X-Sample-Rate": str(KokoroModel.SAMPLE_RATE),
+    }
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    data = await executor["AudioCodec"].run(speech_cache.get, key)
+    if data is None:
+        audio_data = await executor["KokoroModel"].run(
+            model["KokoroModel"].run_inference,
+            body.text,
+            body.language,
+            body.voice,
+            body.speed,
+        )
+        encoded = await executor["AudioCodec"].run(
+            audio_encoder.encode, audio_data.raw, audio_data.sampling_rate, format
+        )
+        await executor["AudioCodec"].run(speech_cache.put, key, encoded.data)
+        data = encoded.data
+        headers["Server-Timing"] = (
+            f"cache;desc=miss, encode;dur={encoded.cpu_seconds * 1000:.2f}"
+        )
+    else:
+        headers["Server-Timing"] = "cache;desc=hit"
+
+    headers["Content-Disposition"] = f"attachment; filename=output.{format}"
+    return Response(content=data, media_type=MEDIA_TYPES[format][0], headers=headers)
+
 
-    # De-normalize audio array
-    denormalized_audio_data = (audio_data.raw * 32767).astype("int16")
+class TTSStreamRequest(TTSRequest):
+    format: Literal["webm", "ogg", "pcm"] = "webm"
 
-    audio_segment = AudioSegment(
-        data=denormalized_audio_data,
-        frame_rate=audio_data.sampling_rate,
-        sample_width=2,  # 16-bit
-        channels=1,
+
+@router.post("/api/v1/generate_audio_stream")
+async def generate_audio_stream(
+    body: TTSStreamRequest, model=Depends(get_models), executor=Depends(get_executors)
+):
+    """Stream synthesized speech sentence by sentence, encoding each as it is ready."""
+    tts_model = model["KokoroModel"]
+    encoder = StreamingAudioEncoder(body.format, tts_model.SAMPLE_RATE)
+    segments = tts_model.stream_inference(
+        body.text, body.language, body.voice, body.speed
+    )
+
+    def next_chunk() -> bytes | None:
+        segment = next(segments, None)
+        return None if segment is None else encoder.encode(segment.raw)
+
+    # Synthesize the first sentence before responding, so overload and model
+    # errors still surface as HTTP status codes.
+    first_chunk = await executor["KokoroModel"].run(next_chunk)
+
+    async def audio_stream():
+        chunk = first_chunk
+        while chunk is not None:
+            if chunk:
+                yield chunk
+            chunk = await executor["KokoroModel"].run(next_chunk)
+        yield await executor["KokoroModel"].run(encoder.close)
+
+    return StreamingResponse(
+        content=audio_stream(),
+        media_type=encoder.media_type,
+        headers={"X-Sample-Rate": str(tts_model.SAMPLE_RATE)},
     )
 
-    # Write to an in-memory buffer
-    buffer = io.BytesIO()
-    audio_segment.export(out_f=buffer, format="webm")
-    buffer.seek(0)
+
+class ChatRequest(BaseModel):
+    message: str
+    session_id: str | None = None
+    temperature: float = Field(0.7, ge=0, le=2)
+    top_p: float = Field(0.9, gt=0, le=1)
+    max_new_tokens: int | None = Field(None, ge=1, le=512)
+
+
+@router.post("/api/v1/chat")
+async def chat(
+    body: ChatRequest, model=Depends(get_models), executor=Depends(get_executors)
+):
+    dialogue_engine = model["QwenCausalLM"]
+    qwen_executor = executor["QwenCausalLM"]
+    if body.session_id and not dialogue_engine.has_session(body.session_id):
+        raise HTTPException(status_code=404, detail="Session expired or not found")
+    session_id = body.session_id or dialogue_engine.create_session()
+
+    # Replies decode on the model's own batcher thread, so the executor only runs
+    # the blocking setup; each reply holds an admission slot until its stream
+    # ends, which bounds the replies in flight.
+    slot = AsyncExitStack()
+    await slot.enter_async_context(qwen_executor.admit())
+    try:
+        streamer = dialogue_engine.create_streamer(asynchronous=True)
+        request = await qwen_executor.run_admitted(
+            dialogue_engine.start_reply,
+            body.message,
+            session_id,
+            streamer,
+            temperature=body.temperature,
+            top_p=body.top_p,
+            max_new_tokens=body.max_new_tokens,
+        )
+    except BaseException:
+        await slot.aclose()
+        raise
+
+    async def event_stream():
+        # Headers are already sent, so a failure mid-reply becomes an error event.
+        try:
+            async for token in streamer:
+                if token:
+                    data = json.dumps({"token": token}, ensure_ascii=False)
+                    yield f"data: {data}\n\n"
+            await qwen_executor.run_admitted(request.wait)
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        finally:
+            # Stop generating if the client goes away mid-reply.
+            request.cancelled.set()
+            await slot.aclose()
+        yield "event: done\ndata: {}\n\n"
 
     return StreamingResponse(
-        content=buffer,
-        media_type="audio/webm",
-        headers={"Content-Disposition": "attachment; filename=output.webm"},
+        content=event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Session-Id": session_id},
     )
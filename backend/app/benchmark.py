@@ -0,0 +1,394 @@
+"""Microbenchmarks for every inference and codec stage, checked against a baseline.
+
+    python -m app.benchmark --baseline benchmarks/baseline.json --update-baseline
+    python -m app.benchmark --baseline benchmarks/baseline.json --threshold 0.25
+
+Each stage runs on fixed fixtures (a synthetic five-second clip and the lesson
+phrases) for a few warm-up and `--iterations` timed runs. The report holds
+p50/p99 latency, throughput and the resident memory the stage added, from
+before its setup to after its timed runs. With a baseline, the run exits
+non-zero when a stage's p50 or memory grew, or its throughput fell, by more
+than `--threshold` of the recorded value. The qwen_concurrent_N stages report the
+aggregate tokens/s of N sessions decoding together in QwenCausalLM's
+continuous batcher.
+
+Everything runs offline on CPU (HF_HUB_OFFLINE is set). Model stages load small
+local checkpoints from --checkpoints (BENCHMARK_CHECKPOINTS, default
+benchmarks/checkpoints), or directories passed with --whisper/--qwen/--minilm,
+and are skipped when those are missing. Fetch each once, e.g.
+
+    huggingface-cli download openai/whisper-tiny \\
+        --local-dir benchmarks/checkpoints/whisper-tiny
+
+and likewise Qwen/Qwen1.5-0.5B-Chat to qwen1.5-0.5b-chat and
+sentence-transformers/all-MiniLM-L6-v2 to all-minilm-l6-v2.
+
+The Qwen stages share one model, built by the first of them that runs, so only
+that stage's memory includes the weights.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable
+
+import numpy as np
+
+from app.lessons.library import LESSONS, lesson_phrases
+from app.util.languages import Language
+
+CLIP_SECONDS = 5
+PHRASES = [phrase for lesson in LESSONS for phrase in lesson_phrases(lesson)]
+
+# Default directory under --checkpoints for each model flag.
+CHECKPOINTS = {
+    "whisper": "whisper-tiny",
+    "qwen": "qwen1.5-0.5b-chat",
+    "minilm": "all-minilm-l6-v2",
+}
+
+
+@dataclass
+class Stage:
+    name: str
+    # Builds the stage's fixtures and returns one iteration, which reports how
+    # many `unit`s it processed. An iteration with a close() method is closed
+    # once the stage is done.
+    setup: Callable[[argparse.Namespace], Callable[[], float]]
+    unit: str
+
+
+def _clip(sample_rate: int) -> np.ndarray:
+    """Deterministic speech-like fixture: a gliding tone with syllable-rate bursts."""
+    t = np.arange(CLIP_SECONDS * sample_rate) / sample_rate
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.5 * t)
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    return (0.3 * envelope * np.sin(phase)).astype(np.float32)
+
+
+def _webm_clip(sample_rate: int = 48000) -> bytes:
+    from app.util.codec import StreamingAudioEncoder
+
+    encoder = StreamingAudioEncoder("webm", sample_rate)
+    return encoder.encode(_clip(sample_rate)) + encoder.close()
+
+
+def _webm_decode(args):
+    from app.util.codec import decode_audio
+
+    data = _webm_clip()
+    return lambda: len(decode_audio(data)) / 16000
+
+
+def _resample(args):
+    from app.util.streaming import ChunkDecoder
+
+    chunk = _clip(48000).tobytes()
+
+    def run():
+        # A fresh decoder per run, so no resampler state carries over.
+        ChunkDecoder("pcm_f32le", sample_rate=48000).decode(chunk)
+        return CLIP_SECONDS
+
+    return run
+
+
+def _webm_encode(args):
+    from app.util.codec import AudioEncoder
+
+    encoder = AudioEncoder()
+    samples = _clip(24000)
+
+    def run():
+        encoder.encode(samples, 24000, "webm")
+        return CLIP_SECONDS
+
+    return run
+
+
+def _checkpoint(path: str) -> str:
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No local checkpoint at {path}")
+    return path
+
+
+def _whisper(args):
+    from app.util.model import AudioData, WhisperModel
+
+    model = WhisperModel(model_id=_checkpoint(args.whisper), precision=args.precision)
+    audio = AudioData(16000, _clip(16000))
+
+    def run():
+        model.run_inference(audio, source_language=Language.MANDARIN)
+        return CLIP_SECONDS
+
+    return run
+
+
+def _qwen(args):
+    from app.util.model import QwenCausalLM
+
+    # The singleton is built once and reused by every Qwen stage.
+    llm = QwenCausalLM.get_instance(
+        model_name=_checkpoint(args.qwen), precision=args.precision
+    )
+    ids = llm.tokenizer(" ".join(PHRASES), return_tensors="pt").input_ids
+    return llm, ids.to(llm.device)
+
+
+def _qwen_prefill(args):
+    import torch
+
+    llm, ids = _qwen(args)
+
+    def run():
+        with torch.no_grad():
+            llm.model(ids, use_cache=True)
+        return ids.shape[1]
+
+    return run
+
+
+def _qwen_decode(args, tokens: int = 16):
+    import torch
+
+    llm, ids = _qwen(args)
+
+    def run():
+        # Prefill untimed, then time greedy decode steps against the KV cache.
+        with torch.no_grad():
+            output = llm.model(ids, use_cache=True)
+            started_at = time.perf_counter()
+            for _ in range(tokens):
+                next_id = output.logits[:, -1:].argmax(-1)
+                output = llm.model(
+                    next_id, past_key_values=output.past_key_values, use_cache=True
+                )
+        return tokens, time.perf_counter() - started_at
+
+    return run
+
+
+def _qwen_concurrent(args, sessions: int, tokens: int = 16):
+    """Aggregate decode throughput with `sessions` replies in one running batch."""
+    from transformers import DynamicCache
+
+    from app.util.generation import ContinuousBatcher, GenerationRequest
+
+    llm, _ = _qwen(args)
+    prompts = [
+        llm.tokenizer(PHRASES[i % len(PHRASES)], return_tensors="pt").input_ids
+        for i in range(sessions)
+    ]
+
+    # No EOS, so every session decodes exactly `tokens` tokens.
+    batcher = ContinuousBatcher(llm.model, set(), max_batch_size=sessions)
+
+    class Run:
+        def __call__(self) -> float:
+            requests = [
+                batcher.submit(
+                    GenerationRequest(
+                        input_ids=ids,
+                        past_key_values=DynamicCache(),
+                        max_new_tokens=tokens,
+                        do_sample=False,
+                    )
+                )
+                for ids in prompts
+            ]
+            for request in requests:
+                request.wait()
+            return sessions * tokens
+
+        def close(self) -> None:
+            # Stops the batcher's decode thread.
+            batcher.close()
+
+    return Run()
+
+
+def _minilm(args):
+    from app.util.model import SemanticMatcher
+
+    model = SemanticMatcher(
+        model_name=_checkpoint(args.minilm),
+        max_cached_embeddings=1,
+        precision=args.precision,
+    )
+    return lambda: len(model._encode(PHRASES))
+
+
+def _kokoro(args):
+    from app.util.model import KokoroModel
+
+    model = KokoroModel(precision=args.precision)
+    text = "".join(PHRASES)
+
+    def run():
+        audio = model.run_inference(text, Language.MANDARIN)
+        return len(audio.raw) / audio.sampling_rate
+
+    return run
+
+
+STAGES = [
+    Stage("webm_decode", _webm_decode, "audio_s"),
+    Stage("resample", _resample, "audio_s"),
+    Stage("whisper", _whisper, "audio_s"),
+    Stage("qwen_prefill", _qwen_prefill, "tokens"),
+    Stage("qwen_decode", _qwen_decode, "tokens"),
+    *(
+        Stage(f"qwen_concurrent_{n}", partial(_qwen_concurrent, sessions=n), "tokens")
+        for n in (8, 16, 32)
+    ),
+    Stage("minilm_embedding", _minilm, "texts"),
+    Stage("kokoro_synthesis", _kokoro, "audio_s"),
+    Stage("webm_encode", _webm_encode, "audio_s"),
+]
+
+
+def _rss_mib() -> float:
+    """Current resident memory; the peak where /proc is missing (macOS)."""
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    # ru_maxrss is in bytes on macOS.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20
+
+
+def measure(
+    run: Callable[[], Any], iterations: int, warmup: int = 2
+) -> dict[str, float]:
+    """Time `iterations` calls of `run` after `warmup` untimed ones.
+
+    `run` returns the units it processed, or (units, seconds) when it times
+    itself.
+    """
+    for _ in range(warmup):
+        run()
+
+    latencies, units = [], 0.0
+    for _ in range(iterations):
+        started_at = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - started_at
+        if isinstance(result, tuple):
+            result, elapsed = result
+        latencies.append(elapsed)
+        units += result
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1000,
+        "throughput": units / sum(latencies),
+    }
+
+
+def run_stages(
+    stages: list[Stage], args: argparse.Namespace
+) -> dict[str, dict[str, Any]]:
+    report: dict[str, dict[str, Any]] = {}
+    for stage in stages:
+        rss_before = _rss_mib()
+        try:
+            run = stage.setup(args)
+        except (ImportError, OSError) as e:
+            # Missing optional dependency or checkpoint not in the local cache.
+            reason = str(e).splitlines()[0] if str(e) else ""
+            report[stage.name] = {"skipped": f"{type(e).__name__}: {reason}"}
+            continue
+        try:
+            result = measure(run, args.iterations)
+            result["rss_delta_mib"] = _rss_mib() - rss_before
+        finally:
+            close = getattr(run, "close", None)
+            if close is not None:
+                close()
+        report[stage.name] = {**result, "unit": f"{stage.unit}/s"}
+    return report
+
+
+# Gated metrics and the sign of a regression: +1 when growth is worse.
+GATED_METRICS = {"p50_ms": 1, "throughput": -1, "rss_delta_mib": 1}
+# Memory must also grow by this much, so stages that allocate next to nothing
+# do not fail on allocator noise.
+RSS_SLACK_MIB = 32.0
+
+
+def find_regressions(
+    report: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    threshold: float,
+) -> list[str]:
+    """Stages whose p50 latency or memory grew, or whose throughput fell, by more
+    than `threshold` of the baseline value."""
+    regressions = []
+    for name, result in report.items():
+        for metric, sign in GATED_METRICS.items():
+            expected = baseline.get(name, {}).get(metric)
+            if expected is None or metric not in result:
+                continue
+            slack = RSS_SLACK_MIB if metric == "rss_delta_mib" else 0.0
+            if sign * (result[metric] - expected) > max(
+                abs(expected) * threshold, slack
+            ):
+                regressions.append(
+                    f"{name}: {metric} {result[metric]:.1f} vs baseline {expected:.1f}"
+                )
+    return regressions
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=[s.name for s in STAGES])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--baseline", help="JSON file to compare against or update")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument(
+        "--checkpoints",
+        default=os.environ.get("BENCHMARK_CHECKPOINTS", "benchmarks/checkpoints"),
+    )
+    parser.add_argument("--whisper")
+    parser.add_argument("--qwen")
+    parser.add_argument("--minilm")
+    args = parser.parse_args(argv)
+    for name, directory in CHECKPOINTS.items():
+        if getattr(args, name) is None:
+            setattr(args, name, os.path.join(args.checkpoints, directory))
+    return args
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    stages = [s for s in STAGES if not args.stages or s.name in args.stages]
+    report = run_stages(stages, args)
+    print(json.dumps(report, indent=2))
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = find_regressions(report, json.load(f), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,6 +1,15 @@
 # app/dependencies.py
-from fastapi import Request
+from fastapi.requests import HTTPConnection
 
 
-def get_models(request: Request):
-    return request.app.state.model
+# HTTPConnection rather than Request so WebSocket routes can depend on these too.
+def get_models(connection: HTTPConnection):
+    return connection.app.state.model
+
+
+def get_executors(connection: HTTPConnection):
+    return connection.app.state.executor
+
+
+def get_speech_cache(connection: HTTPConnection):
+    return connection.app.state.speech_cache
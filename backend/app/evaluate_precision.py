@@ -0,0 +1,181 @@
+"""Compare reduced-precision models against fp32 before enabling them.
+
+    python -m app.evaluate_precision --precision int8 --models WhisperModel SemanticMatcher
+
+For each model, loads an fp32 reference and a copy at `--precision`, then
+reports weight memory, mean latency and an accuracy measure on fixed inputs
+built from the lesson library:
+
+- WhisperModel: character error rate on lesson phrases synthesized by Kokoro
+- KokoroModel: character error rate of fp32 Whisper on the synthesized phrases
+- SemanticMatcher: drift of the phrase-by-phrase similarity matrix
+- QwenCausalLM: perplexity on the lesson scenario and grammar texts
+
+Pick per-model settings for MODEL_PRECISION from the results.
+"""
+
+import argparse
+import gc
+import json
+import math
+import sys
+import time
+from typing import Any, Callable
+
+import numpy as np
+
+from app.lessons.library import LESSONS, lesson_phrases
+from app.util.languages import Language
+from app.util.model import (
+    AudioData,
+    KokoroModel,
+    QwenCausalLM,
+    SemanticMatcher,
+    WhisperModel,
+)
+from app.util.precision import Precision, error_rate, module_nbytes
+
+PHRASES = list(
+    dict.fromkeys(phrase for lesson in LESSONS for phrase in lesson_phrases(lesson))
+)
+TEXTS = [lesson["scenarios"] for lesson in LESSONS] + [
+    f"{item['example']} {item['meaning']}"
+    for lesson in LESSONS
+    for item in lesson["grammar"]
+]
+
+
+def _timed(fn: Callable[[], Any]) -> tuple[Any, float]:
+    started_at = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started_at
+
+
+def _synthesize(kokoro: KokoroModel) -> tuple[list[AudioData], float]:
+    clips, seconds = _timed(
+        lambda: [kokoro.run_inference(p, Language.MANDARIN) for p in PHRASES]
+    )
+    return clips, seconds / len(PHRASES)
+
+
+def _transcription_error(whisper: WhisperModel, clips: list[AudioData]):
+    # One clip in, one result out, never the list form.
+    texts, seconds = _timed(
+        lambda: [
+            whisper.run_inference(clip, source_language=Language.MANDARIN)["text"]  # type: ignore[call-overload]
+            for clip in clips
+        ]
+    )
+    errors = [error_rate(ref, hyp) for ref, hyp in zip(PHRASES, texts)]
+    return float(np.mean(errors)), seconds / len(clips)
+
+
+def _perplexity(llm: QwenCausalLM) -> tuple[float, float]:
+    import torch
+
+    def run():
+        losses, tokens = 0.0, 0
+        for text in TEXTS:
+            ids = llm.tokenizer(text, return_tensors="pt").input_ids.to(llm.device)
+            with torch.no_grad():
+                loss = llm.model(ids, labels=ids).loss.float().item()
+            losses += loss * (ids.shape[1] - 1)
+            tokens += ids.shape[1] - 1
+        return math.exp(losses / tokens)
+
+    perplexity, seconds = _timed(run)
+    return perplexity, seconds / len(TEXTS)
+
+
+def _measure(
+    name: str, precision: Precision, clips: list[AudioData] | None
+) -> tuple[dict[str, Any], Any]:
+    """Load model `name` at `precision` and measure it; returns the entry and model."""
+    entry: dict[str, Any] = {}
+    if name == "WhisperModel":
+        whisper = WhisperModel(precision=precision)
+        entry["cer"], entry["seconds_per_clip"] = _transcription_error(
+            whisper, clips or []
+        )
+        return entry, whisper
+    if name == "KokoroModel":
+        kokoro = KokoroModel(precision=precision)
+        audio, entry["seconds_per_phrase"] = _synthesize(kokoro)
+        entry["whisper_fp32_cer"], _ = _transcription_error(WhisperModel(), audio)
+        return entry, kokoro
+    if name == "SemanticMatcher":
+        matcher = SemanticMatcher(max_cached_embeddings=1, precision=precision)
+        entry["scores"], seconds = _timed(
+            lambda: matcher.get_similarity_matrix(PHRASES, PHRASES)
+        )
+        entry["seconds_per_text"] = seconds / (2 * len(PHRASES))
+        return entry, matcher
+    if name == "QwenCausalLM":
+        # A singleton: drop the previous precision's model before building.
+        QwenCausalLM.release_instance()
+        llm = QwenCausalLM.get_instance(precision=precision)
+        entry["perplexity"], entry["seconds_per_text"] = _perplexity(llm)
+        QwenCausalLM.release_instance()
+        return entry, llm
+    raise ValueError(f"Unknown model: {name}")
+
+
+def evaluate(name: str, precision: Precision, clips: list[AudioData] | None):
+    """Measure model `name` at fp32 and at `precision`.
+
+    Results are keyed by the requested precision; when a model falls back to
+    another one (e.g. bf16 without CPU support), the entry says which it ran at.
+    """
+    results: dict[str, Any] = {}
+    reference = None
+    for candidate in dict.fromkeys((Precision.FP32, precision)):
+        entry, model = _measure(name, candidate, clips)
+        scores = entry.pop("scores", None)
+        if scores is not None:
+            if reference is None:
+                reference = scores
+            else:
+                drift = np.abs(scores - reference)
+                entry["max_score_drift"] = float(drift.max())
+                entry["mean_score_drift"] = float(drift.mean())
+        entry["weight_mib"] = module_nbytes(model.model) / 2**20
+        if model.precision != candidate:
+            entry["fell_back_to"] = model.precision.value
+        results[candidate.value] = entry
+        # Free this precision's weights before loading the next.
+        del model
+        gc.collect()
+    return results
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--precision",
+        type=Precision,
+        choices=list(Precision),
+        default=Precision.INT8,
+        metavar="{" + ",".join(p.value for p in Precision) + "}",
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=["WhisperModel", "KokoroModel", "SemanticMatcher", "QwenCausalLM"],
+        default=["WhisperModel", "KokoroModel", "SemanticMatcher", "QwenCausalLM"],
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> None:
+    args = parse_args(argv)
+    clips = None
+    if "WhisperModel" in args.models:
+        # The fixed clip set: fp32 Kokoro reading every lesson phrase.
+        clips, _ = _synthesize(KokoroModel())
+
+    report = {name: evaluate(name, args.precision, clips) for name in args.models}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
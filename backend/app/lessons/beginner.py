@@ -1,4 +1,4 @@
-from lessons.types import LessonModule
+from .types import LessonModule
 
 AT_RESTAURANT: LessonModule = {
     "name": "At a Restaurant",
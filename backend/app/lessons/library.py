@@ -0,0 +1,11 @@
+from .beginner import AT_RESTAURANT
+from .types import LessonModule
+
+LESSONS: list[LessonModule] = [AT_RESTAURANT]
+
+
+def lesson_phrases(lesson: LessonModule) -> list[str]:
+    """Mandarin phrases a lesson shows the learner: vocabulary and grammar examples."""
+    return [item["chinese"] for item in lesson["vocabulary"]] + [
+        item["example"] for item in lesson["grammar"]
+    ]
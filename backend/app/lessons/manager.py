@@ -13,7 +13,8 @@ class LessonMode(Enum):
 class LessonManager:
     def __init__(self, config: LessonModule, mode: LessonMode):
         if mode == LessonMode.TEXT:
-            self.dialogue_engine = MandarinText()  # type: ignore
+            # The lesson's prompts are part of the session's cached prefix.
+            self.dialogue_engine = MandarinText(config)  # type: ignore
         else:
             self.dialogue_engine = MandarinSpeech()  # type: ignore
 
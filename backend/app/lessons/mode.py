@@ -1,4 +1,4 @@
-from lessons.types import GrammarItem, VocabularyItem  # type: ignore
+from lessons.types import GrammarItem, LessonModule, VocabularyItem  # type: ignore
 from util.audio import VoiceRecorder  # type: ignore
 from util.languages import Language  # type: ignore
 from util.model import (  # type: ignore
@@ -20,6 +20,7 @@ class MandarinSpeech:
         self.VOICE_RECORDER = VoiceRecorder()
         self.VOICE_TRANSCRIBER = SpeechToTextModel(self.LANGUAGE)
         self.TEXT_TO_SPEECH_MODEL = TextToSpeechModel(self.LANGUAGE)
+        self.TEXT_TRANSLATOR = TextTranslator()
 
         self.CONVERSATION_GENERATOR = QwenCausalLM()
         self.SESSION_UUID = self._get_session_id()
@@ -33,7 +34,7 @@ class MandarinSpeech:
         )
 
     def _translate_text(self, input: str, target: Language) -> str:
-        return TextTranslator.translate(input, target)
+        return self.TEXT_TRANSLATOR.translate(input, target)
 
     def _get_user_response(self) -> str:
         input("> Press any 'Enter' to start recording audio...")
@@ -66,19 +67,37 @@ class MandarinSpeech:
 class MandarinText:
     """Class that you can type at a bot back and forth."""
 
-    def __init__(self):
+    SYSTEM_PROMPT = (
+        "You are my Mandarin practice partner."
+        " You help me by holding conversations in Mandarin, prompting"
+        " me to use key vocabulary and grammar patterns."
+    )
+
+    def __init__(self, lesson: LessonModule | None = None):
         self.LANGUAGE = Language.MANDARIN
-        self.SESSION_UUID = QwenCausalLM.create_session()
-        QwenCausalLM.add_system_prompt(
-            (
-                "You are my Mandarin practice partner."
-                " You help me by holding conversations in Mandarin, prompting"
-                " me to use key vocabulary and grammar patterns."
+        self.LESSON = lesson
+        self.TEXT_TRANSLATOR = TextTranslator()
+        self.SESSION_UUID = self._create_session()
+
+    def _create_session(self) -> str:
+        """Start a session whose system prompts come from the shared prefix cache."""
+        if self.LESSON is None:
+            return QwenCausalLM.create_session_from_prefix(
+                "default", [self.SYSTEM_PROMPT]
             )
+
+        return QwenCausalLM.create_session_from_prefix(
+            self.LESSON["name"],
+            [
+                self.SYSTEM_PROMPT,
+                self._scenario_prompt(self.LESSON["scenarios"]),
+                self._vocabulary_prompt(self.LESSON["vocabulary"]),
+                self._grammar_prompt(self.LESSON["grammar"]),
+            ],
         )
 
     def _translate_text(self, input: str, target: Language) -> str:
-        return TextTranslator.translate(input, target)
+        return self.TEXT_TRANSLATOR.translate(input, target)
 
     def _get_user_response(self) -> str:
         return input("> You: ")
@@ -87,31 +106,40 @@ class MandarinText:
         bot_text_response = QwenCausalLM.run_inference(user_text, self.SESSION_UUID)
         return bot_text_response
 
+    @staticmethod
+    def _scenario_prompt(scenario: str) -> str:
+        return f"This is the conversation role-playing scenario from the perspective of the user: {scenario}"
+
+    @staticmethod
+    def _vocabulary_prompt(vocab_arr: list[VocabularyItem]) -> str:
+        return (
+            "Prioritize using the following vocabulary when it makes sense:"
+            f" {','.join(item['chinese'] for item in vocab_arr)}"
+        )
+
+    @staticmethod
+    def _grammar_prompt(grammar_arr: list[GrammarItem]) -> str:
+        return (
+            f"Prioritize prompting me to use the following grammar patterns"
+            " in my response when it makes sense:"
+            f" {','.join(item['structure'] for item in grammar_arr)}"
+        )
+
     def add_scenario(self, scenario: str) -> None:
         QwenCausalLM.add_system_prompt(
-            f"This is the conversation role-playing scenario from the perspective of the user: {scenario}",
-            self.SESSION_UUID,
+            self._scenario_prompt(scenario), self.SESSION_UUID
         )
 
     def add_vocabulary(self, vocab_arr: list[VocabularyItem]) -> None:
         QwenCausalLM.add_system_prompt(
-            (
-                "Prioritize using the following vocabulary when it makes sense:"
-                f" {','.join(item['chinese'] for item in vocab_arr)}"
-            ),
-            self.SESSION_UUID,
+            self._vocabulary_prompt(vocab_arr), self.SESSION_UUID
         )
 
     def add_grammar(self, grammar_arr: list[GrammarItem]) -> None:
         QwenCausalLM.add_system_prompt(
-            (
-                f"Prioritize prompting me to use the following grammar patterns"
-                " in my response when it makes sense:"
-                f" {','.join(item['structure'] for item in grammar_arr)}"
-            ),
-            self.SESSION_UUID,
+            self._grammar_prompt(grammar_arr), self.SESSION_UUID
         )
 
     def clear_session(self) -> None:
         QwenCausalLM.delete_session(self.SESSION_UUID)
-        self.SESSION_UUID = QwenCausalLM.create_session()
+        self.SESSION_UUID = self._create_session()
@@ -1,31 +1,262 @@
+import os
+import time
+from collections import defaultdict
 from contextlib import asynccontextmanager
 from typing import Any
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.api.v1 import endpoints
+from app.lessons.library import LESSONS, lesson_phrases
+from app.util.executor import (
+    ExecutorBusyError,
+    ExecutorOverloadedError,
+    ModelExecutor,
+    partition_torch_threads,
+)
+from app.util.languages import Language
+from app.util.metrics import (
+    METRICS,
+    activate,
+    enable_tracing,
+    metrics_enabled,
+    start_span,
+)
 from app.util.model import (
+    GoogleTranslateBackend,
     KokoroModel,
+    MarianTranslationBackend,
+    QwenCausalLM,
     SemanticMatcher,
     TextTranslator,
     WhisperModel,
 )
+from app.util.precision import Precision, parse_model_precisions
+from app.util.registry import ModelNotReadyError, ModelRegistry
+from app.util.speech_cache import SpeechCache
+
+# "marian" translates locally with MarianMT for air-gapped deployments.
+TRANSLATION_BACKENDS = {
+    "google": GoogleTranslateBackend,
+    "marian": MarianTranslationBackend,
+}
 
 # text_dialogue_engine = dict()
+# Models loaded before the app starts (see app/serve.py); when empty, each
+# process loads its own in `lifespan`.
 core_models: dict[str, Any] = dict()
 
 
+def _translation_backend():
+    return TRANSLATION_BACKENDS[os.environ.get("TRANSLATION_BACKEND", "google")]
+
+
+def _translation_backend_factory(precision: Precision):
+    backend = _translation_backend()
+    if backend is GoogleTranslateBackend:
+        return backend()
+    return backend(precision=precision)
+
+
+def _qwen_max_batch_size() -> int:
+    return int(os.environ.get("QWEN_MAX_BATCH_SIZE", 16))
+
+
+def register_models(registry: ModelRegistry) -> None:
+    """Register every model; those named in LAZY_MODELS load on first use.
+
+    MODEL_PRECISION picks per-model CPU precision, e.g.
+    "WhisperModel=int8,QwenCausalLM=bf16" (see app/util/precision.py and
+    app/evaluate_precision.py); models not named stay fp32.
+    QWEN_MAX_BATCH_SIZE caps how many chat replies decode together (1 turns
+    continuous batching off). TRANSLATION_CACHE_PATH keeps translations in a
+    SQLite file that survives restarts and is shared by workers.
+    """
+    lazy = set(filter(None, os.environ.get("LAZY_MODELS", "").split(",")))
+    precisions = defaultdict(
+        lambda: Precision.FP32,
+        parse_model_precisions(os.environ.get("MODEL_PRECISION", "")),
+    )
+    factories = {
+        "SemanticMatcher": lambda: SemanticMatcher(
+            preload_texts=[
+                phrase for lesson in LESSONS for phrase in lesson_phrases(lesson)
+            ],
+            precision=precisions["SemanticMatcher"],
+        ),
+        "TextTranslator": lambda: TextTranslator(
+            backend=_translation_backend_factory(precisions["TextTranslator"]),
+            cache_path=os.environ.get("TRANSLATION_CACHE_PATH"),
+        ),
+        "WhisperModel": lambda: WhisperModel(precision=precisions["WhisperModel"]),
+        "KokoroModel": lambda: KokoroModel(
+            preload_languages=tuple(Language), precision=precisions["KokoroModel"]
+        ),
+        "QwenCausalLM": lambda: QwenCausalLM.get_instance(
+            max_batch_size=_qwen_max_batch_size(),
+            precision=precisions["QwenCausalLM"],
+        ),
+    }
+    unknown = set(precisions) - set(factories)
+    if unknown:
+        raise ValueError(f"MODEL_PRECISION names unknown models: {sorted(unknown)}")
+    for name, factory in factories.items():
+        registry.register(name, factory, lazy=name in lazy)
+
+
+def load_models() -> dict[str, Any]:
+    """Load every model concurrently and wait for all of them."""
+    registry = ModelRegistry()
+    register_models(registry)
+    registry.load_all()
+    models = {name: registry[name] for name in registry}
+    registry.shutdown()
+    return models
+
+
+def create_executors() -> dict[str, ModelExecutor]:
+    return {
+        "SemanticMatcher": ModelExecutor("SemanticMatcher", max_workers=2),
+        "TextTranslator": ModelExecutor(
+            "TextTranslator",
+            max_workers=4,
+            max_pending=64,
+            cpu_bound=_translation_backend() is not GoogleTranslateBackend,
+        ),
+        "WhisperModel": ModelExecutor("WhisperModel", max_pending=32),
+        "KokoroModel": ModelExecutor("KokoroModel", max_queue_wait_s=10.0),
+        # Admits up to two full decode batches of chat replies: one running, one
+        # waiting to join.
+        "QwenCausalLM": ModelExecutor(
+            "QwenCausalLM", max_pending=2 * _qwen_max_batch_size()
+        ),
+        # PyAV decodes and encodes in libav, so it takes no torch threads.
+        "AudioCodec": ModelExecutor(
+            "AudioCodec", max_workers=2, max_pending=32, cpu_bound=False
+        ),
+    }
+
+
+# Per model, the `get_metrics()` entries holding an LRUCache's stats.
+MODEL_CACHES = {
+    "WhisperModel": ("pipeline_cache",),
+    "KokoroModel": ("pipeline_pool",),
+    "QwenCausalLM": ("kv_cache", "prefix_cache"),
+    "SemanticMatcher": ("embedding_cache",),
+}
+
+
+def register_collectors(app: FastAPI) -> None:
+    """Report executor, batcher and cache state on every /metrics scrape."""
+
+    def executors(attribute: str):
+        return lambda: [
+            ({"executor": name}, getattr(executor, attribute))
+            for name, executor in app.state.executor.items()
+        ]
+
+    def batch_queue_depth():
+        for name in ("WhisperModel", "QwenCausalLM"):
+            if app.state.model.is_ready(name):
+                batcher = app.state.model[name].batcher
+                if batcher is not None:
+                    yield {"batcher": name}, batcher.queue_depth
+
+    METRICS.register_collector(
+        "app_executor_pending", "Calls running or queued.", executors("pending")
+    )
+    METRICS.register_collector(
+        "app_executor_rejected_total",
+        "Calls rejected because the queue was full.",
+        executors("rejected"),
+        type="counter",
+    )
+    METRICS.register_collector(
+        "app_executor_timed_out_total",
+        "Calls that waited in the queue too long.",
+        executors("timed_out"),
+        type="counter",
+    )
+
+    def translation_lookups():
+        if app.state.model.is_ready("TextTranslator"):
+            pairs = app.state.model["TextTranslator"].get_metrics()["pairs"]
+            for pair, stats in pairs.items():
+                for result in ("memory_hits", "disk_hits", "misses", "coalesced"):
+                    yield {"pair": pair, "result": result}, stats.get(result, 0)
+
+    METRICS.register_collector(
+        "app_batch_queue_depth", "Requests waiting to join a batch.", batch_queue_depth
+    )
+
+    def model_caches(field: str):
+        def collect():
+            for name, caches in MODEL_CACHES.items():
+                if app.state.model.is_ready(name):
+                    metrics = app.state.model[name].get_metrics()
+                    for cache in caches:
+                        yield {"model": name, "cache": cache}, metrics[cache][field]
+
+        return collect
+
+    for field, help in (
+        ("hits", "Model cache lookups that found an entry."),
+        ("misses", "Model cache lookups that had to build the entry."),
+        ("evictions", "Entries evicted from a model cache."),
+    ):
+        METRICS.register_collector(
+            f"app_model_cache_{field}_total", help, model_caches(field), type="counter"
+        )
+    METRICS.register_collector(
+        "app_model_cache_entries",
+        "Entries held by a model cache.",
+        model_caches("size"),
+    )
+    METRICS.register_collector(
+        "app_translation_lookups_total",
+        "Translations by language pair and where they came from.",
+        translation_lookups,
+        type="counter",
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.model = {
-        "SemanticMatcher": SemanticMatcher(),
-        "TextTranslator": TextTranslator(),
-        "WhisperModel": WhisperModel(),
-        "KokoroModel": KokoroModel(),
-    }
+    # Executors are per process: threads do not survive a fork.
+    app.state.executor = create_executors()
+    # TTS_CACHE_DIR adds a disk tier shared by workers (and by app/prerender.py).
+    app.state.speech_cache = SpeechCache(cache_dir=os.environ.get("TTS_CACHE_DIR"))
+    # Worker processes (uvicorn --workers or app/serve.py) split the cores too.
+    processes = int(os.environ.get("WEB_CONCURRENCY", 1))
+    partition_torch_threads(
+        app.state.executor.values(), cpu_count=(os.cpu_count() or 1) // processes
+    )
+
+    # Models load in the background; the server accepts traffic right away and
+    # /readyz reports when they are done.
+    registry = ModelRegistry()
+    if core_models:
+        for name, model in core_models.items():
+            registry.add(name, model)
+    else:
+        register_models(registry)
+    whisper_pool = app.state.executor["WhisperModel"].pool
+    registry.when_ready("WhisperModel", lambda model: model.use_executor(whisper_pool))
+    registry.start()
+    app.state.model = registry
+    await app.state.executor["AudioCodec"].run(endpoints.audio_encoder.warm_up)
+    if metrics_enabled():
+        register_collectors(app)
+    if os.environ.get("TRACING_ENABLED") == "1":
+        enable_tracing()
     yield
-    app.state.model.clear()
+    if registry.is_ready("QwenCausalLM"):
+        registry["QwenCausalLM"].close()
+    registry.shutdown()
+    for executor in app.state.executor.values():
+        executor.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -36,4 +267,77 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Id", "X-Sample-Rate", "Server-Timing"],
 )
+
+
+request_duration = METRICS.histogram("app_request_duration_seconds")
+
+
+async def record_request_metrics(request: Request, call_next):
+    """Time every request into a per-route histogram, inside a trace span.
+
+    The clock stops and the span ends once the last body chunk is sent, so
+    streaming routes (chat, streamed TTS) report the whole response rather than
+    the time to headers.
+    """
+    started_at = time.perf_counter()
+    request_span = start_span(f"{request.method} {request.url.path}")
+
+    def observe(status_code: int) -> None:
+        route = request.scope.get("route")
+        request_duration.observe(
+            time.perf_counter() - started_at,
+            (
+                ("method", request.method),
+                ("route", route.path if route else "unmatched"),
+                ("status", str(status_code)),
+            ),
+        )
+        if request_span is not None:
+            request_span.end()
+
+    try:
+        with activate(request_span):
+            response = await call_next(request)
+    except BaseException:
+        observe(500)
+        raise
+
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            observe(response.status_code)
+
+    response.body_iterator = timed_body()
+    return response
+
+
+# The middleware wraps every response body, so it is left out entirely when
+# METRICS_ENABLED=0 rather than skipped per request.
+if metrics_enabled():
+    app.middleware("http")(record_request_metrics)
+
+
+@app.exception_handler(ExecutorOverloadedError)
+async def executor_overloaded_handler(request: Request, exc: ExecutorOverloadedError):
+    # A full queue asks the client to back off; a stale queue means we are degraded.
+    status_code = 429 if isinstance(exc, ExecutorBusyError) else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(ModelNotReadyError)
+async def model_not_ready_handler(request: Request, exc: ModelNotReadyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "5"},
+    )
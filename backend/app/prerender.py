@@ -0,0 +1,61 @@
+"""Pre-render lesson audio into the TTS cache ahead of time.
+
+    TTS_CACHE_DIR=/var/cache/tts python -m app.prerender --formats webm wav
+
+Synthesizes every vocabulary word and grammar example of every lesson and
+stores the encoded clips in the disk cache the server reads (TTS_CACHE_DIR),
+so learners never wait on Kokoro for lesson content. Clips that are already
+cached are skipped, so re-running after adding a lesson only renders the new
+phrases.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from app.lessons.library import LESSONS, lesson_phrases
+from app.util.codec import MEDIA_TYPES, AudioEncoder
+from app.util.languages import Language
+from app.util.model import KokoroModel
+from app.util.speech_cache import SpeechCache, prerender
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cache-dir", default=os.environ.get("TTS_CACHE_DIR"))
+    parser.add_argument(
+        "--formats", nargs="+", choices=list(MEDIA_TYPES), default=["webm"]
+    )
+    parser.add_argument("--voice", default="af_heart")
+    parser.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    if not args.cache_dir:
+        parser.error("--cache-dir or TTS_CACHE_DIR is required")
+    return args
+
+
+def main(argv: list[str]) -> None:
+    args = parse_args(argv)
+    cache = SpeechCache(cache_dir=args.cache_dir)
+    model = KokoroModel(preload_languages=(Language.MANDARIN,))
+    encoder = AudioEncoder()
+
+    for lesson in LESSONS:
+        started_at = time.perf_counter()
+        rendered = prerender(
+            cache,
+            model,
+            encoder,
+            lesson_phrases(lesson),
+            Language.MANDARIN,
+            voice=args.voice,
+            speed=args.speed,
+            formats=args.formats,
+        )
+        elapsed = time.perf_counter() - started_at
+        print(f"{lesson['name']}: rendered {rendered} phrases in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,152 @@
+"""Pre-forking server: load every model once, then fork workers that share it.
+
+    python -m app.serve --workers 4 --port 8000
+
+The parent process loads the models, freezes them for inference and forks
+`--workers` uvicorn servers that accept on one shared socket. Each worker runs
+`lifespan` as usual but reuses the parent's models instead of loading its own:
+the weights stay in the parent's pages, shared copy-on-write and never
+written, so resident memory grows by far less than a model set per worker.
+Executors and batching threads are created after the fork, per worker.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+from typing import Any, Iterator
+
+import torch
+import uvicorn
+
+from app import main
+from app.util.precision import module_nbytes
+
+
+def _iter_modules(value: Any, depth: int = 0) -> Iterator[torch.nn.Module]:
+    """Find the torch modules held by a model wrapper (attributes, dicts, tuples)."""
+    if isinstance(value, torch.nn.Module):
+        yield value
+    elif depth > 2:
+        return
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_modules(item, depth + 1)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _iter_modules(item, depth + 1)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        for item in vars(value).values():
+            yield from _iter_modules(item, depth + 1)
+
+
+def freeze_model_weights(models: dict[str, Any]) -> int:
+    """Put every module in inference mode so forked workers never write its weights.
+
+    Fork already shares the parent's pages copy-on-write; frozen weights (no
+    gradients, eval mode) stay that way. Returns the weight bytes, counting
+    packed quantized weights, which are neither parameters nor buffers.
+    """
+    weight_bytes = 0
+    seen: set[int] = set()
+    for model in models.values():
+        for module in _iter_modules(model):
+            if id(module) in seen:
+                continue
+            seen.add(id(module))
+            module.eval().requires_grad_(False)
+            weight_bytes += module_nbytes(module)
+    return weight_bytes
+
+
+def memory_usage(pid: int | str = "self") -> dict[str, int]:
+    """Resident memory of a process in bytes, split into shared and private pages.
+
+    Read from /proc/<pid>/smaps_rollup (Linux only). `pss` charges each shared
+    page to the processes mapping it in equal parts, so summing it over the
+    workers gives the real total.
+    """
+    fields: dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0]) * 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def _format_memory(usage: dict[str, int]) -> str:
+    return ", ".join(f"{name} {value / 2**20:.0f} MiB" for name, value in usage.items())
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, log_level: str) -> None:
+    if os.path.exists("/proc/self/smaps_rollup"):
+        usage = _format_memory(memory_usage())
+        print(f"Worker {os.getpid()} started: {usage}", flush=True)
+    config = uvicorn.Config(main.app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int, log_level: str = "info") -> None:
+    main.core_models.update(main.load_models())
+    weight_bytes = freeze_model_weights(main.core_models)
+    print(f"Loaded models once; {weight_bytes / 2**20:.0f} MiB of weights shared")
+
+    # Move everything allocated so far out of the GC's reach: collections in the
+    # workers would otherwise touch (and copy) every page holding those objects.
+    gc.collect()
+    gc.freeze()
+
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    sock = _bind_socket(host, port)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(sock, log_level)
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for pid in children:
+        os.waitpid(pid, 0)
+    sock.close()
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    serve(args.host, args.port, args.workers, args.log_level)
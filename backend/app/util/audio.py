@@ -1,6 +1,4 @@
-import math
-import queue
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 import numpy as np
 import sounddevice as sd  # type: ignore
@@ -8,63 +6,86 @@ from scipy.io.wavfile import read, write  # type: ignore
 from sounddevice import CallbackFlags
 
 from .model import AudioData
+from .vad import AudioRingBuffer, VoiceActivityDetector
 
 
 class VoiceRecorder:
+    """Records from the microphone until the speaker stops talking.
+
+    The input callback copies each frame straight into a preallocated
+    `AudioRingBuffer`, and a frame-level `VoiceActivityDetector` ends the
+    recording `hangover_ms` after the last speech frame.
+    """
+
     def __init__(self):
-        self.audio_block_queue = queue.Queue()
+        self.ring_buffer: AudioRingBuffer | None = None
 
     def _record_callback(
         self, indata: np.ndarray, frames: int, time: Any, status: CallbackFlags
     ) -> None:
         if status:
             print(status)
-        self.audio_block_queue.put(indata.copy())
-
-    def _is_silence_detected(
-        self, block: np.ndarray, silence_threshold: float = 0.01
-    ) -> bool:
-        rms = np.sqrt(np.mean(block**2))
-        silence_detected = rms < silence_threshold
-
-        if silence_detected:
-            print("> Silence detected!")
-            return True
-        return False
+        self.ring_buffer.write(indata[:, 0])  # type: ignore
 
-    def record(
+    def stream(
         self,
-        file_name: Optional[str] = None,
         sampling_rate: int = 24000,
-        block_duration: float = 1.0,
-        buffer_duration: int = 5,
-    ) -> dict:
-        block_size = int(block_duration * sampling_rate)
-        min_recorded_blocks = math.ceil(buffer_duration / block_duration)
-        audio_blocks = []
+        frame_ms: float = 20,
+        hangover_ms: float = 300,
+        start_timeout: float = 5.0,
+        max_duration: float = 30.0,
+    ) -> Iterator[np.ndarray]:
+        """Yield mono audio as it is recorded, until the end of speech.
+
+        Consumers such as `StreamingTranscriber` can start on the first frames
+        instead of waiting for the whole utterance. Yielded arrays are views of
+        the ring buffer; copy them to keep them past `max_duration` of audio.
+        Recording stops `hangover_ms` after speech ends, `start_timeout` seconds
+        in if nobody has started speaking, or after `max_duration` seconds.
+        """
+        frame_size = int(sampling_rate * frame_ms / 1000)
+        max_samples = int(max_duration * sampling_rate)
+        start_timeout_samples = int(start_timeout * sampling_rate)
+        self.ring_buffer = AudioRingBuffer(max_samples)
+        detector = VoiceActivityDetector(sampling_rate, frame_ms, hangover_ms)
+        recorded = 0
 
         print("> Recording stream start...")
         with sd.InputStream(
             samplerate=sampling_rate,
             channels=1,
-            blocksize=block_size,
+            dtype="float32",
+            blocksize=frame_size,
             callback=self._record_callback,
         ):
-            while True:
-                next_audio_block = self.audio_block_queue.get()
-                audio_blocks.append(next_audio_block)
-                min_recorded_blocks -= 1
-
-                print(f"> Total recorded blocks: {len(audio_blocks)}")
-
-                if (
-                    self._is_silence_detected(next_audio_block)
-                    and min_recorded_blocks <= 0
-                ):
-                    print("> Recording stopped!")
+            while recorded < max_samples:
+                samples = self.ring_buffer.read(timeout=frame_ms / 1000 * 10)
+                if not len(samples):
+                    continue
+                recorded += len(samples)
+                yield samples
+
+                if detector.process(samples):
+                    print("> End of speech detected, recording stopped!")
+                    break
+                if not detector.speech_started and recorded >= start_timeout_samples:
+                    print("> No speech detected, recording stopped!")
                     break
 
-        full_audio_data = np.concatenate(audio_blocks, axis=0)[:, 0]
+    def record(
+        self,
+        file_name: Optional[str] = None,
+        sampling_rate: int = 24000,
+        frame_ms: float = 20,
+        hangover_ms: float = 300,
+        start_timeout: float = 5.0,
+        max_duration: float = 30.0,
+    ) -> dict:
+        for _ in self.stream(
+            sampling_rate, frame_ms, hangover_ms, start_timeout, max_duration
+        ):
+            pass
+        full_audio_data = self.ring_buffer.contents()  # type: ignore
 
         if file_name:
             write(file_name, sampling_rate, full_audio_data)
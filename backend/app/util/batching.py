@@ -0,0 +1,145 @@
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+from .metrics import LatencyStats
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class _PendingRequest(Generic[T]):
+    key: Hashable
+    item: T
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects requests that arrive within a short window and runs them as one batch.
+
+    Requests are grouped by `key`; only requests with the same key share a batch.
+    `process_batch(key, items)` must return one result per item, in order, and is
+    run in `executor` (the loop's default if None) so it does not block the event
+    loop.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[Any, list[T]], list[R]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        executor: Executor | None = None,
+        name: str = "batch",
+    ):
+        self.process_batch = process_batch
+        self.name = name
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending: deque[_PendingRequest[T]] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._worker: asyncio.Task | None = None
+
+        self.batch_size_histogram: Counter[int] = Counter()
+        self.wait_stats = LatencyStats("app_batch_wait_seconds", batcher=name)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    async def submit(self, key: Hashable, item: T) -> R:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingRequest(key, item, future, time.perf_counter()))
+        self._wakeup.set()  # type: ignore
+        return await future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    def _take_batch(self) -> list[_PendingRequest[T]]:
+        key = self._pending[0].key
+        batch: list[_PendingRequest[T]] = []
+        deferred: deque[_PendingRequest[T]] = deque()
+        while self._pending and len(batch) < self.max_batch_size:
+            request = self._pending.popleft()
+            if request.future.done():  # caller went away
+                continue
+            if request.key == key:
+                batch.append(request)
+            else:
+                deferred.append(request)
+        deferred.extend(self._pending)
+        self._pending = deferred
+        return batch
+
+    async def _fill_window(self) -> None:
+        deadline = self._pending[0].enqueued_at + self.max_wait
+        while len(self._pending) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            self._wakeup.clear()  # type: ignore
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)  # type: ignore
+            except asyncio.TimeoutError:
+                return
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                self._wakeup.clear()  # type: ignore
+                await self._wakeup.wait()  # type: ignore
+                continue
+
+            await self._fill_window()
+            batch = self._take_batch()
+            if not batch:
+                continue
+
+            started_at = time.perf_counter()
+            for request in batch:
+                self.wait_stats.observe(started_at - request.enqueued_at)
+            self.batch_size_histogram[len(batch)] += 1
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor,
+                    self.process_batch,
+                    batch[0].key,
+                    [r.item for r in batch],
+                )
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "batch_size_histogram": dict(self.batch_size_histogram),
+            "wait": self.wait_stats.summary(),
+        }
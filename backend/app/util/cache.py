@@ -0,0 +1,281 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Thread-safe least-recently-used cache with hit/miss/eviction counters.
+
+    Entries are evicted once there are more than `max_size` of them or, when a
+    `weigher` is given, once their combined weight exceeds `max_weight`.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_weight: int | None = None,
+        weigher: Callable[[V], int] | None = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if (max_weight is None) != (weigher is None):
+            raise ValueError("max_weight and weigher must be given together")
+
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.weight = 0
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._weights: dict[K, int] = dict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: K, value: V) -> None:
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = value
+            if self.weigher is not None:
+                self._weights[key] = self.weigher(value)
+                self.weight += self._weights[key]
+
+            while len(self._entries) > self.max_size or self._is_overweight():
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _is_overweight(self) -> bool:
+        return self.max_weight is not None and self.weight > self.max_weight
+
+    def _remove(self, key: K) -> V | None:
+        self.weight -= self._weights.pop(key, 0)
+        return self._entries.pop(key, None)
+
+    def get_or_create(self, key: K, factory: Callable[[], V]) -> V:
+        """Return the cached value for `key`, building it with `factory` on a miss.
+
+        The factory runs outside the lock so a slow build does not block lookups
+        for other keys.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = factory()
+        with self._lock:
+            existing = self._entries.get(key)
+        if existing is not None:
+            return existing
+
+        self.put(key, value)
+        return value
+
+    def pop(self, key: K) -> V | None:
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._weights.clear()
+            self.weight = 0
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "weight": self.weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SqliteStore:
+    """Persistent string-keyed store backed by a single SQLite table.
+
+    Used as a second cache tier that survives restarts. Values may be `str` or
+    `bytes`; there is no eviction, so callers should only store bounded content.
+    """
+
+    def __init__(self, path: str, table: str = "entries"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+
+        self.path = path
+        self.table = table
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            cursor = self._connection.execute(f"SELECT COUNT(*) FROM {self.table}")
+            return cursor.fetchone()[0]
+
+    def get(self, key: str) -> str | bytes | None:
+        with self._lock:
+            cursor = self._connection.execute(
+                f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+            )
+            row = cursor.fetchone()
+        return None if row is None else row[0]
+
+    def put(self, key: str, value: str | bytes) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class FileStore:
+    """Directory of files named by key, evicting least-recently-used past `max_bytes`.
+
+    Keys must be filename-safe (e.g. hex digests). Reads refresh a file's mtime,
+    which doubles as its recency, so the LRU order survives restarts. Files are
+    written to a temporary name and renamed, so readers in other processes never
+    see a partial file. Several processes may share the directory: every write
+    measures the directory itself before evicting, so files written by the
+    others count against `max_bytes` too. `size` and `len()` are as of the last
+    measurement.
+    """
+
+    def __init__(self, path: str, max_bytes: int, suffix: str = ""):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.evictions = 0
+        self.size = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        with self._lock:
+            self._scan()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _file(self, key: str) -> str:
+        if not key or os.sep in key or key.startswith("."):
+            raise ValueError(f"Invalid key: {key!r}")
+        return os.path.join(self.path, key + self.suffix)
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        """Measure the directory: (mtime, size, path) of every stored file."""
+        files = []
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(self.suffix) or entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # evicted by another process meanwhile
+                continue
+            if entry.is_file():
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        self.size = sum(size for _, size, _ in files)
+        self._count = len(files)
+        return files
+
+    def get(self, key: str) -> bytes | None:
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._file(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        files = self._scan()
+        if self.size <= self.max_bytes:
+            return
+        for _, size, path in sorted(files):
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:  # another process evicted it first
+                pass
+            self.size -= size
+            self._count -= 1
+
+
+class SingleFlight(Generic[K, V]):
+    """Coalesces concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs `fn`; callers that arrive while it is still
+    running block on its result (or exception) instead of repeating the work.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[K, Future] = dict()
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: K, fn: Callable[[], V]) -> V:
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()  # type: ignore
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)  # type: ignore
+            raise
+        else:
+            future.set_result(result)  # type: ignore
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
@@ -0,0 +1,271 @@
+import io
+import struct
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from .metrics import LatencyStats, stage
+
+# Capacity to start from when a container does not declare its duration (e.g.
+# MediaRecorder webm): 30 s of 16 kHz audio, Whisper's window.
+_DEFAULT_DECODE_SECONDS = 30
+
+
+# Flush every muxed packet right away instead of buffering whole clusters/pages.
+_CONTAINER_OPTIONS = {
+    "webm": {"live": "1", "cluster_time_limit": "0"},
+    "ogg": {"page_duration": "20000"},  # microseconds: one Opus frame per page
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since last drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _to_pcm16(samples: np.ndarray) -> bytes:
+    return (np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+class StreamingAudioEncoder:
+    """Incrementally encodes float32 mono segments for a streamed HTTP response.
+
+    "webm" muxes Opus into a live WebM stream whose clusters are flushed with
+    every segment, so a browser can start playback from the first sentence;
+    "ogg" does the same with Ogg pages. "pcm" emits raw signed 16-bit
+    little-endian samples.
+    """
+
+    FORMATS = {
+        "webm": "audio/webm",
+        "ogg": "audio/ogg",
+        "pcm": "application/octet-stream",
+    }
+
+    def __init__(self, format: str, sample_rate: int):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported audio format: {format}")
+
+        self.format = format
+        self.sample_rate = sample_rate
+        self.media_type = self.FORMATS[format]
+        self._pts = 0
+        self._container = None
+        if format != "pcm":
+            import av
+
+            self._sink = _ChunkSink()
+            self._container = av.open(
+                self._sink,
+                "w",
+                format=format,
+                options=_CONTAINER_OPTIONS[format],
+            )
+            self._stream = self._container.add_stream("libopus", rate=sample_rate)
+            self._stream.layout = "mono"
+
+    def encode(self, samples: np.ndarray) -> bytes:
+        """Encode one segment and return the bytes that are ready to send."""
+        if self._container is None:
+            return _to_pcm16(samples)
+
+        import av
+
+        frame = av.AudioFrame.from_ndarray(
+            np.ascontiguousarray(samples, dtype=np.float32)[np.newaxis, :],
+            format="flt",
+            layout="mono",
+        )
+        frame.sample_rate = self.sample_rate
+        frame.pts = self._pts
+        self._pts += len(samples)
+        for packet in self._stream.encode(frame):
+            self._container.mux(packet)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        """Flush the encoder and return the trailing bytes of the stream."""
+        if self._container is None:
+            return b""
+
+        for packet in self._stream.encode(None):
+            self._container.mux(packet)
+        self._container.close()
+        return self._sink.drain()
+
+
+def decode_audio(data: bytes, sample_rate: int = 16000) -> np.ndarray:
+    """Decode a compressed clip (webm/Opus, ogg, mp3, wav, ...) in-process.
+
+    Returns float32 mono samples at `sample_rate`, written frame by frame into
+    one preallocated buffer that is only regrown if the container under-reports
+    its duration.
+    """
+    import av
+
+    with stage("audio_decode").time(), av.open(io.BytesIO(data), "r") as container:
+        if not container.streams.audio:
+            raise ValueError("No audio stream found")
+        stream = container.streams.audio[0]
+        if stream.duration is not None and stream.time_base is not None:
+            duration = float(stream.duration * stream.time_base)
+        elif container.duration is not None:
+            duration = container.duration / av.time_base
+        else:
+            duration = _DEFAULT_DECODE_SECONDS
+
+        buffer = np.empty(int(duration * sample_rate) + sample_rate, dtype=np.float32)
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+        length = 0
+
+        def append(frames) -> None:
+            nonlocal buffer, length
+            for frame in frames:
+                samples = frame.to_ndarray()[0]
+                if length + len(samples) > len(buffer):
+                    buffer = np.resize(buffer, 2 * (length + len(samples)))
+                buffer[length : length + len(samples)] = samples
+                length += len(samples)
+
+        for frame in container.decode(stream):
+            append(resampler.resample(frame))
+        append(resampler.resample(None))
+
+    return buffer[:length]
+
+
+# Accept media types for each format; the first one is sent as Content-Type.
+# Raw PCM is little-endian, so it is not offered as audio/L16 (big-endian per
+# RFC 2586); the sample rate travels in the X-Sample-Rate header.
+MEDIA_TYPES = {
+    "webm": ("audio/webm",),
+    "ogg": ("audio/ogg", "audio/opus"),
+    "wav": ("audio/wav", "audio/wave", "audio/x-wav"),
+    "pcm": ("application/octet-stream",),
+}
+
+
+def negotiate_format(accept: str | None, default: str = "webm") -> str | None:
+    """Pick the output format for an `Accept` header, or None if none is acceptable.
+
+    Wildcards stand for the formats the header doesn't name: `default` unless it
+    is named itself (e.g. refused with q=0), else the first unnamed format. Among
+    the candidates the highest q-value wins, ties going to the earlier entry.
+    """
+    if not accept:
+        return default
+
+    entries = []
+    for entry in accept.split(","):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_type = media_type.lower()
+        format = next(
+            (format for format, types in MEDIA_TYPES.items() if media_type in types),
+            None,
+        )
+        entries.append((media_type, format, q))
+
+    named = {format for _, format, _ in entries if format is not None}
+    unnamed = [format for format in MEDIA_TYPES if format not in named]
+    wildcard = default if default not in named else next(iter(unnamed), None)
+
+    best, best_q = None, 0.0
+    for media_type, format, q in entries:
+        if media_type in ("*/*", "audio/*"):
+            format = wildcard
+        if format is not None and q > best_q:
+            best, best_q = format, q
+    return best
+
+
+@dataclass
+class EncodedAudio:
+    data: bytes
+    media_type: str
+    extension: str
+    cpu_seconds: float
+
+
+class AudioEncoder:
+    """Encodes whole clips in-process and records the CPU time spent per format.
+
+    "wav" and "pcm" skip compression entirely; "webm" and "ogg" are Opus.
+    """
+
+    def __init__(self):
+        self.stats = {
+            format: LatencyStats("app_encode_cpu_seconds", format=format)
+            for format in MEDIA_TYPES
+        }
+
+    def warm_up(self, sample_rate: int = 24000) -> None:
+        """Load the Opus encoder and muxers now rather than on the first request."""
+        silence = np.zeros(sample_rate // 10, dtype=np.float32)
+        for format in ("webm", "ogg"):
+            self._encode(silence, sample_rate, format)
+
+    def _encode(self, samples: np.ndarray, sample_rate: int, format: str) -> bytes:
+        if format == "wav":
+            pcm = _to_pcm16(samples)
+            header = struct.pack(
+                "<4sI4s4sIHHIIHH4sI",
+                b"RIFF",
+                36 + len(pcm),
+                b"WAVE",
+                b"fmt ",
+                16,
+                1,  # PCM
+                1,  # mono
+                sample_rate,
+                sample_rate * 2,
+                2,
+                16,
+                b"data",
+                len(pcm),
+            )
+            return header + pcm
+        encoder = StreamingAudioEncoder(format, sample_rate)
+        return encoder.encode(samples) + encoder.close()
+
+    def encode(
+        self, samples: np.ndarray, sample_rate: int, format: str
+    ) -> EncodedAudio:
+        if format not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported audio format: {format}")
+
+        started_at = time.thread_time()
+        data = self._encode(samples, sample_rate, format)
+        cpu_seconds = time.thread_time() - started_at
+        self.stats[format].observe(cpu_seconds)
+        return EncodedAudio(data, MEDIA_TYPES[format][0], format, cpu_seconds)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            format: {"cpu": stats.summary()}
+            for format, stats in self.stats.items()
+            if stats.count
+        }
@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterable, TypeVar
+
+from .metrics import LatencyStats
+
+R = TypeVar("R")
+
+
+class ExecutorOverloadedError(Exception):
+    """Raised when a model executor cannot take on more work."""
+
+    def __init__(self, name: str, message: str):
+        super().__init__(f"{name}: {message}")
+        self.name = name
+
+
+class ExecutorBusyError(ExecutorOverloadedError):
+    """Every worker is busy and the executor's queue is full."""
+
+
+class ExecutorTimeoutError(ExecutorOverloadedError):
+    """A request waited in the queue longer than the executor allows."""
+
+
+class ModelExecutor:
+    """Runs one model's blocking inference on its own bounded thread pool.
+
+    At most `max_workers` calls run at once and at most `max_pending` calls
+    (running plus queued) are admitted; further calls fail fast with
+    `ExecutorBusyError`. Queued calls that wait longer than `max_queue_wait_s`
+    fail with `ExecutorTimeoutError` instead of running late.
+
+    `cpu_bound` executors count towards the torch thread budget split by
+    `partition_torch_threads`; set it to False for network-bound work.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 1,
+        max_pending: int = 16,
+        max_queue_wait_s: float | None = None,
+        cpu_bound: bool = True,
+    ):
+        if max_pending < max_workers:
+            raise ValueError("max_pending must be at least max_workers")
+
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_queue_wait = max_queue_wait_s
+        self.cpu_bound = cpu_bound
+        self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix=name)
+
+        self.pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_stats = LatencyStats("app_executor_wait_seconds", executor=name)
+        self.run_stats = LatencyStats("app_executor_run_seconds", executor=name)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold one pending slot, for work that offloads itself (e.g. a batcher)."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorBusyError(self.name, "too many pending requests")
+
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    async def run(self, fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """Await `fn(*args, **kwargs)` on this executor's pool."""
+        async with self.admit():
+            return await self.run_admitted(fn, *args, **kwargs)
+
+    async def run_admitted(self, fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """Like `run`, for a caller that already holds a slot from `admit()`."""
+        enqueued_at = time.perf_counter()
+
+        def call() -> R:
+            waited = time.perf_counter() - enqueued_at
+            self.wait_stats.observe(waited)
+            if self.max_queue_wait is not None and waited > self.max_queue_wait:
+                self.timed_out += 1
+                raise ExecutorTimeoutError(self.name, "timed out waiting in queue")
+
+            with self.run_stats.time():
+                return fn(*args, **kwargs)
+
+        # Carry the caller's context (e.g. the current trace span) into the worker.
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, context.run, call)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait": self.wait_stats.summary(),
+            "run": self.run_stats.summary(),
+        }
+
+
+def partition_torch_threads(
+    executors: Iterable[ModelExecutor], cpu_count: int | None = None
+) -> int:
+    """Split the cores between CPU-bound workers so pools don't oversubscribe them.
+
+    Torch's intra-op pool is process-wide, so each concurrent inference gets
+    `cpu_count // workers` threads. Returns the thread count that was set.
+    """
+    import torch
+
+    workers = sum(e.max_workers for e in executors if e.cpu_bound)
+    threads = max(1, (cpu_count or os.cpu_count() or 1) // max(1, workers))
+    torch.set_num_threads(threads)
+    return threads
@@ -0,0 +1,376 @@
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable
+
+from .metrics import LatencyStats
+
+# torch and transformers are imported where they are used, as in model.py.
+if TYPE_CHECKING:
+    import torch
+    from transformers import DynamicCache
+
+
+@dataclass
+class GenerationRequest:
+    """One reply to generate. `past_key_values` may already cover a prefix of
+    `input_ids`; on completion it holds the cache for `output_ids`.
+
+    `on_done(request)` runs on the generating thread once the request has
+    finished (successfully, cancelled or failed), before `wait()` returns.
+    """
+
+    input_ids: "torch.Tensor"
+    past_key_values: "DynamicCache"
+    max_new_tokens: int
+    temperature: float = 0.7
+    top_p: float = 0.9
+    do_sample: bool = True
+    streamer: Any = None
+    on_done: Callable[["GenerationRequest"], None] | None = None
+
+    generated_ids: list[int] = field(default_factory=list)
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    done: threading.Event = field(default_factory=threading.Event)
+    error: BaseException | None = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def output_ids(self) -> "torch.Tensor":
+        import torch
+
+        generated = torch.tensor(self.generated_ids, dtype=self.input_ids.dtype)
+        return torch.cat([self.input_ids[0].cpu(), generated])
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.error = error
+        if self.on_done is not None:
+            try:
+                self.on_done(self)
+            except Exception as e:
+                self.error = self.error or e
+        self.done.set()
+
+    def wait(self) -> None:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+
+def _left_pad(tensor: "torch.Tensor", length: int, dim: int) -> "torch.Tensor":
+    import torch
+
+    missing = length - tensor.shape[dim]
+    if missing == 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+class ContinuousBatcher:
+    """Iteration-level scheduler that decodes many requests in one running batch.
+
+    Every step runs a single forward pass over the next token of each active
+    request. New requests are prefilled on their own and merged into the batch
+    between steps; finished ones leave without waiting for the rest. Rows are
+    left-padded to a common cache length and masked out with the attention mask.
+    """
+
+    def __init__(self, model, eos_token_ids: set[int], max_batch_size: int = 16):
+        self.model = model
+        self.eos_token_ids = eos_token_ids
+        self.max_batch_size = max_batch_size
+
+        config = model.generation_config
+        self.top_k = config.top_k or 0
+        self.repetition_penalty = config.repetition_penalty or 1.0
+
+        self._waiting: queue.Queue[GenerationRequest | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+        self._reset_batch()
+
+        self.generated_tokens = 0
+        self.busy_seconds = 0.0
+        self.batch_size_histogram: Counter[int] = Counter()
+        self.queue_wait_stats = LatencyStats(
+            "app_batch_wait_seconds", batcher="QwenCausalLM"
+        )
+        self.time_to_first_token_stats = LatencyStats("app_time_to_first_token_seconds")
+
+    def _reset_batch(self) -> None:
+        self._rows: list[GenerationRequest] = []
+        self._cache: DynamicCache | None = None
+        self._attention_mask: torch.Tensor | None = None
+        self._next_tokens: torch.Tensor | None = None
+        self._seen_tokens: torch.Tensor | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting.qsize()
+
+    def submit(self, request: GenerationRequest) -> GenerationRequest:
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._waiting.put(request)
+        return request
+
+    def close(self) -> None:
+        """Stop the scheduler thread once the requests already queued are done."""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._waiting.put(None)
+                self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        import torch
+
+        # Grad mode is per thread, so this covers every forward pass below.
+        torch.set_grad_enabled(False)
+        closing = False
+        while not closing or self._rows:
+            while not closing and len(self._rows) < self.max_batch_size:
+                try:
+                    request = self._waiting.get(block=not self._rows)
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                else:
+                    self._admit(request)
+
+            if self._rows:
+                try:
+                    self._step()
+                except Exception as e:
+                    for request in self._rows:
+                        self._finish(request, error=e)
+                    self._reset_batch()
+
+    def _sample(self, logits: "torch.Tensor", rows: list[GenerationRequest], seen):
+        import torch
+
+        logits = logits.float()
+        if self.repetition_penalty != 1.0:
+            penalized = torch.where(
+                logits > 0,
+                logits / self.repetition_penalty,
+                logits * self.repetition_penalty,
+            )
+            logits = torch.where(seen, penalized, logits)
+
+        greedy = logits.argmax(dim=-1)
+        if not any(request.do_sample for request in rows):
+            return greedy
+
+        device = logits.device
+        temperature = torch.tensor(
+            [max(r.temperature, 1e-5) for r in rows], device=device
+        )
+        top_p = torch.tensor([r.top_p for r in rows], device=device)
+        logits = logits / temperature[:, None]
+
+        if self.top_k:
+            kth_largest = logits.topk(min(self.top_k, logits.shape[-1])).values[:, -1:]
+            logits = logits.masked_fill(logits < kth_largest, float("-inf"))
+
+        sorted_logits, sorted_ids = logits.sort(dim=-1, descending=True)
+        probs = sorted_logits.softmax(dim=-1)
+        outside_top_p = probs.cumsum(dim=-1) - probs > top_p[:, None]
+        sorted_logits = sorted_logits.masked_fill(outside_top_p, float("-inf"))
+        choice = torch.multinomial(sorted_logits.softmax(dim=-1), num_samples=1)
+        sampled = sorted_ids.gather(1, choice).squeeze(1)
+
+        do_sample = torch.tensor([r.do_sample for r in rows], device=device)
+        return torch.where(do_sample, sampled, greedy)
+
+    def _admit(self, request: GenerationRequest) -> None:
+        """Prefill `request` and merge it into the running batch."""
+        import torch
+
+        started_at = time.perf_counter()
+        self.queue_wait_stats.observe(started_at - request.enqueued_at)
+        if request.cancelled.is_set():
+            self._finish(request)
+            return
+
+        try:
+            cache = request.past_key_values
+            cached_length = cache.get_seq_length()  # type: ignore[attr-defined]
+            input_ids = request.input_ids[:, cached_length:]
+            output = self.model(
+                input_ids=input_ids,
+                past_key_values=cache,
+                use_cache=True,
+                cache_position=torch.arange(
+                    cached_length, request.input_ids.shape[-1], device=input_ids.device
+                ),
+            )
+            seen = torch.zeros(
+                (1, output.logits.shape[-1]), dtype=torch.bool, device=input_ids.device
+            )
+            seen[0, request.input_ids[0]] = True
+            token = self._sample(output.logits[:, -1], [request], seen)
+        except Exception as e:
+            self._finish(request, error=e)
+            return
+        finally:
+            self.busy_seconds += time.perf_counter() - started_at
+
+        self.time_to_first_token_stats.observe(
+            time.perf_counter() - request.enqueued_at
+        )
+        if self._emit(request, int(token[0])):
+            request.past_key_values = cache
+            self._finish(request)
+            return
+
+        seen[0, token] = True
+        self._merge(request, cache, token, seen)
+
+    def _emit(self, request: GenerationRequest, token: int) -> bool:
+        """Record a generated token; return True once the request is finished."""
+        request.generated_ids.append(token)
+        self.generated_tokens += 1
+        if request.streamer is not None:
+            import torch
+
+            request.streamer.put(torch.tensor([token]))
+        return (
+            token in self.eos_token_ids
+            or len(request.generated_ids) >= request.max_new_tokens
+            or request.cancelled.is_set()
+        )
+
+    def _finish(self, request: GenerationRequest, error: BaseException | None = None):
+        if request.streamer is not None:
+            request.streamer.end()
+        request.finish(error)
+
+    def _merge(self, request, cache: "DynamicCache", token, seen) -> None:
+        import torch
+        from transformers import DynamicCache
+
+        row_length = cache.get_seq_length()  # type: ignore[attr-defined]
+        row_mask = torch.ones((1, row_length), dtype=torch.long, device=token.device)
+
+        if (
+            self._cache is None
+            or self._attention_mask is None
+            or self._next_tokens is None
+            or self._seen_tokens is None
+        ):
+            self._rows = [request]
+            self._cache, self._attention_mask = cache, row_mask
+            self._next_tokens, self._seen_tokens = token, seen
+            return
+
+        length = max(row_length, self._cache.get_seq_length())  # type: ignore[attr-defined]
+        layers = [
+            (
+                torch.cat([_left_pad(k, length, 2), _left_pad(row_k, length, 2)]),
+                torch.cat([_left_pad(v, length, 2), _left_pad(row_v, length, 2)]),
+            )
+            for (k, v), (row_k, row_v) in zip(self._cache, cache)  # type: ignore[call-overload]
+        ]
+        self._cache = DynamicCache.from_legacy_cache(tuple(layers))
+        self._attention_mask = torch.cat(
+            [_left_pad(self._attention_mask, length, 1), _left_pad(row_mask, length, 1)]
+        )
+        self._next_tokens = torch.cat([self._next_tokens, token])
+        self._seen_tokens = torch.cat([self._seen_tokens, seen])
+        self._rows.append(request)
+
+    def _step(self) -> None:
+        import torch
+
+        started_at = time.perf_counter()
+        self.batch_size_histogram[len(self._rows)] += 1
+
+        cache_length = self._cache.get_seq_length()  # type: ignore
+        attention_mask = torch.cat(
+            [self._attention_mask, self._attention_mask.new_ones((len(self._rows), 1))],  # type: ignore
+            dim=1,
+        )
+        output = self.model(
+            input_ids=self._next_tokens[:, None],  # type: ignore
+            attention_mask=attention_mask,
+            position_ids=self._attention_mask.sum(dim=1, keepdim=True),  # type: ignore
+            past_key_values=self._cache,
+            use_cache=True,
+            cache_position=torch.tensor([cache_length], device=attention_mask.device),
+        )
+        self._attention_mask = attention_mask
+        tokens = self._sample(output.logits[:, -1], self._rows, self._seen_tokens)
+        self._seen_tokens[torch.arange(len(self._rows)), tokens] = True  # type: ignore
+        self._next_tokens = tokens
+
+        finished = [
+            self._emit(request, int(token))
+            for request, token in zip(self._rows, tokens.tolist())
+        ]
+        if any(finished):
+            self._evict([i for i, is_finished in enumerate(finished) if is_finished])
+
+        self.busy_seconds += time.perf_counter() - started_at
+
+    def _evict(self, indices: list[int]) -> None:
+        """Hand finished rows their own cache and drop them from the batch."""
+        import torch
+        from transformers import DynamicCache
+
+        for i in indices:
+            real_length = int(self._attention_mask[i].sum())  # type: ignore
+            row_cache = DynamicCache.from_legacy_cache(
+                tuple(
+                    (
+                        k[i : i + 1, :, -real_length:].clone(),
+                        v[i : i + 1, :, -real_length:].clone(),
+                    )
+                    for k, v in self._cache  # type: ignore
+                )
+            )
+            self._rows[i].past_key_values = row_cache
+            self._finish(self._rows[i])
+
+        keep = [i for i in range(len(self._rows)) if i not in indices]
+        if not keep:
+            self._reset_batch()
+            return
+
+        index = torch.tensor(keep, device=self._attention_mask.device)  # type: ignore
+        attention_mask = self._attention_mask.index_select(0, index)  # type: ignore
+        # Drop leading columns that are padding for every remaining row.
+        start = int((attention_mask.cumsum(dim=1) == 0).sum(dim=1).min())
+        self._cache = DynamicCache.from_legacy_cache(
+            tuple(
+                (
+                    k.index_select(0, index)[:, :, start:],
+                    v.index_select(0, index)[:, :, start:],
+                )
+                for k, v in self._cache  # type: ignore
+            )
+        )
+        self._attention_mask = attention_mask[:, start:]
+        self._next_tokens = self._next_tokens.index_select(0, index)  # type: ignore
+        self._seen_tokens = self._seen_tokens.index_select(0, index)  # type: ignore
+        self._rows = [self._rows[i] for i in keep]
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "active_requests": len(self._rows),
+            "generated_tokens": self.generated_tokens,
+            "tokens_per_second": (
+                self.generated_tokens / self.busy_seconds if self.busy_seconds else 0.0
+            ),
+            "batch_size_histogram": dict(self.batch_size_histogram),
+            "queue_wait": self.queue_wait_stats.summary(),
+            "time_to_first_token": self.time_to_first_token_stats.summary(),
+        }
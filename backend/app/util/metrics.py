@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterable, Iterator
+
+# Prometheus label set: sorted (name, value) pairs.
+Labels = tuple[tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)  # fmt: skip
+
+HELP = {
+    "app_request_duration_seconds": (
+        "HTTP request latency by route and status, until the whole body is sent."
+    ),
+    "app_stage_duration_seconds": "Latency of one pipeline stage.",
+    "app_executor_wait_seconds": "Time calls waited for a model executor worker.",
+    "app_executor_run_seconds": "Time calls ran on a model executor worker.",
+    "app_batch_wait_seconds": "Time requests waited to join a batch.",
+    "app_time_to_first_token_seconds": "Time from generation request to first token.",
+    "app_encode_cpu_seconds": "CPU time spent encoding one response, by format.",
+}
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label set."""
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # Per label set: [count per bucket (last is +Inf), sum, count].
+        self._series: dict[Labels, list[Any]] = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in self._series.items()
+            ]
+        bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+        for labels, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for le, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels + (("le", le),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """Histograms plus gauges/counters read from callbacks at scrape time."""
+
+    def __init__(self):
+        self._histograms: dict[str, Histogram] = dict()
+        self._collectors: dict[str, tuple[str, str, Callable[[], Iterable]]] = dict()
+        self._lock = threading.Lock()
+
+    def histogram(
+        self, name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, HELP.get(name, name), buckets)
+            return self._histograms[name]
+
+    def register_collector(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Iterable[tuple[dict[str, str], float]]],
+        type: str = "gauge",
+    ) -> None:
+        """Report `collect()`'s (labels, value) pairs as `name` on every scrape."""
+        with self._lock:
+            self._collectors[name] = (help, type, collect)
+
+    def unregister_collector(self, name: str) -> None:
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def render(self) -> str:
+        """The Prometheus text exposition format."""
+        with self._lock:
+            histograms = list(self._histograms.values())
+            collectors = list(self._collectors.items())
+
+        lines = []
+        for histogram in histograms:
+            lines.extend(histogram.render())
+        for name, (help, type, collect) in collectors:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {type}"]
+            for labels, value in collect():
+                lines.append(
+                    f"{name}{_format_labels(tuple(sorted(labels.items())))} {value}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+# METRICS_ENABLED=0 turns histograms off; LatencyStats then only keeps its
+# running totals. TRACING_ENABLED=1 also opens an OpenTelemetry span around
+# every timed stage (configure the exporter with the OpenTelemetry SDK).
+_metrics_enabled = os.environ.get("METRICS_ENABLED", "1") != "0"
+_tracer = None
+
+
+def metrics_enabled() -> bool:
+    return _metrics_enabled
+
+
+def enable_tracing() -> bool:
+    """Start creating trace spans; returns False if opentelemetry is not installed."""
+    global _tracer
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return False
+    _tracer = trace.get_tracer("language-speech-practice")
+    return True
+
+
+def span(name: str, **attributes: Any):
+    """A trace span when tracing is enabled, otherwise a no-op context manager."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def start_span(name: str, **attributes: Any) -> Any:
+    """A trace span the caller ends with `.end()`, or None when tracing is off.
+
+    Unlike `span`, it can outlive the block that started it, e.g. to cover a
+    streamed response body; `activate` makes it the parent of nested spans.
+    """
+    if _tracer is None:
+        return None
+    return _tracer.start_span(name, attributes=attributes)
+
+
+def activate(started_span: Any):
+    """Make a span from `start_span` current, without ending it on exit."""
+    if started_span is None:
+        return nullcontext()
+    from opentelemetry import trace
+
+    return trace.use_span(started_span, end_on_exit=False)
+
+
+class LatencyStats:
+    """Running count, total and max of durations (in seconds) for one stage.
+
+    Given a `metric` name, every observation also feeds that Prometheus
+    histogram under `labels`, and `time()` opens a trace span when tracing is
+    enabled.
+    """
+
+    def __init__(self, metric: str | None = None, **labels: str):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+        self._labels: Labels = tuple(sorted(labels.items()))
+        self._histogram = (
+            METRICS.histogram(metric) if metric and metrics_enabled() else None
+        )
+        self._span_name = (".".join(labels.values()) or metric) if metric else ""
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+        if self._histogram is not None:
+            self._histogram.observe(seconds, self._labels)
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        with span(self._span_name) if self._span_name else nullcontext():
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.observe(time.perf_counter() - start)
+
+    def summary(self) -> dict[str, int | float]:
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "max_seconds": self.max,
+        }
+
+
+def stage(name: str) -> LatencyStats:
+    """The shared `LatencyStats` of pipeline stage `name`."""
+    with _stages_lock:
+        if name not in _stages:
+            _stages[name] = LatencyStats("app_stage_duration_seconds", stage=name)
+        return _stages[name]
+
+
+_stages: dict[str, LatencyStats] = dict()
+_stages_lock = threading.Lock()
@@ -1,25 +1,37 @@
+import copy
+import hashlib
+import re
+import threading
+import unicodedata
 import uuid
+import warnings
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from concurrent.futures import Executor
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
 
-import librosa
 import numpy as np
-import torch
-from deep_translator import GoogleTranslator  # type: ignore
-from kokoro import KPipeline  # type: ignore
-from transformers import (
-    AutoModel,
-    AutoModelForCausalLM,
-    AutoModelForSpeechSeq2Seq,
-    AutoProcessor,
-    AutoTokenizer,
-    BlenderbotForConditionalGeneration,
-    BlenderbotTokenizer,
-    pipeline,
-)
 
+from .batching import MicroBatcher
+from .cache import LRUCache, SingleFlight, SqliteStore
 from .languages import Language
+from .metrics import LatencyStats, stage
+from .precision import Precision, apply_precision, resolve_precision, torch_dtype
+from .session import SessionStore
+
+# torch, transformers, kokoro, librosa and deep_translator are imported where
+# they are used, so importing this module (and starting the app) stays cheap
+# and each model pays only for its own dependencies when it is loaded.
+if TYPE_CHECKING:
+    import torch
+    from transformers import DynamicCache
+
+    from .generation import GenerationRequest
+
+    # Token ids covered by a KV cache, and the cache itself.
+    CachedPrefix = tuple[torch.Tensor, DynamicCache]
 
 
 @dataclass
@@ -28,6 +40,16 @@ class AudioData:
     raw: np.ndarray
 
 
+# Chinese punctuation ends a sentence on its own; Latin punctuation needs a space
+# after it so decimals and abbreviations like "3.5" stay intact.
+_SENTENCE_END = re.compile(r"(?<=[。！？；])\s*|(?<=[.!?;])\s+")
+
+
+def _split_sentences(text: str) -> list[str]:
+    """Split a passage after sentence-ending punctuation (Chinese or Latin)."""
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
+
+
 class WhisperModel:
     LANGUAGE_MODEL_CONFIG = {Language.ENGLISH: "en", Language.MANDARIN: "zh"}
 
@@ -40,10 +62,20 @@ class WhisperModel:
         language: Language = Language.ENGLISH,
         model_id: str = "openai/whisper-tiny",
         device: str = "cpu",
+        max_cached_pipelines: int = 4,
+        batch_max_size: int = 8,
+        batch_window_ms: float = 20.0,
+        executor: Executor | None = None,
+        precision: Precision | str = Precision.FP32,
     ):
         self.LANGUAGE = language
         self.MODEL_ID = model_id
         self.DEVICE = device
+        self.precision = resolve_precision(precision)
+        self.torch_dtype = torch_dtype(self.precision)
+
+        import torch
+        from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
 
         self.processor = AutoProcessor.from_pretrained(self.MODEL_ID)
         self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
@@ -52,30 +84,89 @@ class WhisperModel:
             low_cpu_mem_usage=True,
             use_safetensors=True,
         )
-        self.model.to(self.DEVICE)
+        self.model = apply_precision(self.model.to(self.DEVICE), self.precision)
 
-        self._setup_pipeline(self.LANGUAGE_MODEL_CONFIG[self.LANGUAGE])
+        self.pipeline_cache: LRUCache[tuple[str, str | None], Any] = LRUCache(
+            max_cached_pipelines
+        )
+        # Per instance, so get_metrics() covers only this model; observations
+        # still land in the shared stage histogram.
+        self.pipeline_setup_stats = LatencyStats(
+            "app_stage_duration_seconds", stage="whisper_pipeline_setup"
+        )
+        self.inference_stats = LatencyStats(
+            "app_stage_duration_seconds", stage="whisper_inference"
+        )
+
+        self._get_pipeline(self.TaskValues.TRANSCRIBE.value, self.LANGUAGE)
+
+        self.batcher: MicroBatcher[AudioData, dict[str, Any]] = MicroBatcher(
+            lambda key, inputs: self.run_batch_inference(inputs, *key),
+            max_batch_size=batch_max_size,
+            max_wait_ms=batch_window_ms,
+            executor=executor,
+            name="WhisperModel",
+        )
+
+    def use_executor(self, executor: Executor | None) -> None:
+        """Run batched inference on `executor` (the loop's default if None).
+
+        Lets a model loaded before its executor existed (e.g. in the parent of
+        forked workers) move its batches onto the executor created later.
+        """
+        self.batcher.executor = executor
 
     def _setup_pipeline(self, task: str, language: Language | None = None):
+        from transformers import pipeline
+
         generate_kwargs = {"language": language} if language else {}
         pipe = pipeline(
             task="automatic-speech-recognition",
             model=self.model,
             tokenizer=self.processor.tokenizer,
             feature_extractor=self.processor.feature_extractor,
-            torch_dtype=torch.float32,
+            torch_dtype=self.torch_dtype,
             device=self.DEVICE,
             generate_kwargs={"task": task, **generate_kwargs},
         )
         return pipe
 
+    def _get_task_key(
+        self, task: str | TaskValues, language: Language | None
+    ) -> tuple[str, str | None]:
+        task_value = task.value if isinstance(task, self.TaskValues) else task
+        if isinstance(language, Language):
+            return task_value, language.value
+        return task_value, language
+
+    def _get_pipeline(self, task: str | TaskValues, language: Language | None = None):
+        """Return the ASR pipeline for (task, language), building it on first use."""
+        key = self._get_task_key(task, language)
+
+        def build():
+            with self.pipeline_setup_stats.time():
+                return self._setup_pipeline(*key)  # type: ignore
+
+        return self.pipeline_cache.get_or_create(key, build)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "pipeline_cache": self.pipeline_cache.stats(),
+            "pipeline_setup": self.pipeline_setup_stats.summary(),
+            "inference": self.inference_stats.summary(),
+            "batching": self.batcher.get_metrics(),
+        }
+
     def _resample_audio(self, input: AudioData, target_sample_rate: int) -> AudioData:
         if input.sampling_rate == target_sample_rate:
             return input
 
-        data = librosa.resample(
-            input.raw, orig_sr=input.sampling_rate, target_sr=target_sample_rate
-        )
+        import librosa
+
+        with stage("whisper_resample").time():
+            data = librosa.resample(
+                input.raw, orig_sr=input.sampling_rate, target_sr=target_sample_rate
+            )
         return AudioData(target_sample_rate, data)
 
     def run_inference(
@@ -90,40 +181,129 @@ class WhisperModel:
             "raw": input_resampled.raw,
         }
 
-        pipeline = self._setup_pipeline(task=task, language=source_language)  # type: ignore
-        return pipeline(inputs=input_format, return_timestamps=True)
+        pipeline = self._get_pipeline(task, source_language)
+        with self.inference_stats.time():
+            return pipeline(inputs=input_format, return_timestamps=True)
+
+    def run_batch_inference(
+        self,
+        inputs: list[AudioData],
+        task: TaskValues = "transcribe",  # type: ignore
+        source_language: Language | None = None,
+    ) -> list[dict[str, Any]]:
+        """Transcribe several clips with a single padded `generate` call.
+
+        Whisper pads every clip to a fixed 30s window, so clips longer than that
+        cannot share a batch and go through the long-form pipeline instead.
+        """
+        import torch
+
+        feature_extractor = self.processor.feature_extractor
+        resampled = [
+            self._resample_audio(x, feature_extractor.sampling_rate) for x in inputs
+        ]
+        if any(len(x.raw) > feature_extractor.n_samples for x in resampled):
+            return [self.run_inference(x, task, source_language) for x in resampled]  # type: ignore
+
+        task_value, language_value = self._get_task_key(task, source_language)
+        generate_kwargs = {"language": language_value} if language_value else {}
+        features = feature_extractor(
+            [x.raw for x in resampled],
+            sampling_rate=feature_extractor.sampling_rate,
+            return_tensors="pt",
+        ).input_features.to(self.DEVICE, dtype=self.torch_dtype)
+
+        with self.inference_stats.time(), torch.no_grad():
+            output_ids = self.model.generate(
+                features, task=task_value, **generate_kwargs
+            )
+
+        texts = self.processor.batch_decode(output_ids, skip_special_tokens=True)
+        return [{"text": text} for text in texts]
+
+    async def transcribe(
+        self,
+        input: AudioData,
+        task: TaskValues = "transcribe",  # type: ignore
+        source_language: Language | None = None,
+    ) -> dict[str, Any]:
+        """Queue `input` for micro-batched transcription and await its result."""
+        return await self.batcher.submit(
+            self._get_task_key(task, source_language), input
+        )
 
 
 class ConversationGeneratorModel:
     MAX_INPUT_TOKENS = 128
 
     def __init__(self, model_id: str = "facebook/blenderbot-400M-distill"):
+        from transformers import BlenderbotForConditionalGeneration, BlenderbotTokenizer
+
         self.tokenizer = BlenderbotTokenizer.from_pretrained(model_id)
         self.model = BlenderbotForConditionalGeneration.from_pretrained(
             model_id, use_safetensors=True
         )
         self.history: list[str] = []
+        # Token ids of each history entry, encoded once when it is appended.
+        self.history_token_ids: list[list[int]] = []
+        self.separator_token_ids: list[int] = self.tokenizer(
+            "\n", add_special_tokens=False
+        ).input_ids
+
+    def _append_history(self, entry: str) -> None:
+        self.history.append(entry)
+        self.history_token_ids.append(
+            self.tokenizer(entry, add_special_tokens=False).input_ids
+        )
 
     def _truncate_history(self) -> None:
+        # Leave room for the special tokens added around the context.
+        budget = self.MAX_INPUT_TOKENS - self.tokenizer.num_special_tokens_to_add()
         input_length = 0
-        for i in range(len(self.history) - 1, -1, -1):
-            input_string = self.history[i]
-            input_token = self.tokenizer(input_string, return_tensors="pt")
-            input_length += input_token["input_ids"].size(dim=1)
+        first_kept = len(self.history) - 1
 
-            if input_length > self.MAX_INPUT_TOKENS:
-                self.history.pop(i)
+        for i in range(len(self.history) - 1, -1, -1):
+            entry_length = len(self.history_token_ids[i])
+            if i < len(self.history) - 1:
+                entry_length += len(self.separator_token_ids)
+
+            input_length += entry_length
+            if input_length > budget and i < len(self.history) - 1:
+                break
+            first_kept = i
+
+        del self.history[:first_kept]
+        del self.history_token_ids[:first_kept]
+
+    def _build_input_ids(self) -> "torch.Tensor":
+        import torch
+
+        context_ids: list[int] = []
+        for i, token_ids in enumerate(self.history_token_ids):
+            if i:
+                context_ids.extend(self.separator_token_ids)
+            context_ids.extend(token_ids)
+
+        # The newest entry is always kept, so it may exceed the budget alone.
+        budget = self.MAX_INPUT_TOKENS - self.tokenizer.num_special_tokens_to_add()
+        input_ids = self.tokenizer.build_inputs_with_special_tokens(
+            context_ids[-budget:]
+        )
+        return torch.tensor([input_ids])
 
     def run_inference(self, input: str) -> str:
-        self.history.append(f"User: {input}")
+        self._append_history(f"User: {input}")
         self._truncate_history()
 
-        context = "\n".join(self.history)
-        input_token = self.tokenizer(context, return_tensors="pt")
-        reply_ids = self.model.generate(**input_token)
+        import torch
+
+        input_ids = self._build_input_ids()
+        reply_ids = self.model.generate(
+            input_ids=input_ids, attention_mask=torch.ones_like(input_ids)
+        )
         response = self.tokenizer.decode(reply_ids[0], skip_special_tokens=True)
 
-        self.history.append(f"Bot: {response}")
+        self._append_history(f"Bot: {response}")
         return response
 
 
@@ -140,68 +320,249 @@ class KokoroModel:
     """
 
     LANGUAGE_MODEL_CONFIG = {Language.ENGLISH: "a", Language.MANDARIN: "z"}
+    REPO_ID = "hexgrad/Kokoro-82M"
+    SAMPLE_RATE = 24000
+
+    def __init__(
+        self,
+        device: str = "cpu",
+        preload_languages: tuple[Language, ...] = (),
+        preload_voices: tuple[str, ...] = ("af_heart",),
+        precision: Precision | str = Precision.FP32,
+    ):
+        self.DEVICE = device
+        # KModel feeds float32 voice and noise tensors into its layers, so a bf16
+        # model would need casts throughout kokoro; only INT8 applies here.
+        self.precision = Precision(precision)
+        if self.precision == Precision.BF16:
+            warnings.warn("KokoroModel does not support bf16; using fp32 instead")
+            self.precision = Precision.FP32
+
+        from kokoro import KModel  # type: ignore
+
+        # One KModel is shared by every pipeline; each pipeline only adds its
+        # G2P frontend and the voice tensors it has loaded.
+        self.model = apply_precision(
+            KModel(repo_id=self.REPO_ID).to(self.DEVICE).eval(), self.precision
+        )
+        self.pipeline_pool: LRUCache[Language, Any] = LRUCache(
+            len(self.LANGUAGE_MODEL_CONFIG)
+        )
+        self.pipeline_setup_stats = LatencyStats(
+            "app_stage_duration_seconds", stage="kokoro_pipeline_setup"
+        )
+        self.inference_stats = LatencyStats(
+            "app_stage_duration_seconds", stage="kokoro_inference"
+        )
+
+        for language in preload_languages:
+            self.warm_up(language, preload_voices)
 
     def _setup_pipeline(self, language: Language):
-        return KPipeline(lang_code=self.LANGUAGE_MODEL_CONFIG[language])
+        from kokoro import KPipeline  # type: ignore
+
+        return KPipeline(
+            lang_code=self.LANGUAGE_MODEL_CONFIG[language],
+            repo_id=self.REPO_ID,
+            model=self.model,
+        )
+
+    def _get_pipeline(self, language: Language):
+        language = Language(language)
+
+        def build():
+            with self.pipeline_setup_stats.time():
+                return self._setup_pipeline(language)
+
+        return self.pipeline_pool.get_or_create(language, build)
+
+    def warm_up(self, language: Language, voices: tuple[str, ...] = ("af_heart",)):
+        """Build the pipeline for `language` and load `voices` ahead of the first request."""
+        pipeline = self._get_pipeline(language)
+        for voice in voices:
+            pipeline.load_voice(voice)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "pipeline_pool": self.pipeline_pool.stats(),
+            "pipeline_setup": self.pipeline_setup_stats.summary(),
+            "inference": self.inference_stats.summary(),
+        }
+
+    def stream_inference(
+        self,
+        input: str,
+        language: Language,
+        voice: str = "af_heart",
+        speed: float = 1.0,
+        split_pattern: str = _SENTENCE_END.pattern,
+    ) -> Iterator[AudioData]:
+        """Yield audio one segment (by default one sentence) at a time, as
+        soon as Kokoro has synthesized it."""
+        pipeline = self._get_pipeline(language)
+        for _, _, audio in pipeline(input, voice, speed, split_pattern):
+            if audio is not None:
+                yield AudioData(self.SAMPLE_RATE, np.asarray(audio, dtype=np.float32))
 
     def run_inference(
         self,
         input: str,
         language: Language,
         voice: str = "af_heart",
-        speed: int = 1,
+        speed: float = 1.0,
         split_pattern: str = r"\n+",
     ) -> AudioData:
-        pipeline = self._setup_pipeline(language)
-        audio_segments = [
-            audio for _, _, audio in pipeline(input, voice, speed, split_pattern)
-        ]
-        audio_data = np.concatenate(audio_segments)
-        return AudioData(24000, audio_data)
+        with self.inference_stats.time():
+            audio_segments = [
+                segment.raw
+                for segment in self.stream_inference(
+                    input, language, voice, speed, split_pattern
+                )
+            ]
+            audio_data = np.concatenate(audio_segments)
+        return AudioData(self.SAMPLE_RATE, audio_data)
+
+
+class _CancelledCriteria:
+    """Stopping criterion (duck-typed, see transformers' StoppingCriteria) that
+    ends generation once `cancelled` is set."""
+
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs) -> "torch.BoolTensor":
+        import torch
+
+        return torch.full(  # type: ignore
+            (input_ids.shape[0],),
+            self.cancelled.is_set(),
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+
+
+def _kv_cache_nbytes(entry: "CachedPrefix") -> int:
+    _, past_key_values = entry
+    return sum(
+        key.nbytes + value.nbytes
+        for key, value in past_key_values  # type: ignore[attr-defined]
+    )
+
+
+def _common_prefix_length(a: "torch.Tensor", b: "torch.Tensor") -> int:
+    length = min(a.shape[-1], b.shape[-1])
+    mismatches = (a[:length] != b[:length]).nonzero()
+    return int(mismatches[0]) if len(mismatches) else length
 
 
 class QwenCausalLM:
     _instance = None
 
+    # <|im_start|>, the role line and <|im_end|> wrapped around each message.
+    MESSAGE_OVERHEAD_TOKENS = 5
+
     def __init__(
         self,
         model_name: str = "Qwen/Qwen1.5-0.5B-Chat",
         device: str = "cpu",
-        torch_dtype=torch.float32,
+        precision: Precision | str = Precision.FP32,
         trust_remote_code: bool = True,
         max_new_tokens: int = 50,
+        max_cached_sessions: int = 64,
+        kv_cache_budget_mb: int = 1024,
+        max_cached_prefixes: int = 16,
+        prefix_cache_budget_mb: int = 256,
+        max_batch_size: int = 1,
+        max_sessions: int = 256,
+        session_ttl_seconds: float = 30 * 60,
+        max_prompt_tokens: int = 2048,
     ):
         if QwenCausalLM._instance is not None:
             raise Exception(
                 "Use QwenCausalLM.get_instance() to access the singleton instance"
             )
 
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
         self.device = device
+        self.precision = resolve_precision(precision)
         self.max_new_tokens = max_new_tokens
+        self.max_prompt_tokens = max_prompt_tokens
         self.tokenizer = AutoTokenizer.from_pretrained(
             model_name, trust_remote_code=trust_remote_code
         )
 
+        # Quantization starts from float32 weights; bf16 loads as bf16 directly.
         self.model = AutoModelForCausalLM.from_pretrained(
             model_name,
             trust_remote_code=trust_remote_code,
-            torch_dtype=torch_dtype,
+            torch_dtype=torch_dtype(self.precision),
             device_map=device,
         ).to(device)
+        if self.precision == Precision.INT8:
+            self.model = apply_precision(self.model, self.precision)
 
         self.pad_token_id = self.tokenizer.pad_token_id or self.tokenizer.eos_token_id
         self.eos_token_id = self.tokenizer.eos_token_id
 
-        self.session_messages: dict = dict()
+        # Per-session KV state for the tokens already prefilled, so a new turn only
+        # prefills what was appended since. Evicted sessions recompute in full.
+        self.kv_cache: LRUCache[str, CachedPrefix] = LRUCache(
+            max_cached_sessions,
+            max_weight=kv_cache_budget_mb * 1024 * 1024,
+            weigher=_kv_cache_nbytes,
+        )
+        self.session_messages = SessionStore(
+            count_tokens=self._count_message_tokens,
+            max_sessions=max_sessions,
+            idle_ttl_seconds=session_ttl_seconds,
+            on_evict=self.kv_cache.pop,
+        )
+        # KV state of shared system prompts (e.g. a lesson's scenario, vocabulary
+        # and grammar), keyed by (name, content hash) and copied into new sessions.
+        self.prefix_cache: LRUCache[tuple[str, str], CachedPrefix] = LRUCache(
+            max_cached_prefixes,
+            max_weight=prefix_cache_budget_mb * 1024 * 1024,
+            weigher=_kv_cache_nbytes,
+        )
+        self.reused_prefill_tokens = 0
+        self.computed_prefill_tokens = 0
+
+        # With a batch size above one, concurrent sessions decode together in a
+        # single running batch instead of queueing on separate generate calls.
+        self.batcher: ContinuousBatcher | None = None
+        if max_batch_size > 1:
+            from .generation import ContinuousBatcher
+
+            eos_token_ids = self.model.generation_config.eos_token_id
+            if not isinstance(eos_token_ids, list):
+                eos_token_ids = [eos_token_ids]
+            self.batcher = ContinuousBatcher(
+                self.model,
+                {t for t in [self.eos_token_id, *eos_token_ids] if t is not None},
+                max_batch_size=max_batch_size,
+            )
 
         QwenCausalLM._instance = self
 
     @classmethod
-    def _get_instance(cls):
+    def _get_instance(cls, **kwargs):
         if cls._instance is None:
-            cls()
+            cls(**kwargs)
         return cls._instance
 
+    @classmethod
+    def get_instance(cls, **kwargs):
+        """Return the singleton, constructing it with `kwargs` on first use."""
+        return cls._get_instance(**kwargs)
+
+    @classmethod
+    def release_instance(cls) -> None:
+        """Close and drop the singleton, so the next build may use other settings."""
+        if cls._instance is not None:
+            cls._instance.close()
+            cls._instance = None
+
     @classmethod
     def run_inference(
         cls,
@@ -212,6 +573,7 @@ class QwenCausalLM:
         do_sample: bool = True,
         enable_thinking: bool = False,
         return_full_text: bool = False,
+        max_new_tokens: int | None = None,
     ) -> str:
         instance = cls._get_instance()
         return instance._run_inference(
@@ -222,83 +584,373 @@ class QwenCausalLM:
             do_sample,
             enable_thinking,
             return_full_text,
+            max_new_tokens or instance.max_new_tokens,
         )
 
-    def _run_inference(
-        self,
+    @classmethod
+    def stream_inference(
+        cls,
         prompt: str,
         session_id: str,
-        temperature: float,
-        top_p: float,
-        do_sample: bool,
-        enable_thinking: bool,
-        return_full_text: bool,
-    ) -> str:
-        self._add_user_prompt(prompt, session_id)
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        do_sample: bool = True,
+        enable_thinking: bool = False,
+        max_new_tokens: int | None = None,
+    ) -> Iterator[str]:
+        """Yield decoded text chunks of the reply as soon as they are generated."""
+        instance = cls._get_instance()
+        return instance._stream_inference(
+            prompt,
+            session_id,
+            temperature,
+            top_p,
+            do_sample,
+            enable_thinking,
+            max_new_tokens or instance.max_new_tokens,
+        )
+
+    @classmethod
+    def start_reply(
+        cls,
+        prompt: str,
+        session_id: str,
+        streamer: Any = None,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        do_sample: bool = True,
+        enable_thinking: bool = False,
+        max_new_tokens: int | None = None,
+    ) -> "GenerationRequest":
+        """Queue a reply to `prompt` and return its request without waiting.
+
+        Text goes to `streamer` (see `create_streamer`) as it is generated. When
+        the request is done, even if cancelled, the reply is added to the
+        session and its KV cache kept for the next turn; `request.wait()`
+        returns after that, or raises if generation failed.
+        """
+        instance = cls._get_instance()
+        return instance._start_reply(
+            prompt,
+            session_id,
+            streamer,
+            temperature,
+            top_p,
+            do_sample,
+            enable_thinking,
+            max_new_tokens or instance.max_new_tokens,
+        )
+
+    @classmethod
+    def create_streamer(cls, asynchronous: bool = False) -> Any:
+        """A streamer that decodes only the reply, incrementally.
+
+        The asynchronous one is read with `async for` and must be created on
+        the event loop that reads it.
+        """
+        from transformers import AsyncTextIteratorStreamer, TextIteratorStreamer
+
+        instance = cls._get_instance()
+        streamer_class = (
+            AsyncTextIteratorStreamer if asynchronous else TextIteratorStreamer
+        )
+        # generate() passes the streamer the prompt first; the batcher does not.
+        return streamer_class(
+            instance.tokenizer,
+            skip_prompt=instance.batcher is None,
+            skip_special_tokens=True,
+        )
+
+    def _count_message_tokens(self, message: dict[str, str]) -> int:
+        return (
+            len(self.tokenizer(message["content"]).input_ids)
+            + self.MESSAGE_OVERHEAD_TOKENS
+        )
+
+    def _prepare_inputs(self, session_id: str, enable_thinking: bool):
+        self.session_messages.truncate(session_id, self.max_prompt_tokens)
         text = self.tokenizer.apply_chat_template(
-            self.session_messages,
+            self.session_messages.get(session_id),
             tokenize=False,
             add_generation_prompt=True,
             enable_thinking=enable_thinking,
         )
-        inputs = self.tokenizer(text, return_tensors="pt").to(self.device)
+        return self.tokenizer(text, return_tensors="pt").to(self.device)
+
+    def _take_cached_prefix(
+        self, session_id: str, input_ids: "torch.Tensor"
+    ) -> "DynamicCache":
+        """Return a KV cache covering the longest prefilled prefix of `input_ids`.
+
+        The entry is removed from the store while in use and put back by
+        `_store_cached_prefix` once generation finishes.
+        """
+        from transformers import DynamicCache
+
+        entry = self.kv_cache.get(session_id)
+        reusable = 0
+        if entry is not None:
+            self.kv_cache.pop(session_id)
+            cached_ids, past_key_values = entry
+            # At least one token must be left for generate to run the model on.
+            reusable = min(
+                _common_prefix_length(cached_ids, input_ids[0]),
+                input_ids.shape[-1] - 1,
+            )
+
+        if reusable == 0:
+            past_key_values = DynamicCache()
+        else:
+            past_key_values.crop(reusable)  # type: ignore[attr-defined]
+
+        self.reused_prefill_tokens += reusable
+        self.computed_prefill_tokens += input_ids.shape[-1] - reusable
+        return past_key_values
 
-        output_ids = self.model.generate(
-            inputs.input_ids,
-            max_new_tokens=self.max_new_tokens,
-            temperature=temperature,
-            top_p=top_p,
-            do_sample=do_sample,
-            pad_token_id=self.pad_token_id,
-            eos_token_id=self.eos_token_id,
+    def _store_cached_prefix(
+        self,
+        session_id: str,
+        sequence: "torch.Tensor",
+        past_key_values: "DynamicCache",
+    ) -> None:
+        if session_id not in self.session_messages:
+            return
+        cached_length = past_key_values.get_seq_length()  # type: ignore[attr-defined]
+        self.kv_cache.put(
+            session_id, (sequence[:cached_length].clone(), past_key_values)
         )
 
-        decoded_full_text = self.tokenizer.decode(
-            output_ids[0], skip_special_tokens=True
+    def _prefill_system_prompts(self, messages: list[dict[str, str]]) -> "CachedPrefix":
+        import torch
+        from transformers import DynamicCache
+
+        text = self.tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=False
         )
+        input_ids = self.tokenizer(text, return_tensors="pt").to(self.device).input_ids
+        past_key_values = DynamicCache()
+        with torch.no_grad():
+            self.model(input_ids, past_key_values=past_key_values, use_cache=True)
 
-        prompt_len = inputs.input_ids.shape[-1]
-        new_tokens = output_ids[0][prompt_len:]
-        decoded_new_tokens = self.tokenizer.decode(
-            new_tokens, skip_special_tokens=True
-        ).strip()
+        self.computed_prefill_tokens += input_ids.shape[-1]
+        return input_ids[0], past_key_values
+
+    @classmethod
+    def create_session_from_prefix(cls, name: str, system_prompts: list[str]) -> str:
+        """Create a session seeded with `system_prompts`, reusing their KV state.
+
+        The prompts are prefilled once per (name, content) and the result is
+        copied into every new session, so starting a lesson costs no prefill
+        for its boilerplate.
+        """
+        instance = cls._get_instance()
+        messages = [{"role": "system", "content": prompt} for prompt in system_prompts]
+        content_hash = hashlib.sha256("\0".join(system_prompts).encode()).hexdigest()
+
+        prefix_ids, past_key_values = instance.prefix_cache.get_or_create(
+            (name, content_hash), lambda: instance._prefill_system_prompts(messages)
+        )
 
-        self.session_messages[session_id].append(
-            {"role": "assistant", "content": decoded_new_tokens}
+        session_uuid = cls.create_session()
+        instance.session_messages.extend(session_uuid, messages)
+        instance.kv_cache.put(
+            session_uuid, (prefix_ids.clone(), copy.deepcopy(past_key_values))
         )
+        return session_uuid
+
+    def get_metrics(self) -> dict[str, Any]:
+        metrics = {
+            "sessions": self.session_messages.stats(),
+            "kv_cache": self.kv_cache.stats(),
+            "prefix_cache": self.prefix_cache.stats(),
+            "reused_prefill_tokens": self.reused_prefill_tokens,
+            "computed_prefill_tokens": self.computed_prefill_tokens,
+        }
+        if self.batcher is not None:
+            metrics["batching"] = self.batcher.get_metrics()
+        return metrics
+
+    def _start_generation(
+        self, session_id: str, inputs, request: "GenerationRequest"
+    ) -> "GenerationRequest":
+        """Run `request` on the continuous batcher, or on its own generate call."""
+        from transformers import StoppingCriteriaList
+
+        request.past_key_values = self._take_cached_prefix(session_id, inputs.input_ids)
+        if self.batcher is not None:
+            return self.batcher.submit(request)
+
+        def generate():
+            error = None
+            try:
+                with stage("qwen_generate").time():
+                    output_ids = self.model.generate(
+                        inputs.input_ids,
+                        attention_mask=inputs.attention_mask,
+                        past_key_values=request.past_key_values,
+                        max_new_tokens=request.max_new_tokens,
+                        temperature=request.temperature,
+                        top_p=request.top_p,
+                        do_sample=request.do_sample,
+                        pad_token_id=self.pad_token_id,
+                        eos_token_id=self.eos_token_id,
+                        streamer=request.streamer,
+                        stopping_criteria=StoppingCriteriaList(
+                            [_CancelledCriteria(request.cancelled)]
+                        ),
+                    )
+                prompt_len = inputs.input_ids.shape[-1]
+                request.generated_ids = output_ids[0][prompt_len:].tolist()
+            except Exception as e:
+                error = e
+                if request.streamer is not None:
+                    request.streamer.end()  # unblock the consumer
+            finally:
+                request.finish(error)
+
+        threading.Thread(target=generate, daemon=True).start()
+        return request
+
+    def close(self) -> None:
+        if self.batcher is not None:
+            self.batcher.close()
+
+    def _start_reply(
+        self,
+        prompt: str,
+        session_id: str,
+        streamer: Any,
+        temperature: float,
+        top_p: float,
+        do_sample: bool,
+        enable_thinking: bool,
+        max_new_tokens: int,
+    ) -> "GenerationRequest":
+        from transformers import DynamicCache
+
+        from .generation import GenerationRequest
+
+        self._add_user_prompt(prompt, session_id)
+        inputs = self._prepare_inputs(session_id, enable_thinking)
+        return self._start_generation(
+            session_id,
+            inputs,
+            GenerationRequest(
+                input_ids=inputs.input_ids,
+                past_key_values=DynamicCache(),
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                do_sample=do_sample,
+                streamer=streamer,
+                on_done=lambda request: self._finish_reply(session_id, request),
+            ),
+        )
+
+    def _finish_reply(self, session_id: str, request: "GenerationRequest") -> None:
+        """Keep the reply's KV cache for the next turn and add it to the session."""
+        if request.error is not None:
+            return
+        self._store_cached_prefix(
+            session_id, request.output_ids, request.past_key_values
+        )
+        reply = self.tokenizer.decode(request.generated_ids, skip_special_tokens=True)
+        self.session_messages.append(
+            session_id, {"role": "assistant", "content": reply.strip()}
+        )
+
+    def _run_inference(
+        self,
+        prompt: str,
+        session_id: str,
+        temperature: float,
+        top_p: float,
+        do_sample: bool,
+        enable_thinking: bool,
+        return_full_text: bool,
+        max_new_tokens: int,
+    ) -> str:
+        request = self._start_reply(
+            prompt,
+            session_id,
+            None,
+            temperature,
+            top_p,
+            do_sample,
+            enable_thinking,
+            max_new_tokens,
+        )
+        request.wait()
 
         if return_full_text:
-            return decoded_full_text
+            return self.tokenizer.decode(request.output_ids, skip_special_tokens=True)
+        return self.tokenizer.decode(
+            request.generated_ids, skip_special_tokens=True
+        ).strip()
 
-        return decoded_new_tokens
+    def _stream_inference(
+        self,
+        prompt: str,
+        session_id: str,
+        temperature: float,
+        top_p: float,
+        do_sample: bool,
+        enable_thinking: bool,
+        max_new_tokens: int,
+    ) -> Iterator[str]:
+        streamer = self.create_streamer()
+        request = self._start_reply(
+            prompt,
+            session_id,
+            streamer,
+            temperature,
+            top_p,
+            do_sample,
+            enable_thinking,
+            max_new_tokens,
+        )
+        try:
+            for chunk in streamer:
+                if chunk:
+                    yield chunk
+        finally:
+            # Stop generating if the consumer goes away mid-reply.
+            request.cancelled.set()
+            request.wait()
 
     @classmethod
     def add_system_prompt(cls, prompt: str, session_id: str) -> None:
         instance = cls._get_instance()
-        instance.session_messages[session_id].append(
-            {"role": "system", "content": prompt}
+        instance.session_messages.append(
+            session_id, {"role": "system", "content": prompt}
         )
 
     @classmethod
     def _add_user_prompt(cls, prompt: str, session_id: str) -> None:
         instance = cls._get_instance()
-        instance.session_messages[session_id].append(
+        instance.session_messages.append(
+            session_id,
             {
                 "role": "user",
                 "content": prompt,
-            }
+            },
         )
 
     @classmethod
     def delete_session(cls, session_id: str) -> None:
         instance = cls._get_instance()
-        instance.session_messages.pop(session_id)
+        instance.session_messages.delete(session_id)
+
+    @classmethod
+    def has_session(cls, session_id: str) -> bool:
+        instance = cls._get_instance()
+        return session_id in instance.session_messages
 
     @classmethod
     def create_session(cls) -> str:
         session_uuid = str(uuid.uuid4())
         instance = cls._get_instance()
-        instance.session_messages[session_uuid] = []
+        instance.session_messages.create(session_uuid)
         return session_uuid
 
 
@@ -310,43 +962,330 @@ class SemanticMatcher:
     def __init__(
         self,
         model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        max_cached_embeddings: int = 4096,
+        batch_size: int = 64,
+        preload_texts: Iterable[str] = (),
+        precision: Precision | str = Precision.FP32,
     ):
+        from transformers import AutoModel, AutoTokenizer
+
+        self.precision = resolve_precision(precision)
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name)
+        self.model = apply_precision(
+            AutoModel.from_pretrained(model_name).eval(), self.precision
+        )
+        self.batch_size = batch_size
+
+        self.embedding_cache: LRUCache[str, np.ndarray] = LRUCache(
+            max_cached_embeddings
+        )
+        self.preload(preload_texts)
+
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        # The MiniLM tokenizer is uncased, so case-folding does not change results.
+        return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        import torch
 
-    def _embed_text(self, text: str):
         tokens = self.tokenizer(
-            text, padding=True, truncation=True, return_tensors="pt"
+            texts, padding=True, truncation=True, return_tensors="pt"
         )
-        with torch.no_grad():
+        with stage("minilm_embedding").time(), torch.no_grad():
             output = self.model(**tokens)
 
-        return output.last_hidden_state.mean(dim=1).numpy()[0]
+        # Mean over real tokens only; padding would otherwise skew shorter texts.
+        hidden = output.last_hidden_state.float()
+        mask = tokens["attention_mask"].unsqueeze(-1).to(hidden)
+        summed = (hidden * mask).sum(dim=1)
+        return (summed / mask.sum(dim=1).clamp(min=1e-9)).numpy()
+
+    def _embed_texts(self, texts: list[str]) -> list[np.ndarray]:
+        """Embed `texts`, encoding every cache miss together in padded batches."""
+        keys = [self._normalize_text(text) for text in texts]
+        embeddings = {key: self.embedding_cache.get(key) for key in set(keys)}
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start : start + self.batch_size]
+            for key, embedding in zip(batch, self._encode(batch)):
+                self.embedding_cache.put(key, embedding)
+                embeddings[key] = embedding
+
+        return [embeddings[key] for key in keys]  # type: ignore
+
+    def _embed_text(self, text: str):
+        return self._embed_texts([text])[0]
+
+    def preload(self, texts: Iterable[str]) -> None:
+        """Embed reference texts (e.g. lesson vocabulary) ahead of the first request."""
+        self._embed_texts(list(texts))
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"embedding_cache": self.embedding_cache.stats()}
 
     def _cosine_similarity(self, vector_a, vector_b):
         return np.dot(vector_a, vector_b) / (
             np.linalg.norm(vector_a) * np.linalg.norm(vector_b)
         )
 
-    def get_similarity(self, text_1: str, text_2: str):
-        vector_a = self._embed_text(text_1)
-        vector_b = self._embed_text(text_2)
-        return self._cosine_similarity(vector_a, vector_b)
+    def get_similarity(self, text_1: str, text_2: str) -> float:
+        vector_a, vector_b = self._embed_texts([text_1, text_2])
+        return float(self._cosine_similarity(vector_a, vector_b))
+
+    def get_similarity_matrix(
+        self, queries: list[str], candidates: list[str]
+    ) -> np.ndarray:
+        """Cosine similarity of every query (rows) against every candidate (columns)."""
+        embeddings = np.stack(self._embed_texts(queries + candidates))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[: len(queries)] @ embeddings[len(queries) :].T
+
+    def rank_candidates(
+        self, queries: list[str], candidates: list[str], top_k: int | None = None
+    ) -> dict[str, Any]:
+        """Score all query/candidate pairs and pick each query's `top_k` best candidates."""
+        scores = self.get_similarity_matrix(queries, candidates)
+        k = len(candidates) if top_k is None else max(0, min(top_k, len(candidates)))
+
+        matches: list[list[dict[str, Any]]] = [[] for _ in queries]
+        if k:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row, indices in enumerate(top):
+                for index in sorted(indices, key=lambda i: -scores[row, i]):
+                    matches[row].append(
+                        {
+                            "index": int(index),
+                            "text": candidates[index],
+                            "score": float(scores[row, index]),
+                        }
+                    )
+
+        return {"scores": scores.tolist(), "matches": matches}
+
+
+class TranslationBackend(ABC):
+    """Translates batches of text for one language pair at a time."""
+
+    @abstractmethod
+    def translate_batch(
+        self, texts: list[str], source: Language, target: Language
+    ) -> list[str]: ...
+
+
+class GoogleTranslateBackend(TranslationBackend):
+    """Calls the Google Translate web API once per text."""
+
+    LANGUAGE_MODEL_CONFIG = {Language.ENGLISH: "en", Language.MANDARIN: "zh-TW"}
+
+    def translate_batch(
+        self, texts: list[str], source: Language, target: Language
+    ) -> list[str]:
+        from deep_translator import GoogleTranslator  # type: ignore
+
+        translator = GoogleTranslator(
+            self.LANGUAGE_MODEL_CONFIG[source], self.LANGUAGE_MODEL_CONFIG[target]
+        )
+        return [translator.translate(text) for text in texts]
+
+
+class MarianTranslationBackend(TranslationBackend):
+    """Local MarianMT seq2seq models, so translation works without network access.
+
+    Models for every configured pair are loaded up front. Long passages are split
+    into sentences, and all sentences in a batch share one `generate` call.
+    """
+
+    LANGUAGE_MODEL_CONFIG = {
+        (Language.MANDARIN, Language.ENGLISH): "Helsinki-NLP/opus-mt-zh-en",
+        (Language.ENGLISH, Language.MANDARIN): "Helsinki-NLP/opus-mt-en-zh",
+    }
+    # opus-mt-en-zh is multi-target: a sentence-initial token picks the variant,
+    # here Traditional Mandarin (zh-TW), as elsewhere in the app.
+    TARGET_TOKENS = {(Language.ENGLISH, Language.MANDARIN): ">>cmn_Hant<<"}
+    SENTENCE_SEPARATOR = {Language.ENGLISH: " ", Language.MANDARIN: ""}
+
+    def __init__(
+        self,
+        device: str = "cpu",
+        max_batch_size: int = 32,
+        num_beams: int = 1,
+        max_new_tokens: int = 256,
+        precision: Precision | str = Precision.FP32,
+    ):
+        self.device = device
+        self.precision = resolve_precision(precision)
+        self.max_batch_size = max_batch_size
+        self.num_beams = num_beams
+        self.max_new_tokens = max_new_tokens
+
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        self.models = dict()
+        for pair, model_name in self.LANGUAGE_MODEL_CONFIG.items():
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to(device)
+            self.models[pair] = (
+                tokenizer,
+                apply_precision(model.eval(), self.precision),
+            )
+
+    def _generate(
+        self, sentences: list[str], source: Language, target: Language
+    ) -> list[str]:
+        import torch
+
+        tokenizer, model = self.models[(source, target)]
+        target_token = self.TARGET_TOKENS.get((source, target))
+        if target_token:
+            sentences = [f"{target_token} {sentence}" for sentence in sentences]
+        tokens = tokenizer(
+            sentences, padding=True, truncation=True, return_tensors="pt"
+        ).to(self.device)
+        with torch.no_grad():
+            output_ids = model.generate(
+                **tokens, num_beams=self.num_beams, max_new_tokens=self.max_new_tokens
+            )
+        return tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+
+    def translate_batch(
+        self, texts: list[str], source: Language, target: Language
+    ) -> list[str]:
+        if (source, target) not in self.models:
+            raise ValueError(f"No local translation model for {source} -> {target}")
+
+        sentences, owners = [], []
+        for index, text in enumerate(texts):
+            for sentence in _split_sentences(text):
+                sentences.append(sentence)
+                owners.append(index)
+
+        translated: list[list[str]] = [[] for _ in texts]
+        for start in range(0, len(sentences), self.max_batch_size):
+            batch = sentences[start : start + self.max_batch_size]
+            for owner, sentence in zip(
+                owners[start : start + self.max_batch_size],
+                self._generate(batch, source, target),
+            ):
+                translated[owner].append(sentence)
+
+        separator = self.SENTENCE_SEPARATOR[target]
+        return [separator.join(parts) for parts in translated]
 
 
 class TextTranslator:
-    """Uses Google Translate to convert text from one language to another."""
+    """Converts text from one language to another through a `TranslationBackend`.
 
-    LANGUAGE_MODEL_CONFIG = {Language.ENGLISH: "en", Language.MANDARIN: "zh-TW"}
+    Google Translate is used unless another backend (e.g. the offline
+    `MarianTranslationBackend`) is given. Results are cached in memory and, when
+    `cache_path` is given, in a SQLite file that persists across restarts.
+    Concurrent requests for the same translation share one backend call.
+    """
+
+    def __init__(
+        self,
+        backend: TranslationBackend | None = None,
+        max_cached_translations: int = 4096,
+        cache_path: str | None = None,
+    ):
+        self.backend = backend or GoogleTranslateBackend()
+        self.memory_cache: LRUCache[tuple[Language, Language, str], str] = LRUCache(
+            max_cached_translations
+        )
+        self.disk_cache = (
+            SqliteStore(cache_path, table="translations") if cache_path else None
+        )
+        self.in_flight: SingleFlight[tuple[Language, Language, str], str] = (
+            SingleFlight()
+        )
+        self.pair_stats: dict[tuple[Language, Language], Counter[str]] = defaultdict(
+            Counter
+        )
 
     @staticmethod
+    def _disk_key(source: Language, target: Language, text: str) -> str:
+        return f"{source.value}:{target.value}:{text}"
+
+    def _lookup(self, key: tuple[Language, Language, str]) -> str | None:
+        """Check the memory cache, then the disk cache (promoting hits to memory)."""
+        stats = self.pair_stats[key[:2]]
+        translation = self.memory_cache.get(key)
+        if translation is not None:
+            stats["memory_hits"] += 1
+            return translation
+
+        if self.disk_cache is not None:
+            cached = self.disk_cache.get(self._disk_key(*key))
+            if cached is not None:
+                stats["disk_hits"] += 1
+                self.memory_cache.put(key, str(cached))
+                return str(cached)
+        return None
+
+    def _store(self, key: tuple[Language, Language, str], translation: str) -> None:
+        self.memory_cache.put(key, translation)
+        if self.disk_cache is not None:
+            self.disk_cache.put(self._disk_key(*key), translation)
+
+    def _translate_missing(
+        self, texts: list[str], source: Language, target: Language
+    ) -> list[str]:
+        self.pair_stats[(source, target)]["misses"] += len(texts)
+        with stage("translation_backend").time():
+            translations = self.backend.translate_batch(texts, source, target)
+        for text, translation in zip(texts, translations):
+            self._store((source, target, text), translation)
+        return translations
+
     def translate(
-        text: str, source: Language, target: Language = Language.ENGLISH
+        self, text: str, source: Language, target: Language = Language.ENGLISH
     ) -> str:
-        return GoogleTranslator(
-            TextTranslator.LANGUAGE_MODEL_CONFIG[source],
-            TextTranslator.LANGUAGE_MODEL_CONFIG[target],
-        ).translate(text)
+        key = (source, target, text)
+        translation = self._lookup(key)
+        if translation is not None:
+            return translation
+
+        loaded = False
+
+        def load() -> str:
+            nonlocal loaded
+            loaded = True
+            return self._translate_missing([text], source, target)[0]
+
+        translation = self.in_flight.do(key, load)
+        if not loaded:
+            self.pair_stats[(source, target)]["coalesced"] += 1
+        return translation
+
+    def translate_batch(
+        self, texts: list[str], source: Language, target: Language = Language.ENGLISH
+    ) -> list[str]:
+        """Translate many texts, sending only the cache misses to the backend at once."""
+        translations = {text: self._lookup((source, target, text)) for text in texts}
+        missing = [text for text, value in translations.items() if value is None]
+        if missing:
+            translations.update(
+                zip(missing, self._translate_missing(missing, source, target))
+            )
+
+        return [translations[text] for text in texts]  # type: ignore
+
+    def get_metrics(self) -> dict[str, Any]:
+        pairs = dict()
+        for (source, target), stats in self.pair_stats.items():
+            lookups = sum(stats.values())
+            hits = lookups - stats["misses"]
+            pairs[f"{source.value}->{target.value}"] = {
+                **stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+        return {
+            "memory_cache": self.memory_cache.stats(),
+            "coalesced": self.in_flight.coalesced,
+            "pairs": pairs,
+        }
 
 
 class LanguageMode(Enum):
@@ -359,16 +1298,19 @@ class MandarinTranslator:
     and then back to the target form and language.
     """
 
+    def __init__(self):
+        self.translator = TextTranslator()
+
     def translate_to_english(self, input: str | AudioData) -> str:
         if isinstance(input, AudioData):
             voice_transcriber = WhisperModel(Language.MANDARIN)
             captioned_text = voice_transcriber.run_inference(input)["text"]  # type: ignore
-            return TextTranslator.translate(captioned_text, Language.MANDARIN)
+            return self.translator.translate(captioned_text, Language.MANDARIN)
 
-        return TextTranslator.translate(input, Language.MANDARIN)
+        return self.translator.translate(input, Language.MANDARIN)
 
     def translate_to_mandarin(self, input: str, mode: LanguageMode) -> str | AudioData:
-        translated_text = TextTranslator.translate(input, Language.MANDARIN)
+        translated_text = self.translator.translate(input, Language.MANDARIN)
 
         if mode == LanguageMode.TEXT:
             return translated_text
@@ -0,0 +1,112 @@
+import warnings
+from enum import Enum
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import torch
+
+
+class Precision(str, Enum):
+    """Numeric precision a model's weights are held and run in on CPU.
+
+    INT8 dynamically quantizes `torch.nn.Linear` layers (weights stored as int8,
+    activations quantized on the fly), which roughly quarters their memory and
+    speeds up the matmuls that dominate transformer inference. BF16 halves
+    memory and is fast on CPUs with native bf16 support (AVX512-BF16 or AMX);
+    elsewhere it falls back to FP32.
+    """
+
+    FP32 = "fp32"
+    BF16 = "bf16"
+    INT8 = "int8"
+
+
+def bf16_supported() -> bool:
+    import torch
+
+    return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+
+
+def resolve_precision(precision: Precision | str) -> Precision:
+    """Parse `precision`, downgrading BF16 to FP32 on CPUs without bf16 support."""
+    precision = Precision(precision)
+    if precision == Precision.BF16 and not bf16_supported():
+        warnings.warn("This CPU has no native bf16 support; using fp32 instead")
+        return Precision.FP32
+    return precision
+
+
+def torch_dtype(precision: Precision | str) -> "torch.dtype":
+    """The dtype activations (and non-quantized weights) use at `precision`."""
+    import torch
+
+    return torch.bfloat16 if Precision(precision) == Precision.BF16 else torch.float32
+
+
+def apply_precision(module: "torch.nn.Module", precision: Precision | str):
+    """Convert an FP32 `module` for inference at `precision` and return it.
+
+    INT8 returns a new module with quantized Linear layers; the others convert
+    in place.
+    """
+    import torch
+
+    precision = Precision(precision)
+    if precision == Precision.INT8:
+        from torch.ao.quantization import quantize_dynamic
+
+        return quantize_dynamic(module.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+    return module.to(torch_dtype(precision))
+
+
+def module_nbytes(module: "torch.nn.Module") -> int:
+    """Bytes held by a module's weights, counting packed quantized weights too."""
+    import torch
+
+    def nbytes(value: Any) -> int:
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(nbytes(item) for item in value)
+        return 0
+
+    return sum(nbytes(value) for value in module.state_dict().values())
+
+
+def parse_model_precisions(spec: str) -> dict[str, Precision]:
+    """Parse "WhisperModel=int8,QwenCausalLM=bf16" into a per-model mapping."""
+    precisions = dict()
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, separator, value = item.partition("=")
+        if not separator:
+            raise ValueError(f"Expected <model>=<precision>, got {item!r}")
+        precisions[name.strip()] = Precision(value.strip().lower())
+    return precisions
+
+
+def error_rate(reference: str, hypothesis: str) -> float:
+    """Word error rate; character error rate when the reference has no spaces.
+
+    Mandarin is not space-separated, so its words are compared per character.
+    """
+    if " " in reference.strip():
+        ref, hyp = reference.split(), hypothesis.split()
+    else:
+        ref, hyp = list("".join(reference.split())), list("".join(hypothesis.split()))
+    if not ref:
+        return float(bool(hyp))
+
+    # Levenshtein distance over tokens, one row at a time.
+    previous = list(range(len(hyp) + 1))
+    for i, ref_token in enumerate(ref, start=1):
+        current = [i]
+        for j, hyp_token in enumerate(hyp, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (ref_token != hyp_token),
+                )
+            )
+        previous = current
+    return previous[-1] / len(ref)
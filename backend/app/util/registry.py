@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Iterator
+
+
+class ModelState(str, Enum):
+    PENDING = "PENDING"
+    LOADING = "LOADING"
+    READY = "READY"
+    FAILED = "FAILED"
+
+
+class ModelNotReadyError(Exception):
+    """Raised when a model is requested before it has finished loading."""
+
+    def __init__(self, name: str, state: ModelState):
+        super().__init__(f"{name} is not ready ({state.value})")
+        self.name = name
+        self.state = state
+
+
+@dataclass
+class _ModelEntry:
+    factory: Callable[[], Any]
+    lazy: bool
+    state: ModelState = ModelState.PENDING
+    model: Any = None
+    error: str | None = None
+    load_seconds: float | None = None
+    on_ready: list[Callable[[Any], None]] = field(default_factory=list)
+    loaded: threading.Event = field(default_factory=threading.Event)
+
+
+class ModelRegistry:
+    """Loads models in the background and hands them out once they are ready.
+
+    Eager models start loading concurrently on `start()`; lazy ones start on
+    first access. Looking up a model that is still loading raises
+    `ModelNotReadyError` instead of blocking, so the server can accept traffic
+    (and serve the models that are ready) while the rest finish loading.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._entries: dict[str, _ModelEntry] = dict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="model-load")
+
+    def register(
+        self, name: str, factory: Callable[[], Any], lazy: bool = False
+    ) -> None:
+        self._entries[name] = _ModelEntry(factory, lazy)
+
+    def add(self, name: str, model: Any) -> None:
+        """Register a model that is already loaded (e.g. by a parent process)."""
+        entry = _ModelEntry(lambda: model, lazy=False, state=ModelState.READY)
+        entry.model = model
+        entry.loaded.set()
+        self._entries[name] = entry
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __getitem__(self, name: str) -> Any:
+        entry = self._entries[name]
+        if entry.state == ModelState.READY:
+            return entry.model
+
+        self._start_loading(name)
+        raise ModelNotReadyError(name, entry.state)
+
+    def _start_loading(self, name: str) -> None:
+        with self._lock:
+            entry = self._entries[name]
+            if entry.state != ModelState.PENDING:
+                return
+            entry.state = ModelState.LOADING
+        self._pool.submit(self._load, name)
+
+    def _load(self, name: str) -> None:
+        entry = self._entries[name]
+        started_at = time.perf_counter()
+        try:
+            model = entry.factory()
+            with self._lock:
+                for callback in entry.on_ready:
+                    callback(model)
+                entry.model = model
+                entry.state = ModelState.READY
+        except Exception as e:
+            entry.error = f"{type(e).__name__}: {e}"
+            entry.state = ModelState.FAILED
+        finally:
+            entry.load_seconds = time.perf_counter() - started_at
+            entry.loaded.set()
+
+    def start(self) -> None:
+        """Begin loading every eager model concurrently."""
+        for name, entry in self._entries.items():
+            if not entry.lazy:
+                self._start_loading(name)
+
+    def when_ready(self, name: str, callback: Callable[[Any], None]) -> None:
+        """Run `callback(model)` once `name` has loaded (now, if it already has)."""
+        entry = self._entries[name]
+        with self._lock:
+            if entry.state != ModelState.READY:
+                entry.on_ready.append(callback)
+                return
+        callback(entry.model)
+
+    def load_all(self) -> None:
+        """Load every model, eager or lazy, and wait until all have finished."""
+        for name in self._entries:
+            self._start_loading(name)
+        for entry in self._entries.values():
+            entry.loaded.wait()
+
+    def is_ready(self, name: str) -> bool:
+        """Whether `name` is registered and loaded."""
+        entry = self._entries.get(name)
+        return entry is not None and entry.state == ModelState.READY
+
+    def readiness(self) -> tuple[bool, dict[str, dict[str, Any]]]:
+        """Whether every eager model is ready, plus each model's load state."""
+        models = {
+            name: {
+                "state": entry.state.value,
+                "lazy": entry.lazy,
+                "load_seconds": entry.load_seconds,
+                "error": entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
+        ready = all(
+            entry.state == ModelState.READY
+            for entry in self._entries.values()
+            if not entry.lazy
+        )
+        return ready, models
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
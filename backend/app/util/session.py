@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+@dataclass
+class _Session:
+    messages: list[dict[str, str]] = field(default_factory=list)
+    token_counts: list[int] = field(default_factory=list)
+    last_used: float = 0.0
+
+
+class SessionStore:
+    """Thread-safe store of chat histories with idle expiry and LRU eviction.
+
+    Each message's token count is computed once, when it is added, so trimming
+    a history to a token budget never re-tokenizes earlier turns. `on_evict` is
+    called with the id of every session that is expired, evicted or deleted.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[dict[str, str]], int],
+        max_sessions: int = 256,
+        idle_ttl_seconds: float = 30 * 60,
+        on_evict: Callable[[str], object] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.count_tokens = count_tokens
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.on_evict = on_evict
+        self.clock = clock
+
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.expired = 0
+        self.evicted = 0
+        self.truncated_messages = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            self._expire()
+            return session_id in self._sessions
+
+    def _remove(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        if self.on_evict is not None:
+            self.on_evict(session_id)
+
+    def _expire(self) -> None:
+        # Sessions are kept in least-recently-used order, so expired ones lead.
+        deadline = self.clock() - self.idle_ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used > deadline:
+                break
+            self._remove(session_id)
+            self.expired += 1
+
+    def _touch(self, session_id: str) -> _Session:
+        self._expire()
+        session = self._sessions[session_id]
+        session.last_used = self.clock()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def create(self, session_id: str) -> None:
+        with self._lock:
+            self._expire()
+            self._sessions[session_id] = _Session(last_used=self.clock())
+            while len(self._sessions) > self.max_sessions:
+                self._remove(next(iter(self._sessions)))
+                self.evicted += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id not in self._sessions:
+                raise KeyError(session_id)
+            self._remove(session_id)
+
+    def get(self, session_id: str) -> list[dict[str, str]]:
+        """Return a snapshot of the session's messages."""
+        with self._lock:
+            return list(self._touch(session_id).messages)
+
+    def extend(self, session_id: str, messages: list[dict[str, str]]) -> None:
+        token_counts = [self.count_tokens(message) for message in messages]
+        with self._lock:
+            session = self._touch(session_id)
+            session.messages.extend(messages)
+            session.token_counts.extend(token_counts)
+
+    def append(self, session_id: str, message: dict[str, str]) -> None:
+        self.extend(session_id, [message])
+
+    def truncate(self, session_id: str, max_tokens: int) -> None:
+        """Drop the oldest turns until the history fits in `max_tokens`.
+
+        System prompts and the latest message are always kept.
+        """
+        with self._lock:
+            session = self._touch(session_id)
+            total = sum(session.token_counts)
+            keep = [True] * len(session.messages)
+
+            for i, message in enumerate(session.messages[:-1]):
+                if total <= max_tokens:
+                    break
+                if message["role"] != "system":
+                    keep[i] = False
+                    total -= session.token_counts[i]
+
+            if all(keep):
+                return
+
+            # Don't leave the history starting with an orphaned assistant reply.
+            for i, message in enumerate(session.messages[:-1]):
+                if not keep[i] or message["role"] == "system":
+                    continue
+                if message["role"] == "assistant":
+                    keep[i] = False
+                break
+
+            self.truncated_messages += keep.count(False)
+            session.messages = [m for m, k in zip(session.messages, keep) if k]
+            session.token_counts = [c for c, k in zip(session.token_counts, keep) if k]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "truncated_messages": self.truncated_messages,
+        }
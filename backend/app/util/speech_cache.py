@@ -0,0 +1,98 @@
+import hashlib
+import json
+from typing import Any, Iterable
+
+from .cache import FileStore, LRUCache
+from .codec import AudioEncoder
+from .languages import Language
+
+
+class SpeechCache:
+    """Encoded TTS audio, keyed by a hash of everything that determines it.
+
+    A bounded in-memory LRU sits in front of an optional `FileStore` on disk,
+    which is shared by every worker process and survives restarts. Both tiers
+    evict by size.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 64 * 2**20,
+        cache_dir: str | None = None,
+        max_disk_bytes: int = 2**30,
+    ):
+        self.memory_cache: LRUCache[str, bytes] = LRUCache(
+            max_size=2**16, max_weight=max_memory_bytes, weigher=len
+        )
+        self.disk_cache = (
+            FileStore(cache_dir, max_disk_bytes, suffix=".audio") if cache_dir else None
+        )
+        self.disk_hits = 0
+
+    @staticmethod
+    def key(
+        text: str, language: Language | str, voice: str, speed: float, format: str
+    ) -> str:
+        fields = [text, Language(language).value, voice, float(speed), format]
+        return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        """Check memory, then disk (promoting hits to memory)."""
+        data = self.memory_cache.get(key)
+        if data is not None or self.disk_cache is None:
+            return data
+
+        data = self.disk_cache.get(key)
+        if data is not None:
+            self.disk_hits += 1
+            self.memory_cache.put(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.memory_cache.put(key, data)
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, data)
+
+    def get_metrics(self) -> dict[str, Any]:
+        metrics: dict[str, Any] = {"memory": self.memory_cache.stats()}
+        if self.disk_cache is not None:
+            metrics["disk"] = {
+                "size": len(self.disk_cache),
+                "bytes": self.disk_cache.size,
+                "hits": self.disk_hits,
+                "evictions": self.disk_cache.evictions,
+            }
+        return metrics
+
+
+def prerender(
+    cache: SpeechCache,
+    model,
+    encoder: AudioEncoder,
+    texts: Iterable[str],
+    language: Language,
+    voice: str = "af_heart",
+    speed: float = 1.0,
+    formats: Iterable[str] = ("webm",),
+) -> int:
+    """Synthesize and cache every text not cached yet; returns how many were rendered.
+
+    Each text is synthesized once and encoded in every requested format.
+    """
+    formats = tuple(formats)
+    rendered = 0
+    for text in dict.fromkeys(texts):
+        keys = {
+            format: SpeechCache.key(text, language, voice, speed, format)
+            for format in formats
+        }
+        missing = [format for format, key in keys.items() if cache.get(key) is None]
+        if not missing:
+            continue
+
+        audio = model.run_inference(text, language, voice, speed)
+        for format in missing:
+            encoded = encoder.encode(audio.raw, audio.sampling_rate, format)
+            cache.put(keys[format], encoded.data)
+        rendered += 1
+    return rendered
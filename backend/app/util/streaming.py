@@ -0,0 +1,209 @@
+import string
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, cast
+
+import numpy as np
+
+from .model import AudioData
+
+if TYPE_CHECKING:
+    from av.audio.codeccontext import AudioCodecContext
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+def _common_prefix(a: str, b: str) -> str:
+    length = 0
+    for char_a, char_b in zip(a, b):
+        if char_a != char_b:
+            break
+        length += 1
+    prefix = a[:length]
+    # Don't commit half a word in space-separated languages.
+    if length < min(len(a), len(b)) and " " in prefix:
+        prefix = prefix[: prefix.rindex(" ") + 1]
+    return prefix
+
+
+def _normalize(word: str) -> str:
+    return word.strip(string.punctuation).lower()
+
+
+def _merge_overlap(
+    committed: str, text: str, min_overlap: int = 2, max_overlap: int = 64
+) -> str:
+    """Append `text` to `committed`, dropping the words the two windows share.
+
+    Consecutive windows overlap in audio, so the start of the new window's
+    transcript usually repeats the end of what was already committed. Text with
+    spaces overlaps in whole words (ignoring case and punctuation); scripts
+    without spaces, such as Mandarin, overlap in at least `min_overlap`
+    characters. At most `max_overlap` words or characters are compared.
+    """
+    text = text.strip()
+    if not committed:
+        return text
+    if " " in committed or " " in text:
+        words = text.split()
+        committed_words = [_normalize(word) for word in committed.split()]
+        longest = min(len(words), len(committed_words), max_overlap)
+        for size in range(longest, 0, -1):
+            if committed_words[-size:] == [_normalize(w) for w in words[:size]]:
+                text = " ".join(words[size:])
+                break
+    else:
+        longest = min(len(text), len(committed), max_overlap)
+        for size in range(longest, min_overlap - 1, -1):
+            if committed.endswith(text[:size]):
+                text = text[size:]
+                break
+    separator = " " if text[:1].isascii() and text[:1].isalnum() else ""
+    return (committed + separator + text).strip() if text else committed
+
+
+class ChunkDecoder:
+    """Decodes streamed audio chunks to float32 mono samples at 16 kHz.
+
+    Supported formats are raw PCM ("pcm_s16le", "pcm_f32le") and Opus, where
+    every chunk is one encoded Opus packet (as produced by WebCodecs'
+    `AudioEncoder`). Resampling state carries over between chunks, so there are
+    no seams at chunk boundaries.
+    """
+
+    FORMATS = ("pcm_s16le", "pcm_f32le", "opus")
+
+    def __init__(self, format: str, sample_rate: int = WHISPER_SAMPLE_RATE):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported audio format: {format}")
+
+        import av
+
+        self.format = format
+        self.sample_rate = sample_rate
+        self.codec: AudioCodecContext | None = None
+        if format == "opus":
+            self.codec = cast("AudioCodecContext", av.CodecContext.create("opus", "r"))
+            self.codec.sample_rate = sample_rate
+            self.codec.layout = "mono"  # type: ignore[assignment]
+        self.resampler = av.AudioResampler(
+            format="flt", layout="mono", rate=WHISPER_SAMPLE_RATE
+        )
+
+    def _pcm_frame(self, chunk: bytes):
+        import av
+
+        if self.format == "pcm_s16le":
+            samples = np.frombuffer(chunk, dtype="<i2").astype(np.float32) / 32768
+        else:
+            samples = np.frombuffer(chunk, dtype="<f4")
+        frame = av.AudioFrame.from_ndarray(
+            np.ascontiguousarray(samples, dtype=np.float32)[np.newaxis, :],
+            format="flt",
+            layout="mono",
+        )
+        frame.sample_rate = self.sample_rate
+        return frame
+
+    def decode(self, chunk: bytes) -> np.ndarray:
+        """Decode one chunk; raises ValueError if it is not valid audio."""
+        import av
+
+        try:
+            if self.codec is None:
+                if self.sample_rate == WHISPER_SAMPLE_RATE:
+                    return self._pcm_frame(chunk).to_ndarray()[0]
+                frames = [self._pcm_frame(chunk)]
+            else:
+                frames = self.codec.decode(av.Packet(chunk))
+            return self._resample(frames)
+        except av.error.FFmpegError as e:
+            raise ValueError(f"Undecodable audio chunk: {e}") from e
+
+    def finish(self) -> np.ndarray:
+        """Flush the decoder and resampler, returning the samples they held back."""
+        frames = [] if self.codec is None else self.codec.decode(None)
+        return self._resample([*frames, None])
+
+    def _resample(self, frames: list) -> np.ndarray:
+        resampled = [
+            out.to_ndarray()[0]
+            for frame in frames
+            for out in self.resampler.resample(frame)
+        ]
+        if not resampled:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(resampled)
+
+
+class StreamingTranscriber:
+    """Transcribes live audio over a sliding window with stable-prefix commitment.
+
+    Audio is appended as it arrives, and the current window is re-transcribed
+    every `step_seconds` of new audio. Text that two consecutive hypotheses agree
+    on is treated as stable. When the window reaches `max_window_seconds` its
+    transcript is committed and the window restarts with the last
+    `overlap_seconds` of audio as context. Only the open window needs transcribing
+    once the speaker stops, so the final result arrives about one window after
+    the last chunk instead of after a whole-utterance pass.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[AudioData], Awaitable[str]],
+        step_seconds: float = 1.0,
+        max_window_seconds: float = 15.0,
+        overlap_seconds: float = 2.0,
+    ):
+        if overlap_seconds >= max_window_seconds:
+            raise ValueError("overlap_seconds must be shorter than the window")
+
+        self.transcribe = transcribe
+        self.step_samples = int(step_seconds * WHISPER_SAMPLE_RATE)
+        self.max_window_samples = int(max_window_seconds * WHISPER_SAMPLE_RATE)
+        self.overlap_samples = int(overlap_seconds * WHISPER_SAMPLE_RATE)
+
+        self.window = np.zeros(0, dtype=np.float32)
+        self.unprocessed_samples = 0
+        self.committed = ""
+        self.stable = ""
+        self.hypothesis = ""
+
+    def _window_audio(self) -> AudioData:
+        return AudioData(sampling_rate=WHISPER_SAMPLE_RATE, raw=self.window)
+
+    async def _update(self) -> None:
+        hypothesis = (await self.transcribe(self._window_audio())).strip()
+        agreed = _common_prefix(self.hypothesis, hypothesis)
+        if len(agreed) > len(self.stable):
+            self.stable = agreed
+        self.hypothesis = hypothesis
+        self.unprocessed_samples = 0
+
+        if len(self.window) >= self.max_window_samples:
+            self.committed = _merge_overlap(self.committed, hypothesis)
+            self.window = self.window[-self.overlap_samples :].copy()
+            self.stable = self.hypothesis = ""
+
+    def _result(self, type: str, text: str) -> dict[str, Any]:
+        return {
+            "type": type,
+            "stable": _merge_overlap(self.committed, self.stable),
+            "text": text,
+        }
+
+    async def push(self, samples: np.ndarray) -> dict[str, Any] | None:
+        """Add audio; returns a partial transcript whenever a step's worth arrived."""
+        self.window = np.concatenate([self.window, samples.astype(np.float32)])
+        self.unprocessed_samples += len(samples)
+        if self.unprocessed_samples < self.step_samples:
+            return None
+
+        await self._update()
+        return self._result("partial", _merge_overlap(self.committed, self.hypothesis))
+
+    async def finish(self) -> dict[str, Any]:
+        """Transcribe whatever is left in the window and return the final transcript."""
+        if len(self.window) and (self.unprocessed_samples or not self.hypothesis):
+            self.hypothesis = (await self.transcribe(self._window_audio())).strip()
+        text = _merge_overlap(self.committed, self.hypothesis)
+        self.committed, self.stable = text, ""
+        return self._result("final", text)
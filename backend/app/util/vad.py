@@ -0,0 +1,165 @@
+import threading
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Preallocated float32 ring buffer between an audio callback and one reader.
+
+    `write` is the only copy: samples go straight from the callback's buffer
+    into the ring. `read` hands out views of the ring, so the reader must be
+    done with one before the writer laps it (i.e. within `capacity` samples).
+    If it falls further behind, the oldest unread samples are dropped and
+    counted in `overruns`.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.capacity = capacity
+        self.overruns = 0
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        self._written = 0  # total samples ever written
+        self._read = 0  # total samples ever read
+        self._ready = threading.Condition()
+
+    def __len__(self) -> int:
+        """Samples currently held (at most `capacity`)."""
+        return min(self._written, self.capacity)
+
+    def write(self, samples: np.ndarray) -> None:
+        # Only the last `capacity` samples of an oversized write can be kept.
+        skipped = max(0, len(samples) - self.capacity)
+        samples = samples[skipped:]
+        with self._ready:
+            self._written += skipped
+            start = self._written % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._buffer[start : start + first] = samples[:first]
+            self._buffer[: len(samples) - first] = samples[first:]
+            self._written += len(samples)
+            if self._written - self._read > self.capacity:
+                self.overruns += self._written - self._read - self.capacity
+                self._read = self._written - self.capacity
+            self._ready.notify()
+
+    def read(self, timeout: float | None = None) -> np.ndarray:
+        """Return the next contiguous run of unread samples as a view.
+
+        Waits up to `timeout` seconds for data and returns an empty array if
+        none arrived. A run that wraps around the end of the ring is returned
+        over two calls.
+        """
+        with self._ready:
+            if self._read == self._written:
+                self._ready.wait(timeout)
+            start = self._read % self.capacity
+            end = start + min(self._written - self._read, self.capacity - start)
+            self._read += end - start
+            return self._buffer[start:end]
+
+    def contents(self) -> np.ndarray:
+        """Everything still held, oldest first; a view unless the ring has wrapped."""
+        with self._ready:
+            if self._written <= self.capacity:
+                return self._buffer[: self._written]
+            return np.roll(self._buffer, -(self._written % self.capacity))
+
+
+class VoiceActivityDetector:
+    """Frame-level energy + zero-crossing voice activity detector with hangover.
+
+    Audio is cut into `frame_ms` frames. A frame is speech when its RMS is
+    `energy_ratio` times above the running noise floor (and above `min_rms`),
+    or when it is at least half that loud with a high zero-crossing rate, which
+    catches quiet fricatives such as "s" and "sh". Speech starts after
+    `onset_ms` of consecutive speech frames and ends after `hangover_ms` of
+    consecutive non-speech frames, so short pauses between words don't end it.
+    The first `calibration_ms` only measure the noise floor.
+    """
+
+    def __init__(
+        self,
+        sampling_rate: int,
+        frame_ms: float = 20,
+        hangover_ms: float = 300,
+        onset_ms: float = 60,
+        energy_ratio: float = 3.0,
+        min_rms: float = 0.005,
+        zcr_threshold: float = 0.25,
+        noise_adaptation: float = 0.05,
+        calibration_ms: float = 100,
+    ):
+        self.frame_size = max(1, int(sampling_rate * frame_ms / 1000))
+        self.hangover_frames = max(1, round(hangover_ms / frame_ms))
+        self.onset_frames = max(1, round(onset_ms / frame_ms))
+        self.calibration_frames = round(calibration_ms / frame_ms)
+        self.energy_ratio = energy_ratio
+        self.min_rms = min_rms
+        self.zcr_threshold = zcr_threshold
+        self.noise_adaptation = noise_adaptation
+
+        self.noise_rms = min_rms
+        self._calibrated_frames = 0
+        self.speech_started = False
+        self.speech_ended = False
+        self._speech_run = 0
+        self._silence_run = 0
+        # Samples left over from the last call that don't fill a frame yet.
+        self._partial = np.zeros(0, dtype=np.float32)
+
+    def _is_speech(self, frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Per-frame speech decision and RMS for a (frames, frame_size) array."""
+        rms = np.sqrt(np.mean(frames**2, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (
+            self.frame_size - 1 or 1
+        )
+        floor = np.maximum(self.noise_rms * self.energy_ratio, self.min_rms)
+        return (rms > floor) | ((rms > floor / 2) & (zcr > self.zcr_threshold)), rms
+
+    def _calibrate(self, frames: np.ndarray) -> None:
+        """Average the RMS of the first frames into the initial noise floor."""
+        seen = self._calibrated_frames
+        self._calibrated_frames += len(frames)
+        total = self.noise_rms * seen + np.sqrt(np.mean(frames**2, axis=1)).sum()
+        self.noise_rms = float(total / self._calibrated_frames)
+        self.calibration_frames -= len(frames)
+
+    def process(self, samples: np.ndarray) -> bool:
+        """Feed new samples; returns True once the end of speech has been detected."""
+        if self.speech_ended:
+            return True
+
+        if len(self._partial):
+            samples = np.concatenate([self._partial, samples])
+        whole = len(samples) - len(samples) % self.frame_size
+        self._partial = samples[whole:].copy()
+        if not whole:
+            return False
+
+        frames = samples[:whole].reshape(-1, self.frame_size)
+        if self.calibration_frames:
+            calibration = frames[: self.calibration_frames]
+            self._calibrate(calibration)
+            frames = frames[len(calibration) :]
+            if not len(frames):
+                return False
+
+        is_speech, rms = self._is_speech(frames)
+        for speech, frame_rms in zip(is_speech, rms):
+            if speech:
+                self._speech_run += 1
+                self._silence_run = 0
+                if self._speech_run >= self.onset_frames:
+                    self.speech_started = True
+            else:
+                self._speech_run = 0
+                self._silence_run += 1
+                # Track the noise floor only outside speech, so it can't creep up.
+                self.noise_rms += self.noise_adaptation * (frame_rms - self.noise_rms)
+                if self.speech_started and self._silence_run >= self.hangover_frames:
+                    self.speech_ended = True
+                    return True
+        return False
@@ -0,0 +1,44 @@
+import asyncio
+
+from app.util.batching import MicroBatcher
+
+
+def test_micro_batcher_groups_requests_by_key():
+    batches = []
+
+    def process_batch(key, items):
+        batches.append((key, items))
+        return [f"{key}:{item}" for item in items]
+
+    async def run():
+        batcher = MicroBatcher(process_batch, max_batch_size=4, max_wait_ms=20)
+        results = await asyncio.gather(
+            batcher.submit("zh", 1),
+            batcher.submit("zh", 2),
+            batcher.submit("en", 3),
+        )
+        await batcher.close()
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+
+    assert results == ["zh:1", "zh:2", "en:3"]
+    assert batches == [("zh", [1, 2]), ("en", [3])]
+    assert batcher.batch_size_histogram == {2: 1, 1: 1}
+    assert batcher.wait_stats.count == 3
+
+
+def test_micro_batcher_propagates_errors():
+    def process_batch(key, items):
+        raise RuntimeError("boom")
+
+    async def run():
+        batcher = MicroBatcher(process_batch, max_wait_ms=1)
+        try:
+            await batcher.submit("zh", 1)
+        except RuntimeError as e:
+            return str(e)
+        finally:
+            await batcher.close()
+
+    assert asyncio.run(run()) == "boom"
@@ -0,0 +1,132 @@
+import argparse
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+import transformers
+
+from app.benchmark import (
+    STAGES,
+    Stage,
+    find_regressions,
+    measure,
+    parse_args,
+    run_stages,
+)
+from app.util.model import QwenCausalLM
+
+
+def test_measure_reports_percentiles_and_throughput():
+    result = measure(lambda: (10, 0.5), iterations=4, warmup=0)
+
+    assert result["p50_ms"] == 500
+    assert result["p99_ms"] == 500
+    assert result["throughput"] == 20
+
+
+def test_run_stages_reports_the_memory_each_stage_adds():
+    kept = []
+
+    def allocate(args):
+        kept.append(bytearray(64 * 2**20))
+        return lambda: 1
+
+    stages = [Stage("first", allocate, "x"), Stage("second", allocate, "x")]
+    report = run_stages(stages, argparse.Namespace(iterations=1))
+
+    # Not the process-wide peak, which would put the first stage into the second.
+    assert 60 < report["first"]["rss_delta_mib"] < 70
+    assert 60 < report["second"]["rss_delta_mib"] < 70
+
+
+def test_run_stages_closes_the_iteration_even_when_it_fails():
+    class Run:
+        closed = False
+
+        def __call__(self):
+            raise RuntimeError("decode failed")
+
+        def close(self):
+            Run.closed = True
+
+    with pytest.raises(RuntimeError):
+        run_stages(
+            [Stage("qwen", lambda args: Run(), "x")], argparse.Namespace(iterations=1)
+        )
+
+    assert Run.closed
+
+
+def test_missing_checkpoint_skips_stage():
+    def setup(args):
+        raise OSError("not in the local cache\nmore detail")
+
+    stages = [Stage("model", setup, "tokens"), Stage("codec", lambda a: lambda: 1, "x")]
+    report = run_stages(stages, argparse.Namespace(iterations=2))
+
+    assert report["model"] == {"skipped": "OSError: not in the local cache"}
+    assert report["codec"]["unit"] == "x/s"
+
+
+def test_find_regressions_flags_slower_p50_only_past_threshold():
+    baseline = {"decode": {"p50_ms": 10.0}, "encode": {"p50_ms": 10.0}}
+    report = {
+        "decode": {"p50_ms": 12.0},
+        "encode": {"p50_ms": 13.0},
+        "whisper": {"p50_ms": 100.0},
+        "qwen": {"skipped": "OSError"},
+    }
+
+    assert find_regressions(report, baseline, threshold=0.25) == [
+        "encode: p50_ms 13.0 vs baseline 10.0"
+    ]
+
+
+def test_find_regressions_gates_throughput_and_memory():
+    baseline = {
+        "slower": {"throughput": 100.0, "rss_delta_mib": 400.0},
+        "bigger": {"throughput": 100.0, "rss_delta_mib": 400.0},
+        "noise": {"throughput": 100.0, "rss_delta_mib": 1.0},
+    }
+    report = {
+        "slower": {"throughput": 70.0, "rss_delta_mib": 400.0},
+        "bigger": {"throughput": 130.0, "rss_delta_mib": 520.0},
+        # Tripled, but by less than the slack.
+        "noise": {"throughput": 100.0, "rss_delta_mib": 3.0},
+    }
+
+    assert find_regressions(report, baseline, threshold=0.25) == [
+        "slower: throughput 70.0 vs baseline 100.0",
+        "bigger: rss_delta_mib 520.0 vs baseline 400.0",
+    ]
+
+
+def test_qwen_stages_share_one_model(monkeypatch, tmp_path):
+    load_model = MagicMock()
+    monkeypatch.setattr(
+        transformers.AutoModelForCausalLM, "from_pretrained", load_model
+    )
+    load_tokenizer = MagicMock()
+    load_tokenizer.return_value.return_value.input_ids = torch.ones(1, 4, dtype=int)
+    monkeypatch.setattr(transformers.AutoTokenizer, "from_pretrained", load_tokenizer)
+    (tmp_path / "qwen1.5-0.5b-chat").mkdir()
+    args = parse_args(["--checkpoints", str(tmp_path), "--iterations", "1"])
+
+    stages = [s for s in STAGES if s.name in ("qwen_prefill", "qwen_decode")]
+    try:
+        report = run_stages(stages, args)
+    finally:
+        QwenCausalLM.release_instance()
+
+    assert report["qwen_prefill"]["unit"] == "tokens/s"
+    assert report["qwen_decode"]["unit"] == "tokens/s"
+    load_model.assert_called_once()
+
+
+def test_missing_local_checkpoint_skips_model_stage(tmp_path):
+    args = parse_args(["--checkpoints", str(tmp_path), "--iterations", "1"])
+    stages = [s for s in STAGES if s.name == "whisper"]
+
+    report = run_stages(stages, args)
+
+    assert report["whisper"]["skipped"].startswith("FileNotFoundError")
@@ -0,0 +1,124 @@
+import os
+import threading
+
+from app.util.cache import FileStore, LRUCache, SingleFlight, SqliteStore
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache: LRUCache[str, int] = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_lru_cache_get_or_create_builds_once():
+    cache: LRUCache[tuple[str, str], object] = LRUCache(max_size=4)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    first = cache.get_or_create(("transcribe", "MANDARIN"), factory)
+    second = cache.get_or_create(("transcribe", "MANDARIN"), factory)
+
+    assert first is second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_cache_evicts_over_weight_budget():
+    cache: LRUCache[str, bytes] = LRUCache(max_size=10, max_weight=10, weigher=len)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.weight == 10
+
+    cache.put("c", b"1")
+    assert "a" not in cache
+    assert cache.weight == 6
+
+    cache.put("d", b"x" * 11)  # larger than the whole budget
+    assert "d" not in cache
+    assert cache.weight == 0
+
+
+def test_sqlite_store_persists_across_connections(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    store = SqliteStore(path, table="translations")
+    store.put("MANDARIN:ENGLISH:你好", "Hello")
+    store.put("MANDARIN:ENGLISH:你好", "Hi")
+    store.close()
+
+    reopened = SqliteStore(path, table="translations")
+    assert reopened.get("MANDARIN:ENGLISH:你好") == "Hi"
+    assert reopened.get("missing") is None
+    assert len(reopened) == 1
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight: SingleFlight[str, str] = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_translate():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "Hello"
+
+    results = []
+    leader = threading.Thread(
+        target=lambda: results.append(flight.do("你好", slow_translate))
+    )
+    leader.start()
+    started.wait()
+
+    follower = threading.Thread(
+        target=lambda: results.append(flight.do("你好", slow_translate))
+    )
+    follower.start()
+    while flight.coalesced == 0:
+        pass
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert results == ["Hello", "Hello"]
+    assert len(calls) == 1
+    assert flight.coalesced == 1
+
+
+def test_file_store_evicts_least_recently_read_past_max_bytes(tmp_path):
+    store = FileStore(str(tmp_path), max_bytes=10)
+    store.put("a", b"aaaa")
+    store.put("b", b"bbbb")
+    os.utime(tmp_path / "b", (0, 0))
+    store.get("a")
+
+    store.put("c", b"cccc")
+
+    assert store.get("b") is None
+    assert store.get("a") == b"aaaa"
+    assert store.size == 8
+    assert len(FileStore(str(tmp_path), max_bytes=10)) == 2
+
+
+def test_file_store_counts_files_written_by_other_processes(tmp_path):
+    worker = FileStore(str(tmp_path), max_bytes=10)
+    other_worker = FileStore(str(tmp_path), max_bytes=10)
+    worker.put("a", b"aaaa")
+    os.utime(tmp_path / "a", (0, 0))
+    other_worker.put("b", b"bbbb")
+
+    worker.put("c", b"cccc")
+
+    assert sorted(os.listdir(tmp_path)) == ["b", "c"]
+    assert worker.size == 8
+    assert len(worker) == 2
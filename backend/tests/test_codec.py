@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from app.util.codec import (
+    AudioEncoder,
+    StreamingAudioEncoder,
+    decode_audio,
+    negotiate_format,
+)
+
+
+def _tone(seconds: float, sample_rate: int) -> np.ndarray:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def _encode(samples: np.ndarray, sample_rate: int) -> bytes:
+    encoder = StreamingAudioEncoder("webm", sample_rate)
+    return encoder.encode(samples) + encoder.close()
+
+
+def test_decode_audio_resamples_webm_to_mono_16khz():
+    samples = decode_audio(_encode(_tone(2.0, 24000), 24000))
+
+    assert samples.dtype == np.float32
+    assert abs(len(samples) - 32000) < 1600
+    assert 0.2 < np.abs(samples).max() < 0.4
+
+
+def test_decode_audio_grows_past_default_capacity(monkeypatch):
+    monkeypatch.setattr("app.util.codec._DEFAULT_DECODE_SECONDS", 0)
+    data = _encode(_tone(3.0, 48000), 48000)
+
+    assert abs(len(decode_audio(data)) - 48000) < 1600
+
+
+def test_decode_audio_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_audio(b"not audio")
+
+
+@pytest.mark.parametrize("format", ["webm", "ogg", "wav"])
+def test_audio_encoder_output_decodes(format):
+    encoder = AudioEncoder()
+    encoded = encoder.encode(_tone(1.0, 24000), 24000, format)
+
+    assert abs(len(decode_audio(encoded.data)) - 16000) < 1600
+    assert encoder.get_metrics()[format]["cpu"]["count"] == 1
+
+
+def test_streaming_ogg_flushes_each_segment():
+    encoder = StreamingAudioEncoder("ogg", 24000)
+
+    assert len(encoder.encode(_tone(0.5, 24000))) > 1000
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, "webm"),
+        ("*/*", "webm"),
+        ("audio/x-wav", "wav"),
+        ("audio/ogg;q=0.5, audio/wav;q=0.9", "wav"),
+        ("audio/*;q=0.1, application/octet-stream", "pcm"),
+        ("audio/L16", None),
+        ("text/html", None),
+        ("audio/webm;q=0, */*", "ogg"),
+        ("audio/webm;q=0, audio/ogg;q=0, audio/*;q=0.5, audio/wav;q=0.1", "pcm"),
+        ("audio/webm;q=0", None),
+    ],
+)
+def test_negotiate_format(accept, expected):
+    assert negotiate_format(accept) == expected
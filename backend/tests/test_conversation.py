@@ -0,0 +1,79 @@
+import json
+
+import pytest
+import torch
+import transformers
+from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+from app.util.model import ConversationGeneratorModel
+
+
+@pytest.fixture
+def tokenizer(tmp_path):
+    """A byte-level Blenderbot tokenizer with one token per byte and no merges."""
+    tokens = ["<s>", "<pad>", "</s>", "<unk>", *bytes_to_unicode().values(), "<mask>"]
+    (tmp_path / "vocab.json").write_text(
+        json.dumps({t: i for i, t in enumerate(tokens)})
+    )
+    (tmp_path / "merges.txt").write_text("#version: 0.2\n")
+    return transformers.BlenderbotTokenizer(
+        str(tmp_path / "vocab.json"), str(tmp_path / "merges.txt")
+    )
+
+
+class StubBlenderbot:
+    """Replies with a fixed text and records the input ids of each call."""
+
+    def __init__(self, tokenizer, reply: str):
+        self.reply_ids = torch.tensor([tokenizer(reply).input_ids])
+        self.calls: list[list[int]] = []
+
+    def generate(self, input_ids, attention_mask):
+        self.calls.append(input_ids[0].tolist())
+        return self.reply_ids
+
+
+@pytest.fixture
+def conversation(tokenizer, monkeypatch):
+    model = StubBlenderbot(tokenizer, "That sounds lovely, tell me more.")
+    monkeypatch.setattr(
+        transformers.BlenderbotTokenizer, "from_pretrained", lambda *a, **kw: tokenizer
+    )
+    monkeypatch.setattr(
+        transformers.BlenderbotForConditionalGeneration,
+        "from_pretrained",
+        lambda *a, **kw: model,
+    )
+    return ConversationGeneratorModel()
+
+
+def test_cached_history_ids_match_tokenizing_the_whole_context(conversation):
+    tokenizer, model = conversation.tokenizer, conversation.model
+    truncated = False
+
+    for turn in range(8):
+        conversation.run_inference(f"I went to the market on day {turn}.")
+        # History before the reply was appended: what the model was given.
+        context = conversation.history[:-1]
+        truncated = truncated or len(context) < 2 * turn + 1
+
+        expected = tokenizer("\n".join(context)).input_ids
+        assert model.calls[-1] == expected
+        assert len(expected) <= conversation.MAX_INPUT_TOKENS
+
+    assert truncated
+
+
+def test_oversized_input_keeps_its_last_tokens(conversation):
+    tokenizer, model = conversation.tokenizer, conversation.model
+    conversation.run_inference("hello")
+    text = " ".join(f"word{i}" for i in range(100))
+
+    conversation.run_inference(text)
+
+    assert conversation.history[:-1] == [f"User: {text}"]
+    context_ids = tokenizer(f"User: {text}", add_special_tokens=False).input_ids
+    budget = conversation.MAX_INPUT_TOKENS - tokenizer.num_special_tokens_to_add()
+    assert model.calls[-1] == tokenizer.build_inputs_with_special_tokens(
+        context_ids[-budget:]
+    )
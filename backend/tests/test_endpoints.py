@@ -1,19 +1,60 @@
+import asyncio
 import io
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import numpy as np
 from fastapi.testclient import TestClient
 
-from app.dependencies import get_models
+from app.dependencies import get_executors, get_models, get_speech_cache
 from app.main import app
+from app.util import metrics
+from app.util.codec import StreamingAudioEncoder
+from app.util.executor import ModelExecutor
 from app.util.model import AudioData
+from app.util.speech_cache import SpeechCache
 
 # Dynamically create magic mock for each model to be loaded
 mock_models = MagicMock()
 app.dependency_overrides[get_models] = lambda: mock_models
+
+# Every model shares one real executor so inference still runs off the loop
+mock_executors = MagicMock()
+mock_executors.__getitem__.return_value = ModelExecutor("test", max_workers=2)
+app.dependency_overrides[get_executors] = lambda: mock_executors
+speech_cache = SpeechCache()
+app.dependency_overrides[get_speech_cache] = lambda: speech_cache
 test_client = TestClient(app)
 
 
+def test_healthz():
+    response = test_client.get(url="/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_metrics_reports_request_latency_by_route():
+    test_client.get(url="/healthz")
+
+    response = test_client.get(url="/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'app_request_duration_seconds_count{method="GET",route="/healthz",status="200"}'
+        in response.text
+    )
+
+
+def test_readyz_reports_models_still_loading():
+    mock_models.readiness.return_value = (
+        False,
+        {"WhisperModel": {"state": "LOADING", "lazy": False}},
+    )
+
+    response = test_client.get(url="/readyz")
+    assert response.status_code == 503
+    assert response.json()["models"]["WhisperModel"]["state"] == "LOADING"
+
+
 def test_translate_text():
     # Set-up mock
     mock_translator = MagicMock()
@@ -48,43 +89,122 @@ def test_calculate_similarity():
     mock_semantic_matcher.get_similarity.assert_called_once()
 
 
-def test_transcribe_audio(monkeypatch):
+def test_calculate_similarity_batch():
+    mock_semantic_matcher = MagicMock()
+    mock_semantic_matcher.rank_candidates.return_value = {
+        "scores": [[0.9, 0.1]],
+        "matches": [[{"index": 0, "text": "Candidate 1", "score": 0.9}]],
+    }
+    mock_models.__getitem__.return_value = mock_semantic_matcher
+
+    response = test_client.post(
+        url="/api/v1/calculate_similarity_batch",
+        json={
+            "queries": ["Answer"],
+            "candidates": ["Candidate 1", "Candidate 2"],
+            "top_k": 1,
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["matches"][0][0]["text"] == "Candidate 1"
+    mock_semantic_matcher.rank_candidates.assert_called_once_with(
+        ["Answer"], ["Candidate 1", "Candidate 2"], top_k=1
+    )
+
+
+def test_calculate_similarity_batch_rejects_empty_candidates():
+    response = test_client.post(
+        url="/api/v1/calculate_similarity_batch",
+        json={"queries": ["Answer"], "candidates": []},
+    )
+    assert response.status_code == 422
+
+
+def test_calculate_similarity_batch_rejects_oversized_requests():
+    mock_semantic_matcher = MagicMock()
+    mock_models.__getitem__.return_value = mock_semantic_matcher
+
+    for body in (
+        {"queries": ["Answer"] * 65, "candidates": ["Candidate"]},
+        {"queries": ["Answer"], "candidates": ["Candidate"] * 257},
+        {"queries": ["Answer"], "candidates": ["x" * 513]},
+    ):
+        response = test_client.post(url="/api/v1/calculate_similarity_batch", json=body)
+        assert response.status_code == 422
+    mock_semantic_matcher.rank_candidates.assert_not_called()
+
+
+def test_transcribe_stream_sends_partial_and_final_transcripts():
     mock_whisper_model = MagicMock()
-    mock_whisper_model.run_inference.return_value = {"text": "Test"}
+    mock_whisper_model.transcribe = AsyncMock(return_value={"text": "你好"})
     mock_models.__getitem__.return_value = mock_whisper_model
-    mock_audio = io.BytesIO(b"Sample Audio")
+    one_second = np.zeros(16000, dtype="<i2").tobytes()
 
-    # Monkey patch AudioSegment.from_file
-    class FakeAudio:
-        sample_width = 2
-        frame_rate = 16000
+    with test_client.websocket_connect(
+        "/api/v1/transcribe_stream?language=MANDARIN&format=pcm_s16le"
+    ) as websocket:
+        websocket.send_bytes(one_second)
+        partial = websocket.receive_json()
+        websocket.send_text("end")
+        final = websocket.receive_json()
 
-        def set_channels(self, n):
-            return self
+    assert partial == {"type": "partial", "stable": "", "text": "你好"}
+    assert final["type"] == "final"
+    assert final["text"] == "你好"
 
-        def set_frame_rate(self, rate):
-            return self
 
-        def get_array_of_samples(self):
-            return [0, 1, 2, 3]
+def test_transcribe_stream_closes_on_undecodable_chunk():
+    mock_models.__getitem__.return_value = MagicMock()
 
-    monkeypatch.setattr(
-        "app.api.v1.endpoints.AudioSegment.from_file", lambda *a, **kw: FakeAudio()
-    )
+    with test_client.websocket_connect(
+        "/api/v1/transcribe_stream?format=pcm_s16le"
+    ) as websocket:
+        websocket.send_bytes(b"odd")  # not a whole number of int16 samples
+        message = websocket.receive()
+
+    assert message["type"] == "websocket.close"
+    assert message["code"] == 1007
+
+
+def _webm_clip(seconds: float = 1.0, sample_rate: int = 24000) -> bytes:
+    encoder = StreamingAudioEncoder("webm", sample_rate)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    return encoder.encode(samples) + encoder.close()
+
+
+def test_transcribe_audio():
+    mock_whisper_model = MagicMock()
+    mock_whisper_model.transcribe = AsyncMock(return_value={"text": "Test"})
+    mock_models.__getitem__.return_value = mock_whisper_model
 
     response = test_client.post(
         url="/api/v1/transcribe_audio",
         files={
-            "file": ("test.webm", mock_audio, "audio/webm"),
+            "file": ("test.webm", io.BytesIO(_webm_clip()), "audio/webm"),
         },
         data={"language": "MANDARIN"},
     )
     assert response.status_code == 200
     assert response.json()["text"] == "Test"
-    mock_whisper_model.run_inference.assert_called_once()
+    mock_whisper_model.transcribe.assert_awaited_once()
+    audio_data = mock_whisper_model.transcribe.await_args.args[0]
+    assert audio_data.sampling_rate == 16000
+    assert audio_data.raw.dtype == np.float32
+    assert abs(len(audio_data.raw) - 16000) < 1600
+
+
+def test_transcribe_audio_rejects_unreadable_audio():
+    mock_models.__getitem__.return_value = MagicMock()
+
+    response = test_client.post(
+        url="/api/v1/transcribe_audio",
+        files={"file": ("test.webm", io.BytesIO(b"Sample Audio"), "audio/webm")},
+    )
+    assert response.status_code == 400
 
 
-def test_generate_audio(monkeypatch):
+def test_generate_audio():
     mock_kokoro_model = MagicMock()
     mock_kokoro_model.run_inference.return_value = AudioData(
         sampling_rate=16000, raw=np.zeros(16000, dtype=np.float32)
@@ -97,3 +217,271 @@ def test_generate_audio(monkeypatch):
     assert response.status_code == 200
     assert response.headers["content-type"] == "audio/webm"
     assert "attachment; filename=output.webm" in response.headers["content-disposition"]
+    assert "encode;dur=" in response.headers["server-timing"]
+
+
+def test_generate_audio_skips_compression_for_wav_clients():
+    mock_kokoro_model = MagicMock()
+    mock_kokoro_model.run_inference.return_value = AudioData(
+        sampling_rate=24000, raw=np.zeros(24000, dtype=np.float32)
+    )
+    mock_models.__getitem__.return_value = mock_kokoro_model
+
+    response = test_client.post(
+        url="/api/v1/generate_audio",
+        json={"text": "Test", "language": "MANDARIN"},
+        headers={"Accept": "audio/ogg;q=0.5, audio/wav"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/wav"
+    assert response.content[:4] == b"RIFF"
+    assert len(response.content) == 44 + 2 * 24000
+
+
+def test_generate_audio_sends_raw_pcm_as_little_endian_octet_stream():
+    mock_kokoro_model = MagicMock()
+    mock_kokoro_model.run_inference.return_value = AudioData(
+        sampling_rate=24000, raw=np.array([0.5, -0.5], dtype=np.float32)
+    )
+    mock_models.__getitem__.return_value = mock_kokoro_model
+
+    response = test_client.post(
+        url="/api/v1/generate_audio",
+        json={"text": "PCM", "language": "MANDARIN"},
+        headers={"Accept": "application/octet-stream"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["x-sample-rate"] == "24000"
+    assert response.content == np.array([16383, -16383], dtype="<i2").tobytes()
+
+
+def test_generate_audio_serves_repeats_from_cache_with_etag():
+    mock_kokoro_model = MagicMock()
+    mock_kokoro_model.run_inference.return_value = AudioData(
+        sampling_rate=24000, raw=np.zeros(2400, dtype=np.float32)
+    )
+    mock_models.__getitem__.return_value = mock_kokoro_model
+    body = {"text": "菜单", "language": "MANDARIN", "voice": "zf_xiaobei"}
+
+    first = test_client.post(url="/api/v1/generate_audio", json=body)
+    second = test_client.post(url="/api/v1/generate_audio", json=body)
+    revalidated = test_client.post(
+        url="/api/v1/generate_audio",
+        json=body,
+        headers={"If-None-Match": first.headers["etag"]},
+    )
+
+    mock_kokoro_model.run_inference.assert_called_once_with(
+        "菜单", "MANDARIN", "zf_xiaobei", 1.0
+    )
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.headers["server-timing"] == "cache;desc=hit"
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+
+def test_generate_audio_rejects_unsupported_accept():
+    mock_models.__getitem__.return_value = MagicMock()
+
+    response = test_client.post(
+        url="/api/v1/generate_audio",
+        json={"text": "Test", "language": "MANDARIN"},
+        headers={"Accept": "audio/flac"},
+    )
+    assert response.status_code == 406
+
+
+def test_generate_audio_stream_sends_each_sentence_as_pcm():
+    mock_kokoro_model = MagicMock()
+    mock_kokoro_model.SAMPLE_RATE = 24000
+    mock_kokoro_model.stream_inference.return_value = iter(
+        [
+            AudioData(sampling_rate=24000, raw=np.full(100, 0.5, dtype=np.float32)),
+            AudioData(sampling_rate=24000, raw=np.zeros(50, dtype=np.float32)),
+        ]
+    )
+    mock_models.__getitem__.return_value = mock_kokoro_model
+
+    response = test_client.post(
+        url="/api/v1/generate_audio_stream",
+        json={"text": "你好。谢谢。", "language": "MANDARIN", "format": "pcm"},
+    )
+    assert response.status_code == 200
+    assert response.headers["x-sample-rate"] == "24000"
+    samples = np.frombuffer(response.content, dtype="<i2")
+    assert len(samples) == 150
+    assert samples[0] == 16383
+
+
+def test_generate_audio_stream_encodes_webm():
+    mock_kokoro_model = MagicMock()
+    mock_kokoro_model.SAMPLE_RATE = 24000
+    mock_kokoro_model.stream_inference.return_value = iter(
+        [AudioData(sampling_rate=24000, raw=np.zeros(24000, dtype=np.float32))]
+    )
+    mock_models.__getitem__.return_value = mock_kokoro_model
+
+    response = test_client.post(
+        url="/api/v1/generate_audio_stream",
+        json={"text": "你好。", "language": "MANDARIN"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/webm"
+    assert response.content.startswith(b"\x1a\x45\xdf\xa3")  # EBML header
+
+
+def _mock_dialogue_engine(tokens, error=None):
+    async def streamer():
+        for token in tokens:
+            yield token
+
+    mock_dialogue_engine = MagicMock()
+    mock_dialogue_engine.create_session.return_value = "session-1"
+    mock_dialogue_engine.create_streamer.return_value = streamer()
+    mock_dialogue_engine.start_reply.return_value.wait.side_effect = error
+    mock_models.__getitem__.return_value = mock_dialogue_engine
+    return mock_dialogue_engine
+
+
+def test_chat_streams_tokens():
+    mock_dialogue_engine = _mock_dialogue_engine(["你好", "", "！"])
+
+    response = test_client.post(url="/api/v1/chat", json={"message": "你好"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-session-id"] == "session-1"
+    assert response.text == (
+        'data: {"token": "你好"}\n\ndata: {"token": "！"}\n\nevent: done\ndata: {}\n\n'
+    )
+    mock_dialogue_engine.start_reply.assert_called_once()
+    request = mock_dialogue_engine.start_reply.return_value
+    request.wait.assert_called_once()
+    request.cancelled.set.assert_called_once()
+
+
+def test_chat_sends_error_event_when_generation_fails():
+    _mock_dialogue_engine(["你好"], error=RuntimeError("generation failed"))
+
+    response = test_client.post(url="/api/v1/chat", json={"message": "你好"})
+    assert response.status_code == 200
+    assert 'data: {"token": "你好"}' in response.text
+    assert response.text.endswith(
+        'event: error\ndata: {"detail": "generation failed"}\n\n'
+    )
+
+
+def test_request_latency_covers_the_whole_streamed_body():
+    mock_dialogue_engine = _mock_dialogue_engine([])
+
+    async def slow_streamer():
+        await asyncio.sleep(0.2)
+        yield "你好"
+
+    mock_dialogue_engine.create_streamer.return_value = slow_streamer()
+
+    assert test_client.post(url="/api/v1/chat", json={"message": "你好"}).text
+    metrics = test_client.get(url="/metrics").text
+    prefix = (
+        'app_request_duration_seconds_sum{method="POST",route="/api/v1/chat",'
+        'status="200"} '
+    )
+    total = next(line for line in metrics.splitlines() if line.startswith(prefix))
+    assert float(total.removeprefix(prefix)) >= 0.2
+
+
+def test_request_span_covers_the_whole_streamed_body(monkeypatch):
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(metrics, "_tracer", provider.get_tracer("test"))
+    mock_dialogue_engine = _mock_dialogue_engine([])
+
+    async def slow_streamer():
+        await asyncio.sleep(0.2)
+        yield "你好"
+
+    mock_dialogue_engine.create_streamer.return_value = slow_streamer()
+
+    assert test_client.post(url="/api/v1/chat", json={"message": "你好"}).text
+    (request_span,) = [
+        s for s in exporter.get_finished_spans() if s.name == "POST /api/v1/chat"
+    ]
+    assert request_span.end_time - request_span.start_time >= 0.2e9
+
+
+def test_chat_rejects_out_of_range_sampling_parameters():
+    mock_dialogue_engine = _mock_dialogue_engine([])
+
+    for params in ({"max_new_tokens": 100_000}, {"temperature": -1}, {"top_p": 0}):
+        response = test_client.post(
+            url="/api/v1/chat", json={"message": "你好", **params}
+        )
+        assert response.status_code == 422
+    mock_dialogue_engine.start_reply.assert_not_called()
+
+
+def test_chat_rejects_unknown_session():
+    mock_dialogue_engine = _mock_dialogue_engine([])
+    mock_dialogue_engine.has_session.return_value = False
+
+    response = test_client.post(
+        url="/api/v1/chat", json={"message": "你好", "session_id": "expired"}
+    )
+    assert response.status_code == 404
+    mock_dialogue_engine.start_reply.assert_not_called()
+
+
+def test_chat_releases_admission_slot_after_reply():
+    executor = ModelExecutor("QwenCausalLM", max_workers=1, max_pending=1)
+    mock_executors.__getitem__.return_value = executor
+    try:
+        for _ in range(2):
+            _mock_dialogue_engine(["你好"])
+            response = test_client.post(url="/api/v1/chat", json={"message": "你好"})
+            assert response.status_code == 200
+    finally:
+        mock_executors.__getitem__.return_value = ModelExecutor("test", max_workers=2)
+    assert executor.pending == 0
+
+
+def test_chat_returns_429_when_replies_are_saturated():
+    mock_dialogue_engine = _mock_dialogue_engine(["你好"])
+    mock_executors.__getitem__.return_value = ModelExecutor(
+        "QwenCausalLM", max_workers=1, max_pending=1
+    )
+    mock_executors.__getitem__.return_value.pending = 1
+
+    try:
+        response = test_client.post(url="/api/v1/chat", json={"message": "你好"})
+    finally:
+        mock_executors.__getitem__.return_value = ModelExecutor("test", max_workers=2)
+
+    assert response.status_code == 429
+    mock_dialogue_engine.start_reply.assert_not_called()
+
+
+def test_busy_executor_returns_429():
+    mock_models.__getitem__.return_value = MagicMock()
+    mock_executors.__getitem__.return_value = ModelExecutor(
+        "busy", max_workers=1, max_pending=1
+    )
+    mock_executors.__getitem__.return_value.pending = 1
+
+    try:
+        response = test_client.post(
+            url="/api/v1/calculate_similarity",
+            json={"text_1": "Text 1", "text_2": "Text 2"},
+        )
+    finally:
+        mock_executors.__getitem__.return_value = ModelExecutor("test", max_workers=2)
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
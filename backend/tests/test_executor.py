@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.util.executor import (
+    ExecutorBusyError,
+    ExecutorTimeoutError,
+    ModelExecutor,
+    partition_torch_threads,
+)
+
+
+def test_model_executor_runs_off_the_event_loop():
+    executor = ModelExecutor("test", max_workers=2)
+
+    async def run():
+        return await executor.run(lambda x: (x, threading.current_thread().name), 1)
+
+    result, thread_name = asyncio.run(run())
+    executor.shutdown()
+
+    assert result == 1
+    assert thread_name.startswith("test")
+    assert executor.run_stats.count == 1
+    assert executor.pending == 0
+
+
+def test_model_executor_rejects_when_queue_is_full():
+    executor = ModelExecutor("test", max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def run():
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(lambda: None)
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(run())
+    executor.shutdown()
+
+    assert executor.rejected == 1
+    assert executor.pending == 0
+
+
+def test_model_executor_times_out_stale_requests():
+    executor = ModelExecutor("test", max_workers=1, max_queue_wait_s=0.01)
+    release = threading.Event()
+    calls = []
+
+    async def run():
+        blocker = asyncio.ensure_future(executor.run(release.wait, 0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorTimeoutError):
+            await executor.run(calls.append, 1)
+        await blocker
+
+    asyncio.run(run())
+    executor.shutdown()
+
+    assert calls == []
+    assert executor.timed_out == 1
+
+
+def test_partition_torch_threads_splits_cores_between_cpu_bound_workers():
+    executors = [
+        ModelExecutor("a", max_workers=2),
+        ModelExecutor("b", max_workers=2),
+        ModelExecutor("network", max_workers=8, max_pending=8, cpu_bound=False),
+    ]
+    assert partition_torch_threads(executors, cpu_count=8) == 2
+    assert partition_torch_threads(executors, cpu_count=2) == 1
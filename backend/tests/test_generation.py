@@ -0,0 +1,195 @@
+import zlib
+from types import SimpleNamespace
+
+import pytest
+import torch
+import transformers
+from transformers import DynamicCache, Qwen2Config, Qwen2ForCausalLM
+
+from app.util.generation import ContinuousBatcher, GenerationRequest
+from app.util.model import QwenCausalLM
+
+
+def _tiny_model():
+    torch.manual_seed(0)
+    config = Qwen2Config(
+        vocab_size=64,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+    )
+    return Qwen2ForCausalLM(config).eval()
+
+
+def test_continuous_batcher_matches_sequential_greedy_decoding():
+    model = _tiny_model()
+    prompts = [torch.randint(2, 64, (1, length)) for length in (3, 9, 6)]
+
+    expected = [
+        model.generate(
+            prompt,
+            attention_mask=torch.ones_like(prompt),
+            max_new_tokens=6,
+            do_sample=False,
+            eos_token_id=1,
+            pad_token_id=0,
+        )[0, prompt.shape[-1] :].tolist()
+        for prompt in prompts
+    ]
+
+    batcher = ContinuousBatcher(model, eos_token_ids={1}, max_batch_size=4)
+    requests = [
+        batcher.submit(
+            GenerationRequest(
+                input_ids=prompt,
+                past_key_values=DynamicCache(),
+                max_new_tokens=6,
+                do_sample=False,
+            )
+        )
+        for prompt in prompts
+    ]
+    for request in requests:
+        request.wait()
+    batcher.close()
+
+    assert [request.generated_ids for request in requests] == expected
+    for request in requests:
+        # The cache covers everything except the last sampled token.
+        assert (
+            request.past_key_values.get_seq_length() == request.output_ids.shape[-1] - 1
+        )
+
+
+def test_concurrent_sessions_share_decode_steps():
+    model = _tiny_model()
+    sessions, tokens = 8, 12
+    batcher = ContinuousBatcher(model, eos_token_ids=set(), max_batch_size=sessions)
+    requests = [
+        batcher.submit(
+            GenerationRequest(
+                input_ids=torch.randint(2, 64, (1, 4 + i)),
+                past_key_values=DynamicCache(),
+                max_new_tokens=tokens,
+                do_sample=False,
+            )
+        )
+        for i in range(sessions)
+    ]
+    for request in requests:
+        request.wait()
+    batcher.close()
+
+    metrics = batcher.get_metrics()
+    assert metrics["generated_tokens"] == sessions * tokens
+    assert metrics["tokens_per_second"] > 0
+    # Decoding one session at a time would take (tokens - 1) steps per session.
+    steps = sum(batcher.batch_size_histogram.values())
+    assert steps < sessions * (tokens - 1)
+    assert max(batcher.batch_size_histogram) > 1
+
+
+class StubTokenizer:
+    """Whitespace tokenizer over the tiny model's vocabulary.
+
+    Token `n` decodes to "t<n>" and back, so a reply re-tokenizes to the ids it
+    was generated as; any other word hashes to an id.
+    """
+
+    pad_token_id = 0
+    eos_token_id = 1
+
+    def _encode(self, text: str) -> list[int]:
+        return [
+            int(word[1:])
+            if word[0] == "t" and word[1:].isdigit()
+            else zlib.crc32(word.encode()) % 62 + 2
+            for word in text.split()
+        ]
+
+    def __call__(self, text, return_tensors=None):
+        ids = self._encode(text)
+        if return_tensors is None:
+            return SimpleNamespace(input_ids=ids)
+        input_ids = torch.tensor([ids])
+        return SimpleNamespace(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            to=lambda device: SimpleNamespace(
+                input_ids=input_ids, attention_mask=torch.ones_like(input_ids)
+            ),
+        )
+
+    def apply_chat_template(self, messages, tokenize, add_generation_prompt, **kw):
+        text = " ".join(
+            f"<start> {message['role']} {message['content']} <end>"
+            for message in messages
+        )
+        return text + " <start> assistant" if add_generation_prompt else text
+
+    def decode(self, ids, skip_special_tokens=False):
+        return " ".join(f"t{int(i)}" for i in ids if int(i) > 1)
+
+
+@pytest.fixture(params=[1, 2], ids=["generate", "batcher"])
+def qwen(request, monkeypatch):
+    monkeypatch.setattr(
+        transformers.AutoTokenizer, "from_pretrained", lambda *a, **kw: StubTokenizer()
+    )
+    monkeypatch.setattr(
+        transformers.AutoModelForCausalLM,
+        "from_pretrained",
+        lambda *a, **kw: _tiny_model(),
+    )
+    QwenCausalLM.release_instance()
+    instance = QwenCausalLM.get_instance(max_batch_size=request.param)
+    yield instance
+    QwenCausalLM.release_instance()
+
+
+def _converse(session_id: str, prompts: list[str], reuse: bool) -> list[str]:
+    replies = []
+    for prompt in prompts:
+        if not reuse:
+            QwenCausalLM._instance.kv_cache.pop(session_id)
+        replies.append(
+            QwenCausalLM.run_inference(
+                prompt, session_id, do_sample=False, max_new_tokens=5
+            )
+        )
+    return replies
+
+
+PROMPTS = ["hello there", "how much is the rice", "t7 t9 t11", "thank you"]
+
+
+@pytest.mark.parametrize("max_prompt_tokens", [2048, 40], ids=["full", "truncated"])
+def test_kv_cache_reuse_matches_full_prefill(qwen, max_prompt_tokens):
+    # Truncating old turns makes the prompt diverge from the cached prefix.
+    qwen.max_prompt_tokens = max_prompt_tokens
+    reused = QwenCausalLM.create_session()
+    QwenCausalLM.add_system_prompt("you are a waiter", reused)
+    recomputed = QwenCausalLM.create_session()
+    QwenCausalLM.add_system_prompt("you are a waiter", recomputed)
+
+    with_reuse = _converse(reused, PROMPTS, reuse=True)
+    assert qwen.reused_prefill_tokens > 0
+
+    assert with_reuse == _converse(recomputed, PROMPTS, reuse=False)
+
+
+def test_prefix_cache_matches_prefilling_the_system_prompts(qwen):
+    system_prompts = ["you are a waiter", "use simple words"]
+    first = QwenCausalLM.create_session_from_prefix("lesson", system_prompts)
+    second = QwenCausalLM.create_session_from_prefix("lesson", system_prompts)
+    assert qwen.prefix_cache.stats()["hits"] == 1
+
+    plain = QwenCausalLM.create_session()
+    for prompt in system_prompts:
+        QwenCausalLM.add_system_prompt(prompt, plain)
+    expected = _converse(plain, PROMPTS, reuse=False)
+
+    assert _converse(first, PROMPTS, reuse=True) == expected
+    assert _converse(second, PROMPTS, reuse=True) == expected
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from app.main import MODEL_CACHES, create_executors, register_collectors
+from app.util.cache import LRUCache
+from app.util.languages import Language
+from app.util.metrics import METRICS
+from app.util.model import TextTranslator, TranslationBackend
+from app.util.registry import ModelRegistry
+
+
+class FakeBackend(TranslationBackend):
+    def translate_batch(self, texts, source, target):
+        return [text.upper() for text in texts]
+
+
+@pytest.fixture
+def app():
+    collectors = dict(METRICS._collectors)
+    registry = ModelRegistry()
+    yield SimpleNamespace(state=SimpleNamespace(model=registry, executor={}))
+    registry.shutdown()
+    METRICS._collectors = collectors
+
+
+def test_translation_lookups_are_reported_per_pair(app):
+    translator = TextTranslator(backend=FakeBackend())
+    app.state.model.add("TextTranslator", translator)
+    translator.translate("tea", Language.ENGLISH, Language.MANDARIN)
+    translator.translate("tea", Language.ENGLISH, Language.MANDARIN)
+
+    register_collectors(app)
+    metrics = METRICS.render()
+
+    pair = 'pair="ENGLISH->MANDARIN"'
+    assert f'app_translation_lookups_total{{{pair},result="misses"}} 1' in metrics
+    assert f'app_translation_lookups_total{{{pair},result="memory_hits"}} 1' in metrics
+    assert f'app_translation_lookups_total{{{pair},result="coalesced"}} 0' in metrics
+
+
+class FakeModel:
+    batcher = None
+
+    def __init__(self, caches):
+        self.caches = {name: LRUCache(max_size=1) for name in caches}
+
+    def get_metrics(self):
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+
+@pytest.mark.parametrize("name", sorted(MODEL_CACHES))
+def test_model_cache_stats_are_reported(app, name):
+    model = FakeModel(MODEL_CACHES[name])
+    app.state.model.add(name, model)
+    cache_name = MODEL_CACHES[name][0]
+    cache = model.caches[cache_name]
+    cache.get_or_create("a", lambda: 1)
+    cache.get_or_create("a", lambda: 1)
+    cache.get_or_create("b", lambda: 2)
+
+    register_collectors(app)
+    metrics = METRICS.render()
+
+    labels = f'{{cache="{cache_name}",model="{name}"}}'
+    assert f"app_model_cache_hits_total{labels} 1" in metrics
+    assert f"app_model_cache_misses_total{labels} 2" in metrics
+    assert f"app_model_cache_evictions_total{labels} 1" in metrics
+    assert f"app_model_cache_entries{labels} 1" in metrics
+
+
+def test_request_metrics_middleware_is_not_installed_when_disabled():
+    check = (
+        "from starlette.middleware.base import BaseHTTPMiddleware\n"
+        "from app.main import app\n"
+        "print(any(m.cls is BaseHTTPMiddleware for m in app.user_middleware))"
+    )
+    installed = {
+        enabled: subprocess.run(
+            [sys.executable, "-c", check],
+            env={**os.environ, "METRICS_ENABLED": enabled},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        for enabled in ("0", "1")
+    }
+
+    assert installed == {"0": "False", "1": "True"}
+
+
+def test_audio_codec_takes_no_share_of_the_torch_threads():
+    executors = create_executors()
+    try:
+        assert not executors["AudioCodec"].cpu_bound
+        assert executors["WhisperModel"].cpu_bound
+    finally:
+        for executor in executors.values():
+            executor.shutdown()
@@ -0,0 +1,54 @@
+from app.util.metrics import Histogram, LatencyStats, MetricsRegistry, stage
+
+
+def test_histogram_renders_cumulative_buckets_per_label_set():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05, (("stage", "decode"),))
+    histogram.observe(0.5, (("stage", "decode"),))
+    histogram.observe(5.0, (("stage", "decode"),))
+
+    lines = histogram.render()
+
+    assert 'latency_seconds_bucket{stage="decode",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="decode",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{stage="decode",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{stage="decode"} 3' in lines
+
+
+def test_registry_renders_collectors_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {"value": 1}
+    registry.register_collector(
+        "queue_depth", "Depth.", lambda: [({"executor": "a"}, depth["value"])]
+    )
+    depth["value"] = 4
+
+    assert 'queue_depth{executor="a"} 4' in registry.render()
+
+
+def test_latency_stats_feed_named_histogram():
+    stats = stage("test_stage")
+    with stats.time():
+        pass
+
+    assert stats is stage("test_stage")
+    assert stats.count == 1
+    assert stats._histogram is not None
+    assert 'stage="test_stage"' in "\n".join(stats._histogram.render())
+
+
+def test_unnamed_latency_stats_stay_local():
+    stats = LatencyStats()
+    stats.observe(0.2)
+
+    assert stats._histogram is None
+    assert stats.summary()["max_seconds"] == 0.2
+
+
+def test_latency_stats_with_same_labels_share_histogram_not_totals():
+    first = LatencyStats("app_stage_duration_seconds", stage="shared_stage")
+    second = LatencyStats("app_stage_duration_seconds", stage="shared_stage")
+    first.observe(0.1)
+
+    assert (first.count, second.count) == (1, 0)
+    assert first._histogram is second._histogram
@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+import transformers
+
+from app import evaluate_precision
+from app.util import precision as precision_module
+from app.util.model import QwenCausalLM
+from app.util.precision import (
+    Precision,
+    apply_precision,
+    error_rate,
+    module_nbytes,
+    parse_model_precisions,
+    resolve_precision,
+)
+
+
+def _mlp() -> torch.nn.Module:
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Linear(256, 256), torch.nn.ReLU(), torch.nn.Linear(256, 8)
+    ).eval()
+
+
+def test_int8_quantizes_linear_layers_within_tolerance():
+    model = _mlp()
+    inputs = torch.randn(4, 256)
+    expected = model(inputs)
+
+    quantized = apply_precision(_mlp(), Precision.INT8)
+
+    assert torch.allclose(quantized(inputs), expected, atol=0.05)
+    assert module_nbytes(quantized) < module_nbytes(model) / 3
+
+
+def test_bf16_converts_weights():
+    model = apply_precision(_mlp(), "bf16")
+    assert next(model.parameters()).dtype == torch.bfloat16
+
+
+def test_bf16_falls_back_to_fp32_without_cpu_support(monkeypatch):
+    monkeypatch.setattr(precision_module, "bf16_supported", lambda: False)
+    with pytest.warns(UserWarning):
+        assert resolve_precision("bf16") == Precision.FP32
+
+
+def test_parse_model_precisions():
+    assert parse_model_precisions(" WhisperModel=INT8, QwenCausalLM=bf16,") == {
+        "WhisperModel": Precision.INT8,
+        "QwenCausalLM": Precision.BF16,
+    }
+    with pytest.raises(ValueError):
+        parse_model_precisions("WhisperModel")
+
+
+def test_error_rate_counts_words_or_mandarin_characters():
+    assert error_rate("I want rice", "I want the rice") == pytest.approx(1 / 3)
+    assert error_rate("我想点米饭。", "我想点米饭") == pytest.approx(1 / 6)
+    assert error_rate("请给我菜单", "请给我菜单") == 0.0
+
+
+def test_evaluate_rebuilds_singleton_and_keys_by_requested_precision(monkeypatch):
+    for auto_class in (transformers.AutoTokenizer, transformers.AutoModelForCausalLM):
+        monkeypatch.setattr(auto_class, "from_pretrained", MagicMock())
+    monkeypatch.setattr(evaluate_precision, "_perplexity", lambda llm: (2.0, 0.1))
+    monkeypatch.setattr(evaluate_precision, "module_nbytes", lambda module: 2**20)
+    monkeypatch.setattr(precision_module, "bf16_supported", lambda: False)
+
+    with pytest.warns(UserWarning):
+        results = evaluate_precision.evaluate("QwenCausalLM", Precision.BF16, None)
+
+    assert set(results) == {"fp32", "bf16"}
+    assert "fell_back_to" not in results["fp32"]
+    assert results["bf16"]["fell_back_to"] == "fp32"
+    assert QwenCausalLM._instance is None
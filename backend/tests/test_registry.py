@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from app.util.registry import ModelNotReadyError, ModelRegistry, ModelState
+
+
+def test_model_registry_loads_eager_models_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def factory(name):
+        def load():
+            barrier.wait()  # only passes if both models load at the same time
+            return name
+
+        return load
+
+    registry = ModelRegistry()
+    registry.register("a", factory("a"))
+    registry.register("b", factory("b"))
+    registry.start()
+
+    registry.load_all()
+    assert registry["a"] == "a"
+    assert registry["b"] == "b"
+    ready, models = registry.readiness()
+    assert ready
+    assert models["a"]["state"] == ModelState.READY
+    assert models["a"]["load_seconds"] is not None
+    registry.shutdown()
+
+
+def test_model_registry_loads_lazy_models_on_first_use():
+    release = threading.Event()
+    registry = ModelRegistry()
+    registry.register("lazy", lambda: release.wait() and "model", lazy=True)
+    registry.start()
+
+    assert registry.readiness() == (
+        True,
+        {
+            "lazy": {
+                "state": "PENDING",
+                "lazy": True,
+                "load_seconds": None,
+                "error": None,
+            }
+        },
+    )
+    with pytest.raises(ModelNotReadyError):
+        registry["lazy"]  # starts loading without blocking
+
+    release.set()
+    registry.load_all()
+    assert registry["lazy"] == "model"
+    registry.shutdown()
+
+
+def test_model_registry_reports_failures_and_runs_ready_callbacks():
+    def broken():
+        raise RuntimeError("no weights")
+
+    seen = []
+    registry = ModelRegistry()
+    registry.register("broken", broken)
+    registry.register("ok", lambda: "model")
+    registry.when_ready("ok", seen.append)
+    registry.load_all()
+
+    ready, models = registry.readiness()
+    assert not ready
+    assert models["broken"]["error"] == "RuntimeError: no weights"
+    assert seen == ["model"]
+    with pytest.raises(ModelNotReadyError):
+        registry["broken"]
+    registry.shutdown()
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+import torch
+
+from app.serve import freeze_model_weights
+
+
+class FakeModel:
+    def __init__(self):
+        self.model = torch.nn.Linear(4, 2)
+        self.pipelines = {"zh": self.model, "en": torch.nn.Linear(2, 2)}
+
+
+def test_freeze_model_weights_freezes_each_module_once():
+    model = FakeModel()
+
+    weight_bytes = freeze_model_weights({"FakeModel": model})
+
+    assert weight_bytes == (4 * 2 + 2 + 2 * 2 + 2) * 4
+    for module in (model.model, model.pipelines["en"]):
+        assert not module.training
+        assert not any(p.requires_grad for p in module.parameters())
+        assert not any(p.is_shared() for p in module.parameters())  # no /dev/shm copy
+
+
+def test_freeze_model_weights_counts_packed_quantized_weights():
+    quantized = torch.ao.quantization.quantize_dynamic(
+        torch.nn.Sequential(torch.nn.Linear(64, 64)), {torch.nn.Linear}
+    )
+    assert not list(quantized.parameters())
+
+    assert freeze_model_weights({"Quantized": quantized}) >= 64 * 64
+
+
+def _mapping_usage(address: int) -> dict[str, int]:
+    """Shared and private-dirty bytes of the /proc/self/smaps entry at `address`."""
+    usage: dict[str, int] = {}
+    inside = False
+    with open("/proc/self/smaps") as f:
+        for line in f:
+            head = line.split()[0]
+            if "-" in head and not head.endswith(":"):
+                start, end = (int(bound, 16) for bound in head.split("-"))
+                inside = start <= address < end
+            elif inside and head in ("Shared_Clean:", "Shared_Dirty:"):
+                usage["shared"] = usage.get("shared", 0) + int(line.split()[1]) * 1024
+            elif inside and head == "Private_Dirty:":
+                usage["private_dirty"] = int(line.split()[1]) * 1024
+    return usage
+
+
+def _in_forked_child(fn) -> dict[str, int]:
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_fd, json.dumps(fn()).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result = json.loads(f.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps"), reason="needs Linux")
+def test_forked_worker_reads_weights_from_the_parents_pages():
+    # 40 MiB, so the weight gets an mmap-ed mapping of its own.
+    model = torch.nn.Linear(2560, 4096)
+    weight_bytes = model.weight.numel() * model.weight.element_size()
+    address = model.weight.data_ptr()
+    freeze_model_weights({"Model": model})
+    assert model.weight.data_ptr() == address  # frozen in place, not copied
+
+    def infer():
+        model(torch.ones(1, 2560))
+        return _mapping_usage(address)
+
+    def write():
+        # Control: a worker that writes its weights copies every page.
+        model.weight.data.add_(1)
+        return _mapping_usage(address)
+
+    inferred, written = _in_forked_child(infer), _in_forked_child(write)
+
+    assert inferred["shared"] >= weight_bytes
+    assert inferred["private_dirty"] < weight_bytes // 8
+    assert written["private_dirty"] >= weight_bytes
@@ -0,0 +1,71 @@
+import pytest
+
+from app.util.session import SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _count_words(message):
+    return len(message["content"].split())
+
+
+def test_session_store_expires_idle_sessions():
+    clock, evicted = FakeClock(), []
+    store = SessionStore(
+        _count_words, idle_ttl_seconds=10, on_evict=evicted.append, clock=clock
+    )
+    store.create("a")
+    store.create("b")
+
+    clock.now = 5
+    store.append("b", {"role": "user", "content": "hi"})
+
+    clock.now = 12
+    assert "a" not in store
+    assert "b" in store
+    assert evicted == ["a"]
+    with pytest.raises(KeyError):
+        store.get("a")
+
+
+def test_session_store_evicts_least_recently_used():
+    store = SessionStore(_count_words, max_sessions=2)
+    store.create("a")
+    store.create("b")
+    store.get("a")
+    store.create("c")
+
+    assert "b" not in store
+    assert "a" in store and "c" in store
+    assert store.stats()["evicted"] == 1
+
+
+def test_session_store_truncates_oldest_turns_and_keeps_system_prompts():
+    store = SessionStore(_count_words)
+    store.create("s")
+    store.extend(
+        "s",
+        [
+            {"role": "system", "content": "be brief"},
+            {"role": "user", "content": "one two three"},
+            {"role": "assistant", "content": "four five six"},
+            {"role": "user", "content": "seven eight"},
+            {"role": "assistant", "content": "nine ten"},
+            {"role": "user", "content": "eleven"},
+        ],
+    )
+
+    store.truncate("s", max_tokens=8)
+
+    assert [m["content"] for m in store.get("s")] == [
+        "be brief",
+        "seven eight",
+        "nine ten",
+        "eleven",
+    ]
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from app.util.codec import AudioEncoder
+from app.util.languages import Language
+from app.util.model import AudioData
+from app.util.speech_cache import SpeechCache, prerender
+
+
+def test_key_depends_on_every_field():
+    key = SpeechCache.key("水", Language.MANDARIN, "af_heart", 1.0, "webm")
+
+    assert key == SpeechCache.key("水", "MANDARIN", "af_heart", 1, "webm")
+    assert key != SpeechCache.key("水", Language.MANDARIN, "af_heart", 1.0, "wav")
+    assert key != SpeechCache.key("水", Language.MANDARIN, "af_heart", 1.2, "webm")
+
+
+def test_disk_tier_is_shared_with_new_cache(tmp_path):
+    SpeechCache(cache_dir=str(tmp_path)).put("abc", b"audio")
+
+    cache = SpeechCache(cache_dir=str(tmp_path))
+    assert cache.get("abc") == b"audio"
+    assert cache.get_metrics()["disk"]["hits"] == 1
+
+
+def test_prerender_synthesizes_each_phrase_once_and_skips_cached(tmp_path):
+    model = MagicMock()
+    model.run_inference.return_value = AudioData(
+        24000, np.zeros(2400, dtype=np.float32)
+    )
+    cache = SpeechCache(cache_dir=str(tmp_path))
+    phrases = ["菜单", "米饭", "菜单"]
+
+    rendered = prerender(
+        cache,
+        model,
+        AudioEncoder(),
+        phrases,
+        Language.MANDARIN,
+        formats=["webm", "wav"],
+    )
+
+    assert rendered == 2
+    assert model.run_inference.call_count == 2
+    assert len(cache.disk_cache) == 4
+    assert prerender(cache, model, AudioEncoder(), phrases, Language.MANDARIN) == 0
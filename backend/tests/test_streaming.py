@@ -0,0 +1,84 @@
+import asyncio
+
+import numpy as np
+
+from app.util.streaming import (
+    WHISPER_SAMPLE_RATE,
+    ChunkDecoder,
+    StreamingTranscriber,
+    _common_prefix,
+    _merge_overlap,
+)
+
+
+def test_common_prefix_stops_at_word_boundary():
+    assert _common_prefix("I would like tea", "I would like coffee") == "I would like "
+    assert _common_prefix("I would like tea", "I would liken") == "I would "
+    assert _common_prefix("我要一杯茶", "我要一杯咖啡") == "我要一杯"
+
+
+def test_merge_overlap_drops_repeated_words():
+    assert _merge_overlap("I would like", "would like some tea") == (
+        "I would like some tea"
+    )
+    assert _merge_overlap("我要一杯", "一杯茶") == "我要一杯茶"
+    assert _merge_overlap("", "hello") == "hello"
+
+
+def test_merge_overlap_matches_whole_words():
+    assert _merge_overlap("the cat", "at home") == "the cat at home"
+    assert _merge_overlap("we went in", "into the shop") == "we went in into the shop"
+    assert _merge_overlap("I would like", "Like, some tea") == "I would like some tea"
+
+
+def test_pcm_decoder_converts_int16_to_float():
+    decoder = ChunkDecoder("pcm_s16le")
+    samples = decoder.decode(np.array([0, 16384, -32768], dtype="<i2").tobytes())
+    assert samples.dtype == np.float32
+    np.testing.assert_allclose(samples, [0.0, 0.5, -1.0])
+
+
+def test_decoder_finish_flushes_resampler_tail():
+    decoder = ChunkDecoder("pcm_s16le", sample_rate=44100)
+    chunk = np.full(4410, 1000, dtype="<i2").tobytes()
+
+    samples = [decoder.decode(chunk) for _ in range(10)] + [decoder.finish()]
+
+    assert sum(len(s) for s in samples) == WHISPER_SAMPLE_RATE
+    assert len(ChunkDecoder("pcm_s16le").finish()) == 0
+
+
+def test_streaming_transcriber_commits_stable_prefix_and_slides_window():
+    # Fake recognizer: one word per second of audio in the window.
+    words = ["one", "two", "three", "four", "five", "six"]
+    calls = []
+
+    async def transcribe(audio):
+        seconds = len(audio.raw) // WHISPER_SAMPLE_RATE
+        start = int(audio.raw[0])  # the window's first sample encodes its offset
+        calls.append(seconds)
+        return " ".join(words[start : start + seconds])
+
+    def second(index):
+        return np.full(WHISPER_SAMPLE_RATE, index, dtype=np.float32)
+
+    async def run():
+        transcriber = StreamingTranscriber(
+            transcribe, step_seconds=1, max_window_seconds=3, overlap_seconds=1
+        )
+        partials = [await transcriber.push(second(i)) for i in range(5)]
+        return partials, await transcriber.finish()
+
+    partials, final = asyncio.run(run())
+
+    assert partials[0] == {"type": "partial", "stable": "", "text": "one"}
+    assert partials[1] == {"type": "partial", "stable": "one", "text": "one two"}
+    # The third second fills the window, so it is committed with one second kept.
+    assert partials[2]["stable"] == "one two three"
+    assert partials[4]["text"] == "one two three four five"
+    assert final == {
+        "type": "final",
+        "stable": "one two three four five",
+        "text": "one two three four five",
+    }
+    assert max(calls) == 3
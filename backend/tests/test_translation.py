@@ -0,0 +1,136 @@
+import pytest
+import transformers
+
+from app.util.languages import Language
+from app.util.model import (
+    MarianTranslationBackend,
+    TextTranslator,
+    TranslationBackend,
+    _split_sentences,
+)
+
+
+class FakeBackend(TranslationBackend):
+    def __init__(self):
+        self.calls = []
+
+    def translate_batch(self, texts, source, target):
+        self.calls.append(texts)
+        return [text.upper() for text in texts]
+
+
+def test_split_sentences_keeps_punctuation_and_decimals():
+    assert _split_sentences("你好。我要一杯茶！It costs 3.5 yuan. Thanks") == [
+        "你好。",
+        "我要一杯茶！",
+        "It costs 3.5 yuan.",
+        "Thanks",
+    ]
+
+
+def test_translate_batch_only_sends_cache_misses_to_backend():
+    backend = FakeBackend()
+    translator = TextTranslator(backend=backend)
+
+    assert translator.translate("tea", Language.ENGLISH, Language.MANDARIN) == "TEA"
+    assert translator.translate_batch(
+        ["tea", "water", "rice", "water"], Language.ENGLISH, Language.MANDARIN
+    ) == ["TEA", "WATER", "RICE", "WATER"]
+
+    assert backend.calls == [["tea"], ["water", "rice"]]
+    pair = translator.get_metrics()["pairs"]["ENGLISH->MANDARIN"]
+    assert pair["misses"] == 3
+    assert pair["memory_hits"] == 1
+
+
+def test_disk_cache_survives_new_translator(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    TextTranslator(backend=FakeBackend(), cache_path=path).translate(
+        "你好", Language.MANDARIN
+    )
+
+    backend = FakeBackend()
+    translator = TextTranslator(backend=backend, cache_path=path)
+    assert translator.translate("你好", Language.MANDARIN) == "你好"
+    assert backend.calls == []
+    assert translator.get_metrics()["pairs"]["MANDARIN->ENGLISH"]["disk_hits"] == 1
+
+
+def test_backend_without_translate_batch_fails_at_construction():
+    class IncompleteBackend(TranslationBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteBackend()  # type: ignore[abstract]
+
+
+class StubTokens(dict):
+    def to(self, device):
+        return self
+
+
+class StubTokenizer:
+    def __call__(self, sentences, **kwargs):
+        return StubTokens(sentences=sentences)
+
+    def batch_decode(self, output, skip_special_tokens):
+        return output
+
+
+class StubSeq2Seq:
+    def __init__(self):
+        self.batches = []
+
+    def eval(self):
+        return self
+
+    def to(self, *args):
+        return self
+
+    def generate(self, sentences, **kwargs):
+        self.batches.append(sentences)
+        return [f"<{sentence}>" for sentence in sentences]
+
+
+def test_marian_backend_batches_sentences_and_rejoins_per_text(monkeypatch):
+    model = StubSeq2Seq()
+    monkeypatch.setattr(
+        transformers.AutoTokenizer, "from_pretrained", lambda name: StubTokenizer()
+    )
+    monkeypatch.setattr(
+        transformers.AutoModelForSeq2SeqLM, "from_pretrained", lambda name: model
+    )
+    backend = MarianTranslationBackend(max_batch_size=2)
+
+    # The second text's sentences straddle the batch boundary.
+    translations = backend.translate_batch(
+        ["Hi.", "Tea, please. Thanks!", "Bye"],
+        Language.ENGLISH,
+        Language.MANDARIN,
+    )
+
+    token = ">>cmn_Hant<<"
+    assert model.batches == [
+        [f"{token} Hi.", f"{token} Tea, please."],
+        [f"{token} Thanks!", f"{token} Bye"],
+    ]
+    assert translations == [
+        f"<{token} Hi.>",
+        f"<{token} Tea, please.><{token} Thanks!>",
+        f"<{token} Bye>",
+    ]
+
+
+def test_marian_backend_adds_no_target_token_into_english(monkeypatch):
+    model = StubSeq2Seq()
+    monkeypatch.setattr(
+        transformers.AutoTokenizer, "from_pretrained", lambda name: StubTokenizer()
+    )
+    monkeypatch.setattr(
+        transformers.AutoModelForSeq2SeqLM, "from_pretrained", lambda name: model
+    )
+    backend = MarianTranslationBackend()
+
+    assert backend.translate_batch(
+        ["你好。谢谢！"], Language.MANDARIN, Language.ENGLISH
+    ) == ["<你好。> <谢谢！>"]
@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+
+from app.util.vad import AudioRingBuffer, VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+
+
+def _noise(seconds: float, level: float = 0.002) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (level * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+
+def _voice(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.2 * np.sin(2 * np.pi * 180 * t)).astype(np.float32)
+
+
+def test_ring_buffer_reads_views_and_wraps_in_order():
+    ring = AudioRingBuffer(capacity=5)
+    ring.write(np.arange(3, dtype=np.float32))
+    first = ring.read()
+    assert first.tolist() == [0, 1, 2]
+    assert np.shares_memory(first, ring._buffer)
+
+    ring.write(np.arange(3, 7, dtype=np.float32))
+    assert ring.read().tolist() == [3, 4]  # up to the end of the ring
+    assert ring.read().tolist() == [5, 6]
+    assert ring.contents().tolist() == [2, 3, 4, 5, 6]
+
+
+def test_ring_buffer_drops_oldest_when_reader_falls_behind():
+    ring = AudioRingBuffer(capacity=4)
+    ring.write(np.arange(6, dtype=np.float32))
+
+    assert ring.overruns == 2
+    assert ring.read().tolist() == [2, 3]
+    assert ring.read().tolist() == [4, 5]
+
+
+def test_ring_buffer_read_waits_for_writer():
+    ring = AudioRingBuffer(capacity=8)
+    threading.Timer(0.05, ring.write, [np.ones(2, dtype=np.float32)]).start()
+
+    assert ring.read(timeout=1.0).tolist() == [1, 1]
+    assert len(ring.read(timeout=0.01)) == 0
+
+
+def test_detects_end_of_speech_within_hangover():
+    detector = VoiceActivityDetector(SAMPLE_RATE, frame_ms=20, hangover_ms=300)
+    assert not detector.process(_noise(0.5))
+    assert not detector.speech_started
+
+    assert not detector.process(_voice(1.0))
+    assert detector.speech_started
+
+    # A short pause between words does not end the utterance.
+    assert not detector.process(_noise(0.2))
+    assert not detector.process(_voice(0.3))
+
+    trailing = _noise(1.0)
+    frame = detector.frame_size
+    for end in range(frame, len(trailing) + 1, frame):
+        if detector.process(trailing[end - frame : end]):
+            break
+    assert detector.speech_ended
+    assert end / SAMPLE_RATE <= 0.32
+
+
+def test_background_noise_alone_never_starts_speech():
+    detector = VoiceActivityDetector(SAMPLE_RATE)
+    for _ in range(10):
+        detector.process(_noise(0.5, level=0.02))
+
+    assert not detector.speech_started